@@ -0,0 +1,98 @@
+"""
+Benchmark looking up the accounts subscribed to the areas of a PDF.
+
+Usage:
+    DATABASE_URL=postgres://... python benchmarks/area_lookup.py
+        [--accounts 100000] [--areas 20000] [--lookups 200]
+
+Creates synthetic accounts with a few areas each inside a transaction that
+is rolled back, then compares a sequential scan over
+`NotificationAccount.areas` with `find_subscribed_accounts`, which goes
+through the GIN index on the canonical areas. Each lookup is for the areas
+and places of one interruption. Needs a Postgres database.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "kplc_interruptions.config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import Q  # noqa: E402
+
+from kplc_interruptions.notifications.models import NotificationAccount  # noqa: E402,E501
+from kplc_interruptions.notifications.tasks import find_subscribed_accounts  # noqa: E402,E501
+
+
+def create_accounts(rng, accounts, areas):
+    batch = []
+    for n in range(accounts):
+        account_areas = [
+            "Area {}".format(rng.randrange(areas))
+            for _ in range(rng.randint(1, 5))]
+        batch.append(NotificationAccount(
+            email="account{}@example.com".format(n), areas=account_areas,
+            is_active=True))
+        if len(batch) == 5000:
+            NotificationAccount.objects.bulk_create(batch)
+            batch = []
+    NotificationAccount.objects.bulk_create(batch)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE {}".format(NotificationAccount._meta.db_table))
+
+
+def scan_lookup(areas):
+    condition = Q()
+    for area in areas:
+        condition |= Q(areas__contains=[area])
+    return list(NotificationAccount.objects.filter(
+        condition, is_active=True).values_list("id", flat=True).order_by())
+
+
+def time_lookups(lookup, interruptions):
+    timings = []
+    for areas in interruptions:
+        start = time.perf_counter()
+        lookup(areas)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=100000)
+    parser.add_argument("--areas", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    interruptions = [
+        ["Area {}".format(rng.randrange(args.areas)) for _ in range(10)]
+        for _ in range(args.lookups)]
+
+    with transaction.atomic():
+        start = time.perf_counter()
+        create_accounts(rng, args.accounts, args.areas)
+        print("Created {} accounts in {:.1f}s".format(
+            args.accounts, time.perf_counter() - start))
+
+        print("{:>8} {:>10} {:>10}".format("lookup", "p50 ms", "max ms"))
+        for name, lookup in (
+                ("scan", scan_lookup), ("index", find_subscribed_accounts)):
+            timings = time_lookups(lookup, interruptions)
+            print("{:>8} {:>10.2f} {:>10.2f}".format(
+                name, statistics.median(timings) * 1000, max(timings) * 1000))
+        transaction.set_rollback(True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark `crawl_interruption_pdf_files` against a local stub server.
+
+Usage:
+    DATABASE_URL=postgres://... python benchmarks/crawl.py [--items 64]
+        [--latency 0.05]
+
+Reports interruption pages and MB downloaded per second at 1, 4 and 16
+workers. The per-host concurrency limit is raised to match the worker count
+so it does not cap the larger runs. The page validators stored by earlier
+runs are deleted first so that every run fetches the pages in full. Needs a
+Postgres database.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "kplc_interruptions.config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from benchmarks.stub_server import StubServer  # noqa: E402
+from kplc_interruptions.interruptions.models import (  # noqa: E402
+    Interruption, ScrapedPage)
+from kplc_interruptions.scrape import crawl_interruption_pdf_files  # noqa: E402,E501
+
+
+def run(server, items, workers):
+    settings.SCRAPE_SETTINGS["PER_HOST_CONCURRENCY"] = workers
+    ScrapedPage.objects.filter(url__startswith=server.base_url).delete()
+    interruptions = [
+        Interruption(title=str(item), link=server.item_url(item))
+        for item in range(items)]
+
+    downloaded = 0
+    start = time.perf_counter()
+    for _, pdf_dict in crawl_interruption_pdf_files(
+            interruptions, workers=workers):
+        pdf_file_temp = pdf_dict["pdf_file_temp"]
+        pdf_file_temp.seek(0, os.SEEK_END)
+        downloaded += pdf_file_temp.tell()
+        pdf_file_temp.close()
+    elapsed = time.perf_counter() - start
+
+    return elapsed, downloaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=64)
+    parser.add_argument("--pdfs-per-item", type=int, default=2)
+    parser.add_argument("--pdf-size", type=int, default=256 * 1024)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with StubServer(
+            latency=args.latency, pdfs_per_item=args.pdfs_per_item,
+            pdf_size=args.pdf_size) as server:
+        print("{:>8} {:>10} {:>10} {:>10}".format(
+            "workers", "seconds", "pages/s", "MB/s"))
+        for workers in (1, 4, 16):
+            elapsed, downloaded = run(server, args.items, workers)
+            print("{:>8} {:>10.2f} {:>10.1f} {:>10.2f}".format(
+                workers, elapsed, args.items / elapsed,
+                downloaded / elapsed / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
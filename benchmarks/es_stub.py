@@ -0,0 +1,124 @@
+"""
+Local stand-in for the parts of Elasticsearch the app uses.
+
+Answers `_search` requests with canned hits for the words searched and
+`_bulk` requests by acknowledging every document. Counts the searches, bulk
+requests and documents received. An optional latency per request simulates
+a remote cluster.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INFO = {
+    "name": "stand-in",
+    "cluster_name": "benchmark",
+    "version": {"number": "7.10.2", "build_flavor": "default"},
+    "tagline": "You Know, for Search",
+}
+
+
+class ESHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_json(INFO)
+
+    def do_HEAD(self):
+        self.send_json(INFO)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        if self.path.split("?")[0].endswith("/_bulk"):
+            self.send_json(self.bulk(body))
+        else:
+            self.send_json(self.search(json.loads(body)))
+
+    def bulk(self, body):
+        lines = [line for line in body.splitlines() if line.strip()]
+        items = []
+        # every action is followed by the document's source
+        for line in lines[::2]:
+            (operation, meta), = json.loads(line).items()
+            items.append({operation: {
+                "_index": meta.get("_index", "kplc_interruptions"),
+                "_id": meta.get("_id"),
+                "status": 201,
+                "result": "created",
+            }})
+        with self.server.lock:
+            self.server.bulk_requests += 1
+            self.server.documents += len(items)
+        return {"took": 1, "errors": False, "items": items}
+
+    def search(self, request):
+        with self.server.lock:
+            self.server.searches += 1
+        query = request["query"]
+        query = query.get("bool", {}).get("must", [query])[0]
+        words = query["match"]["pdf_text"]
+        size = request.get("size", 10)
+        return {
+            "took": 1,
+            "timed_out": False,
+            "hits": {
+                "total": {"value": size * 3, "relation": "eq"},
+                "max_score": 1.0,
+                "hits": [
+                    {
+                        "_index": "kplc_interruptions",
+                        "_id": str(n),
+                        "_score": 1.0,
+                        "_source": {
+                            "title": "Interruptions - {}".format(n),
+                            "pdf_link": "https://kplc.co.ke/img/{}.pdf".format(
+                                n),
+                            "created": "2019-06-20T10:00:00+00:00",
+                            "interruption_date": "2019-06-23",
+                            "interruption_end_date": "2019-06-23",
+                        },
+                        "highlight": {
+                            "pdf_text": [
+                                "Parts of <em>{}</em> and adjacent "
+                                "customers".format(words)],
+                        },
+                    }
+                    for n in range(size)
+                ],
+            },
+        }
+
+
+class ESStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(("127.0.0.1", 0), ESHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.searches = 0
+        self.bulk_requests = 0
+        self.documents = 0
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,66 @@
+"""
+Benchmark parallel PDF text extraction over a corpus of sample PDFs.
+
+Usage:
+    python benchmarks/extract.py [--pdfs 64] [--areas 40] [--workers 1 2 4 8]
+
+Writes sample bulletins to a temporary directory and extracts them with
+`iter_extracted_texts` at each worker count, reporting PDFs and pages per
+second. Needs `pdftotext` (and poppler) to be installed.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "kplc_interruptions.config.settings")
+# extraction workers do not touch the database
+os.environ.setdefault("DATABASE_URL", "sqlite://:memory:")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from benchmarks.sample_pdfs import LINES_PER_PAGE, bulletin_lines, write_corpus  # noqa: E402,E501
+from kplc_interruptions.pdf_extract_text import iter_extracted_texts  # noqa: E402,E501
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdfs", type=int, default=64)
+    parser.add_argument("--areas", type=int, default=40)
+    parser.add_argument("--timeout", type=int, default=60)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, args.pdfs, args.areas)
+        pages = sum(
+            -(-len(bulletin_lines(seed, args.areas)) // LINES_PER_PAGE)
+            for seed in range(args.pdfs))
+        jobs = [
+            (path, path, args.timeout, settings.EXTRACT_SETTINGS["MAX_PAGES"],
+             settings.EXTRACT_SETTINGS["MAX_BYTES"])
+            for path in paths]
+
+        print("{:>8} {:>10} {:>10} {:>10} {:>8}".format(
+            "workers", "seconds", "pdfs/s", "pages/s", "errors"))
+        for workers in args.workers:
+            start = time.perf_counter()
+            errors = sum(
+                1 for _, _, error in iter_extracted_texts(jobs, workers)
+                if error)
+            elapsed = time.perf_counter() - start
+            print("{:>8} {:>10.2f} {:>10.1f} {:>10.1f} {:>8}".format(
+                workers, elapsed, args.pdfs / elapsed, pages / elapsed,
+                errors))
+
+
+if __name__ == "__main__":
+    main()
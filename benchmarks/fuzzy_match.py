@@ -0,0 +1,140 @@
+"""
+Benchmark exact and fuzzy area matching on a corpus of noisy bulletins.
+
+Usage:
+    python benchmarks/fuzzy_match.py [--texts 200] [--accounts 2000]
+        [--typo-rate 0.2] [--split-rate 0.05]
+
+Builds the text of sample bulletins, wrapped and hyphenated like extracted
+PDF text, then adds spelling mistakes to a share of the area and place names
+and splits some of them in two. Accounts subscribe to a few names each,
+drawn from the bulletin gazetteer plus names that never appear in the
+bulletins. The names each bulletin really mentions are taken from its text
+before the noise is added.
+
+Reports the precision and recall of the subscribed names found in each
+bulletin and the time per text of `AreaMatcher` and of `FuzzyAreaMatcher` at
+each number of allowed edits.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sample_pdfs import PLACES, REGIONS, bulletin_lines  # noqa: E402,E501
+from kplc_interruptions.notifications.matching import (  # noqa: E402
+    AreaMatcher, FuzzyAreaMatcher, LINE_HYPHEN_RE)
+
+GAZETTEER = sorted(
+    {area for counties in REGIONS.values() for areas in counties.values()
+     for area in areas} | set(PLACES))
+# subscribed names that are not in any bulletin
+UNKNOWN = [
+    "Kileleshwa Ridge", "South D", "Runda", "Muthaiga", "Spring Valley",
+    "Loresho", "Kitisuru", "Gigiri", "Nyari", "Roysambu", "Zimmerman",
+    "Kayole", "Umoja", "Buruburu", "Pipeline", "Utawala", "Syokimau",
+    "Mlolongo", "Athi River", "Juja",
+]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def misspell(name, rng):
+    """
+    Make one spelling mistake in `name`, leaving the first letter alone.
+    """
+    position = rng.randrange(1, len(name))
+    edit = rng.choice(("delete", "insert", "replace", "swap"))
+    if edit == "delete":
+        return name[:position] + name[position + 1:]
+    if edit == "insert":
+        return name[:position] + rng.choice(LETTERS) + name[position:]
+    if edit == "replace":
+        return name[:position] + rng.choice(LETTERS) + name[position + 1:]
+    if position == len(name) - 1:
+        return name
+    return (name[:position] + name[position + 1] + name[position] +
+            name[position + 2:])
+
+
+def add_noise(text, rng, typo_rate, split_rate):
+    for name in GAZETTEER:
+        if name not in text:
+            continue
+        pieces = text.split(name)
+        noisy = []
+        for _ in pieces[1:]:
+            variant = name
+            if len(name) > 5 and rng.random() < typo_rate:
+                variant = misspell(name, rng)
+            elif " " not in name and len(name) > 6 and (
+                    rng.random() < split_rate):
+                variant = name[:len(name) // 2] + " " + name[len(name) // 2:]
+            noisy.append(variant)
+        text = pieces[0] + "".join(
+            variant + piece for variant, piece in zip(noisy, pieces[1:]))
+    return text
+
+
+def build_corpus(count, typo_rate, split_rate):
+    exact = AreaMatcher([(name, [name]) for name in GAZETTEER])
+    corpus = []
+    for seed in range(count):
+        rng = random.Random(seed)
+        text = "\n".join(bulletin_lines(seed, rng.randint(8, 40)))
+        # the hyphenation added by wrapping isn't noise
+        truth = set(exact.match(LINE_HYPHEN_RE.sub(r"\1\2", text)))
+        corpus.append(
+            (add_noise(text, rng, typo_rate, split_rate), truth))
+    return corpus
+
+
+def evaluate(matcher, corpus, subscribed):
+    true_positives = false_positives = false_negatives = 0
+    timings = []
+    for text, names in corpus:
+        start = time.perf_counter()
+        matches = matcher.match(text)
+        timings.append(time.perf_counter() - start)
+        found = set().union(*matches.values())
+        expected = names & subscribed
+        true_positives += len(expected & found)
+        false_positives += len(found - expected)
+        false_negatives += len(expected - found)
+    precision = true_positives / ((true_positives + false_positives) or 1)
+    recall = true_positives / ((true_positives + false_negatives) or 1)
+    return precision, recall, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--accounts", type=int, default=2000)
+    parser.add_argument("--typo-rate", type=float, default=0.2)
+    parser.add_argument("--split-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    accounts = [
+        (n, rng.sample(GAZETTEER + UNKNOWN, rng.randint(1, 3)))
+        for n in range(args.accounts)]
+    subscribed = {area for _, areas in accounts for area in areas}
+    corpus = build_corpus(args.texts, args.typo_rate, args.split_rate)
+
+    print("{:>12} {:>10} {:>10} {:>12}".format(
+        "matcher", "precision", "recall", "ms per text"))
+    matchers = [("exact", AreaMatcher(accounts))] + [
+        ("fuzzy {}".format(max_edits),
+         FuzzyAreaMatcher(accounts, max_edits=max_edits))
+        for max_edits in (1, 2)]
+    for name, matcher in matchers:
+        precision, recall, timing = evaluate(matcher, corpus, subscribed)
+        print("{:>12} {:>10.3f} {:>10.3f} {:>12.2f}".format(
+            name, precision, recall, timing * 1000))
+
+
+if __name__ == "__main__":
+    main()
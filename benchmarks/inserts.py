@@ -0,0 +1,95 @@
+"""
+Benchmark inserting rows keyed by random and time ordered UUIDs.
+
+Usage:
+    DATABASE_URL=postgres://... python benchmarks/inserts.py
+        [--rows 500000] [--batch-size 1000]
+
+Inserts rows shaped like `NotificationLog` into two temporary tables: one
+laid out like `AbstractBase`, with `uuid4` keys and separate indexes on
+`created` and `updated`, and one like `TimeOrderedBase`, with `uuid7` keys
+and a single index for the default ordering. Reports rows per second and
+the size of the indexes. Needs a Postgres database.
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "kplc_interruptions.config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from psycopg2.extras import execute_values  # noqa: E402
+
+from kplc_interruptions.common.models import uuid7  # noqa: E402
+
+TABLE = """CREATE TEMPORARY TABLE {name} (
+    id uuid PRIMARY KEY,
+    created timestamp with time zone NOT NULL,
+    updated timestamp with time zone NOT NULL,
+    status varchar(7) NOT NULL,
+    message text NOT NULL
+)"""
+
+LAYOUTS = (
+    ("uuid4", uuid.uuid4, (
+        "CREATE INDEX ON {name} (created)",
+        "CREATE INDEX ON {name} (updated)")),
+    ("uuid7", uuid7, (
+        "CREATE INDEX ON {name} (updated, created)",)),
+)
+
+
+def insert_rows(cursor, name, make_id, rows, batch_size):
+    start_time = datetime.now(timezone.utc)
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for n in range(offset, min(offset + batch_size, rows)):
+            timestamp = start_time + timedelta(milliseconds=n)
+            batch.append((
+                make_id(), timestamp, timestamp, "SUCCESS",
+                "Power interruption in Kitengela"))
+        execute_values(
+            cursor,
+            "INSERT INTO {} (id, created, updated, status, message) "
+            "VALUES %s".format(name),
+            batch, page_size=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("{:>8} {:>10} {:>10} {:>12}".format(
+        "keys", "seconds", "rows/s", "indexes MB"))
+    with connection.cursor() as cursor:
+        for name, make_id, indexes in LAYOUTS:
+            table = "insert_benchmark_{}".format(name)
+            cursor.execute(TABLE.format(name=table))
+            for index in indexes:
+                cursor.execute(index.format(name=table))
+
+            start = time.perf_counter()
+            insert_rows(
+                cursor.cursor, table, make_id, args.rows, args.batch_size)
+            elapsed = time.perf_counter() - start
+            cursor.execute(
+                "SELECT pg_indexes_size(%s::regclass)", [table])
+            index_size = cursor.fetchone()[0]
+            print("{:>8} {:>10.2f} {:>10.0f} {:>12.1f}".format(
+                name, elapsed, args.rows / elapsed, index_size / 1024 ** 2))
+            cursor.execute("DROP TABLE {}".format(table))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark notification delivery against a local SMTP stub.
+
+Usage:
+    DATABASE_URL=postgres://... python benchmarks/notify.py
+        [--accounts 200] [--pdfs 5] [--latency 0.002]
+        [--connect-latency 0.05] [--refused 5]
+
+Creates accounts subscribed to an area of several queued PDFs inside a
+transaction that is rolled back, then sends the notifications with one
+`send_mail` per account and PDF, with `send_notifications` sending an email
+per PDF and with `send_notifications` sending digests. Reports emails
+accepted per second, the SMTP connections opened and the notification logs
+written. The first `--refused` accounts are rejected by the stub to show
+failures being logged. Needs a Postgres database.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "kplc_interruptions.config.settings")
+os.environ.setdefault("OUTGOING_EMAIL_SOURCE", "notifications@example.com")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.mail import send_mail  # noqa: E402
+from django.db import transaction  # noqa: E402
+
+from benchmarks.smtp_stub import SMTPStub  # noqa: E402
+from kplc_interruptions.interruptions.models import (  # noqa: E402
+    Interruption, InterruptionArea, InterruptionPdf, InterruptionPdfText)
+from kplc_interruptions.notifications.models import (  # noqa: E402
+    NotificationAccount, NotificationLog, NotificationPDFQueue)
+from kplc_interruptions.notifications.tasks import send_notifications  # noqa: E402,E501
+
+
+def create_queue(accounts, pdfs):
+    interruption = Interruption.objects.create(
+        title="Interruptions - 23.06.2019",
+        link="https://kplc.co.ke/content/item/1")
+    queue_entries = []
+    for n in range(pdfs):
+        pdf = InterruptionPdf.objects.create(
+            interruption=interruption,
+            pdf_link="https://kplc.co.ke/img/{}.pdf".format(n))
+        pdf_text = InterruptionPdfText.objects.create(
+            pdf=pdf, pdf_text="AREA: KITENGELA\nKitengela Town")
+        InterruptionArea.objects.create(
+            pdf=pdf, region="Nairobi", county="Kajiado", area="Kitengela",
+            places=["Kitengela Town"])
+        queue_entries.append(
+            NotificationPDFQueue.objects.create(pdf_text=pdf_text))
+    for n in range(accounts):
+        NotificationAccount.objects.create(
+            email="account{}@example.com".format(n), areas=["Kitengela"],
+            is_active=True)
+    return queue_entries
+
+
+def send_mail_per_pdf(queue_entries):
+    emails = NotificationAccount.objects.values_list("email", flat=True)
+    for _ in queue_entries:
+        for email in emails:
+            send_mail(
+                "Power interruption in Kitengela", "",
+                settings.OUTGOING_EMAIL_SOURCE, [email], fail_silently=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--pdfs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--connect-latency", type=float, default=0.05)
+    parser.add_argument("--refused", type=int, default=5)
+    args = parser.parse_args()
+
+    refused = ["account{}@example.com".format(n) for n in range(args.refused)]
+    stub = SMTPStub(args.latency, args.connect_latency, refused)
+    with stub, transaction.atomic():
+        settings.EMAIL_HOST, settings.EMAIL_PORT = stub.server_address
+        settings.EMAIL_USE_TLS = False
+        queue_entries = create_queue(args.accounts, args.pdfs)
+
+        print("{:>14} {:>10} {:>8} {:>10} {:>12} {:>8}".format(
+            "delivery", "seconds", "emails", "emails/s", "connections",
+            "logs"))
+        runs = (
+            ("send_mail", send_mail_per_pdf),
+            ("per pdf", lambda entries: send_notifications(
+                entries, send_rate=0, digest=False)),
+            ("digest", lambda entries: send_notifications(
+                entries, send_rate=0, digest=True)),
+        )
+        for name, run in runs:
+            with transaction.atomic():
+                stub.connections = stub.messages = 0
+                start = time.perf_counter()
+                run(queue_entries)
+                elapsed = time.perf_counter() - start
+                print("{:>14} {:>10.2f} {:>8} {:>10.1f} {:>12} {:>8}".format(
+                    name, elapsed, stub.messages, stub.messages / elapsed,
+                    stub.connections, NotificationLog.objects.count()))
+                transaction.set_rollback(True)
+        transaction.set_rollback(True)
+
+
+if __name__ == "__main__":
+    main()
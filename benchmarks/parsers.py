@@ -0,0 +1,67 @@
+"""
+Micro-benchmark of the listing page parser backends.
+
+Usage:
+    python benchmarks/parsers.py [--repeat 200]
+
+Parses every synthetic listing page in `benchmarks/fixtures/` with each
+backend in `kplc_interruptions.parsers.LISTING_PARSERS` and reports the mean
+parse time per page. Backends whose package is not installed are skipped, and a
+backend whose output differs from `html.parser` is reported as a mismatch.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "kplc_interruptions.config.settings")
+# parsing does not touch the database
+os.environ.setdefault("DATABASE_URL", "sqlite://:memory:")
+
+import django  # noqa: E402
+
+django.setup()
+
+from kplc_interruptions.parsers import LISTING_PARSERS  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(
+            os.path.join(BENCHMARKS_DIR, "fixtures", "listing_page_*.html"))):
+        with open(path) as f:
+            pages.append(f.read())
+
+    expected = [LISTING_PARSERS["html.parser"](page) for page in pages]
+    print("{:>12} {:>12} {:>10}".format("backend", "ms/page", "speedup"))
+    baseline = None
+    for backend, parse in LISTING_PARSERS.items():
+        try:
+            results = [parse(page) for page in pages]
+        except ImportError:
+            print("{:>12} {:>12}".format(backend, "not installed"))
+            continue
+        if results != expected:
+            print("{:>12} {:>12}".format(backend, "mismatch"))
+            continue
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for page in pages:
+                parse(page)
+        per_page = (time.perf_counter() - start) / args.repeat / len(pages)
+        baseline = baseline or per_page
+        print("{:>12} {:>12.3f} {:>9.1f}x".format(
+            backend, per_page * 1000, baseline / per_page))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Generate sample KPLC interruption bulletins as PDFs.
+
+The bulletins follow the layout of the notices published on KPLC's website:
+regions, counties and areas, each area followed by its date, time and the
+list of affected places. PDFs are written with a minimal PDF writer so no
+extra packages are needed to build a benchmark corpus.
+"""
+import os
+import random
+import textwrap
+
+REGIONS = {
+    "NAIROBI REGION": {
+        "NAIROBI COUNTY": [
+            "Westlands", "Kileleshwa", "Lavington", "Kilimani", "Parklands",
+            "South B", "South C", "Embakasi", "Donholm", "Karen", "Langata",
+            "Kasarani", "Ruaraka", "Githurai", "Kahawa West"],
+        "KAJIADO COUNTY": [
+            "Kitengela", "Ongata Rongai", "Kiserian", "Isinya", "Ngong Town"],
+        "KIAMBU COUNTY": [
+            "Ruaka", "Banana", "Limuru Town", "Thindigua", "Kiambu Town"],
+    },
+    "COAST REGION": {
+        "MOMBASA COUNTY": [
+            "Nyali", "Bamburi", "Mtwapa", "Likoni", "Changamwe", "Kisauni"],
+        "KILIFI COUNTY": ["Malindi Town", "Watamu", "Kilifi Town"],
+    },
+    "WESTERN REGION": {
+        "KISUMU COUNTY": ["Kondele", "Milimani", "Nyalenda", "Mamboleo"],
+        "KAKAMEGA COUNTY": ["Lurambi", "Shinyalu", "Kakamega Town"],
+    },
+    "MT. KENYA REGION": {
+        "NYERI COUNTY": ["Nyeri Town", "Karatina", "Othaya"],
+        "MERU COUNTY": ["Meru Town", "Nkubu", "Maua"],
+    },
+}
+
+PLACES = [
+    "Sarit Centre", "Mpaka Rd", "Woodvale Grove", "Ring Rd", "Ngong Rd",
+    "Prestige Plaza", "Adams Arcade", "Yaya Centre", "Valley Arcade",
+    "Naivas Supermarket", "KCB Bank", "Equity Bank", "Total Petrol Station",
+    "Shell Petrol Station", "Chiromo Hospital", "Mater Hospital",
+    "Riverside Drive", "James Gichuru Rd", "Gitanga Rd", "Othaya Rd",
+    "Kabarnet Rd", "Muthangari Drive", "Lenana Rd", "Argwings Kodhek Rd",
+    "Nyerere Rd", "Moi Avenue", "Kenyatta Avenue", "Tom Mboya St",
+]
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday",
+        "Sunday"]
+
+HEADER = [
+    "Interruption of Electricity Supply",
+    "Notice is hereby given under Rule 27 of the Electric Power Rules",
+    "That the electricity supply will be interrupted as here under:",
+    "(It is necessary to interrupt supply periodically in order to "
+    "facilitate maintenance",
+    "and upgrade of power lines to the network; to connect new customers "
+    "or to replace",
+    "power lines during road construction, etc.)",
+]
+
+LINES_PER_PAGE = 60
+
+
+def bulletin_lines(seed, areas=12):
+    """
+    Return the lines of a bulletin with `areas` interrupted areas.
+    """
+    rng = random.Random(seed)
+    lines = list(HEADER)
+    for region, counties in sorted(REGIONS.items()):
+        lines.append("")
+        lines.append(region)
+        for county, county_areas in sorted(counties.items()):
+            lines.append("PARTS OF {}".format(county))
+            for area in rng.sample(
+                    county_areas, min(len(county_areas), max(1, areas // 8))):
+                day = rng.randint(1, 28)
+                lines.append("AREA: {}".format(area.upper()))
+                lines.append(
+                    "DATE: {} {:02d}.06.2019 TIME: {}.00 A.M. - {}.00 P.M."
+                    .format(DAYS[day % 7], day, rng.randint(8, 10),
+                            rng.randint(3, 5)))
+                places = rng.sample(PLACES, rng.randint(4, 10))
+                text = "{}, {} & adjacent customers.".format(
+                    area, ", ".join(places))
+                lines.extend(wrap(text, rng))
+    return lines
+
+
+def wrap(text, rng, width=90):
+    """
+    Wrap text over several lines like bulletins do, sometimes hyphenating
+    the last word of a line.
+    """
+    lines = textwrap.wrap(text, width)
+    for i in range(len(lines) - 1):
+        words = lines[i + 1].split(" ", 1)
+        if len(words[0]) > 5 and rng.random() < 0.3:
+            cut = len(words[0]) // 2
+            lines[i] += " " + words[0][:cut] + "-"
+            lines[i + 1] = words[0][cut:] + (
+                " " + words[1] if len(words) > 1 else "")
+    return lines
+
+
+def escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, lines):
+    """
+    Write `lines` to a PDF at `path`, `LINES_PER_PAGE` lines per page.
+    """
+    pages = [lines[i:i + LINES_PER_PAGE]
+             for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    objects = []
+    page_ids = []
+    font_id = 3
+    next_id = 4
+    for page_lines in pages:
+        stream = "BT /F1 9 Tf 12 TL 40 800 Td\n" + "".join(
+            "({}) Tj T*\n".format(escape(line)) for line in page_lines) + "ET"
+        stream = stream.encode("latin-1", "replace")
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        objects.append((content_id, b"<< /Length %d >>\nstream\n%s\nendstream"
+                        % (len(stream), stream)))
+        objects.append((page_id, (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            "/Resources << /Font << /F1 {} 0 R >> >> /Contents {} 0 R >>"
+        ).format(font_id, content_id).encode()))
+        page_ids.append(page_id)
+
+    objects.append((1, b"<< /Type /Catalog /Pages 2 0 R >>"))
+    objects.append((2, "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+        " ".join("{} 0 R".format(i) for i in page_ids),
+        len(page_ids)).encode()))
+    objects.append((font_id, (
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+        b"/Encoding /WinAnsiEncoding >>")))
+    objects.sort()
+
+    body = b"%PDF-1.4\n"
+    offsets = []
+    for object_id, content in objects:
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (object_id, content)
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += (
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" %
+        (len(objects) + 1, xref))
+
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def write_corpus(directory, count, areas=12):
+    """
+    Write `count` sample bulletins to `directory` and return their paths.
+    """
+    paths = []
+    for seed in range(count):
+        path = os.path.join(directory, "bulletin-{}.pdf".format(seed))
+        write_pdf(path, bulletin_lines(seed, areas))
+        paths.append(path)
+    return paths
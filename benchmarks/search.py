@@ -0,0 +1,93 @@
+"""
+Load test the search endpoint against a local Elasticsearch stand-in.
+
+Usage:
+    DATABASE_URL=postgres://... python benchmarks/search.py
+        [--requests 2000] [--queries 200] [--latency 0.02]
+        [--invalidate-every 500]
+
+The stand-in in `es_stub` answers `_search` requests with canned hits after
+`--latency` seconds. Queries are drawn from `--queries` area names with a
+Zipf-like distribution so that a few popular areas make up most of the
+traffic, like people searching for their own estate. The endpoint is run
+with the result cache off and on, reporting p50/p99 latency and the number
+of searches that reached Elasticsearch. `--invalidate-every` clears the
+cache as indexing new PDFs would. Needs a Postgres database, which holds the
+version of the index that cache keys include.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "kplc_interruptions.config.settings")
+os.environ.setdefault("CACHE_URL", "locmem://")
+
+from benchmarks.es_stub import ESStub  # noqa: E402
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(client, queries, weights, args, cache_timeout):
+    from django.conf import settings
+    from django.core.cache import cache
+
+    from kplc_interruptions.interruptions.search import (
+        invalidate_search_cache)
+
+    cache.clear()
+    settings.SEARCH_SETTINGS["CACHE_TIMEOUT"] = cache_timeout
+    rng = random.Random(0)
+    latencies = []
+    for n in range(args.requests):
+        if args.invalidate_every and n and n % args.invalidate_every == 0:
+            invalidate_search_cache()
+        query = rng.choices(queries, weights)[0]
+        start = time.perf_counter()
+        response = client.get("/api/interruptions/search/", {"q": query})
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.content
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--invalidate-every", type=int, default=500)
+    args = parser.parse_args()
+
+    with ESStub(args.latency) as server:
+        os.environ["ES_HOST"] = "127.0.0.1"
+        os.environ["ES_PORT"] = str(server.server_address[1])
+
+        import django
+
+        django.setup()
+
+        from django.test import Client
+        from django.test.utils import setup_test_environment
+
+        setup_test_environment()
+        client = Client()
+        queries = ["Area {}".format(n) for n in range(args.queries)]
+        weights = [1 / (n + 1) for n in range(args.queries)]
+
+        print("{:>6} {:>10} {:>10} {:>10}".format(
+            "cache", "p50 ms", "p99 ms", "searches"))
+        for name, cache_timeout in (("off", 0), ("on", 300)):
+            server.searches = 0
+            latencies = run(client, queries, weights, args, cache_timeout)
+            print("{:>6} {:>10.2f} {:>10.2f} {:>10}".format(
+                name, statistics.median(latencies) * 1000,
+                percentile(latencies, 0.99) * 1000, server.searches))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Local SMTP stub that accepts mail without delivering it.
+
+Counts the connections opened and the messages accepted. Recipients listed
+in `refused` are rejected with `550`. Optional latencies for opening a
+connection, which stands in for the TLS handshake and login, and for each
+command simulate a remote mail server.
+"""
+import socketserver
+import threading
+import time
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def reply(self, line):
+        time.sleep(self.server.latency)
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        time.sleep(self.server.connect_latency)
+        self.reply("220 localhost SMTP stub")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip(" <>")
+                if address in self.server.refused:
+                    self.reply("550 No such user")
+                else:
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with self.server.lock:
+                    self.server.messages += 1
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0, connect_latency=0.0, refused=()):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.refused = set(refused)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
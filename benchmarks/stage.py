@@ -0,0 +1,133 @@
+"""
+Benchmark staging scraped interruptions and PDFs in the database.
+
+Usage:
+    DATABASE_URL=postgres://... python benchmarks/stage.py
+        [--interruptions 2000] [--pdfs-per-interruption 2]
+        [--batch-size 100]
+
+Stages synthetic scraped records, without any HTTP, inside transactions
+that are rolled back. The baseline saves them a row at a time with
+`get_or_create` and a lookup per PDF link, as `stage_interruptions` used to,
+and is compared with `save_interruptions` and `save_interruption_pdfs`
+writing batches. Each run stages the records twice to include a re-scrape
+where every row already exists. Reports rows per second. PDFs are written to
+a temporary `MEDIA_ROOT`. Needs a Postgres database.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "kplc_interruptions.config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.files import File  # noqa: E402
+from django.db import transaction  # noqa: E402
+
+from kplc_interruptions.interruptions.models import (  # noqa: E402
+    Interruption, InterruptionPdf)
+from kplc_interruptions.scrape import (  # noqa: E402
+    iter_batches, save_interruption_pdfs, save_interruptions)
+
+
+def interruption_dicts(count):
+    return [
+        {
+            "title": "Interruptions - {}".format(n),
+            "link": "https://kplc.co.ke/content/item/{}".format(n),
+        }
+        for n in range(count)
+    ]
+
+
+def pdf_dicts(interruptions, per_interruption):
+    for interruption in interruptions:
+        for n in range(per_interruption):
+            pdf_file_temp = tempfile.NamedTemporaryFile()
+            content = "{} {}".format(interruption.link, n).encode("utf-8")
+            pdf_file_temp.write(b"%PDF-1.4\n" + content)
+            pdf_file_temp.seek(0)
+            yield interruption, {
+                "download_link": "{}/{}.pdf".format(interruption.link, n),
+                "download_link_text": "{}.pdf".format(n),
+                "pdf_filename": "{}_{}.pdf".format(
+                    interruption.link.rsplit("/", 1)[1], n),
+                "pdf_file_temp": pdf_file_temp,
+                "sha256": hashlib.sha256(content).hexdigest(),
+            }
+
+
+def stage_row_by_row(records, per_interruption, batch_size):
+    for interruption_dict in records:
+        Interruption.objects.get_or_create(
+            title=interruption_dict["title"], link=interruption_dict["link"])
+    for interruption, pdf_dict in pdf_dicts(
+            Interruption.objects.all(), per_interruption):
+        try:
+            InterruptionPdf.objects.get(
+                interruption=interruption,
+                pdf_link=pdf_dict["download_link"])
+        except InterruptionPdf.DoesNotExist:
+            pdf = InterruptionPdf(
+                interruption=interruption,
+                pdf_link=pdf_dict["download_link"],
+                pdf_link_name=pdf_dict["download_link_text"],
+                sha256=pdf_dict["sha256"])
+            pdf.duplicate_of = InterruptionPdf.objects.filter(
+                sha256=pdf.sha256, duplicate_of__isnull=True).first()
+            if pdf.duplicate_of:
+                pdf.pdf_file.name = pdf.duplicate_of.pdf_file.name
+            else:
+                pdf.pdf_file.save(
+                    pdf_dict["pdf_filename"], File(pdf_dict["pdf_file_temp"]),
+                    save=False)
+            pdf.save()
+        finally:
+            pdf_dict["pdf_file_temp"].close()
+
+
+def stage_in_batches(records, per_interruption, batch_size):
+    for batch in iter_batches(records, batch_size):
+        save_interruptions(batch)
+    for batch in iter_batches(
+            pdf_dicts(Interruption.objects.all(), per_interruption),
+            batch_size):
+        save_interruption_pdfs(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--interruptions", type=int, default=2000)
+    parser.add_argument("--pdfs-per-interruption", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    records = interruption_dicts(args.interruptions)
+    rows = args.interruptions * (1 + args.pdfs_per_interruption)
+    print("{:>10} {:>10} {:>10} {:>10}".format(
+        "staging", "pass", "seconds", "rows/s"))
+    with tempfile.TemporaryDirectory() as media_root:
+        settings.MEDIA_ROOT = media_root
+        for name, stage in (
+                ("row", stage_row_by_row), ("batch", stage_in_batches)):
+            with transaction.atomic():
+                for scrape_pass in ("new", "existing"):
+                    start = time.perf_counter()
+                    stage(records, args.pdfs_per_interruption, args.batch_size)
+                    elapsed = time.perf_counter() - start
+                    print("{:>10} {:>10} {:>10.2f} {:>10.0f}".format(
+                        name, scrape_pass, elapsed, rows / elapsed))
+                transaction.set_rollback(True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Local HTTP stub of the parts of KPLC's website the scraper touches.
+
+Serves paginated listing pages at `/category/view/50/<page>`, interruption
+item pages at `/content/item/<n>` that each link to a number of PDFs under
+`/img/full/`. Every response carries an ETag and conditional requests are
+answered with `304 Not Modified`. An optional per-request latency simulates
+network round trips so concurrency effects are visible on localhost.
+"""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LISTING_PAGE = """<html><body><main>{titles}</main>
+<ul class="pagination">{next}</ul></body></html>"""
+
+LISTING_TITLE = (
+    '<h2 class="generictitle"><a href="{url}">Interruptions - {item}</a></h2>')
+
+NEXT_LINK = '<li><a href="{url}" rel="next">&raquo;</a></li>'
+
+ITEM_PAGE = """<html><body><main>
+<div class="genericintro"><p>Interruption {item}</p></div>
+<div class="attachments">{links}</div>
+</main></body></html>"""
+
+PDF_LINK = '<a class="docicon" href="{url}">Interruptions - {item}.{n}.pdf</a>'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type):
+        time.sleep(self.server.latency)
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/category/view/50/"):
+            page = int(self.path.rsplit("/", 1)[1])
+            # newest items first, like the real listing
+            items = range(
+                self.server.items - 1 - page * self.server.items_per_page,
+                max(self.server.items - 1 - (page + 1) *
+                    self.server.items_per_page, -1),
+                -1)
+            titles = "".join(
+                LISTING_TITLE.format(url=self.server.item_url(item), item=item)
+                for item in items)
+            next_link = ""
+            if items and items[-1] > 0:
+                next_link = NEXT_LINK.format(
+                    url=self.server.listing_url(page + 1))
+            body = LISTING_PAGE.format(
+                titles=titles, next=next_link).encode("utf-8")
+            self.send_body(body, "text/html; charset=utf-8")
+        elif self.path.startswith("/content/item/"):
+            item = self.path.rsplit("/", 1)[1]
+            links = "".join(
+                PDF_LINK.format(
+                    url="{}/img/full/{}_{}.pdf".format(
+                        self.server.base_url, item, n),
+                    item=item, n=n)
+                for n in range(self.server.pdfs_per_item))
+            body = ITEM_PAGE.format(item=item, links=links).encode("utf-8")
+            self.send_body(body, "text/html; charset=utf-8")
+        elif self.path.startswith("/img/full/"):
+            self.send_body(self.server.pdf_body, "application/pdf")
+        else:
+            self.send_error(404)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, latency=0.0, pdfs_per_item=2, pdf_size=256 * 1024,
+                 items=64, items_per_page=10):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.items = items
+        self.items_per_page = items_per_page
+        self.pdfs_per_item = pdfs_per_item
+        self.pdf_body = b"%PDF-1.4\n" + b"0" * (pdf_size - 9)
+        self.base_url = "http://127.0.0.1:{}".format(self.server_address[1])
+
+    def listing_url(self, page=0):
+        return "{}/category/view/50/{}".format(self.base_url, page)
+
+    def item_url(self, item):
+        return "{}/content/item/{}".format(self.base_url, item)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,345 @@
+"""
+Benchmark the scrape, extract, index and notify path against synthetic
+fixtures and compare it with baselines recorded on the same machine.
+
+Usage:
+    DATABASE_URL=postgres://... python benchmarks/suite.py
+        [--repeat 3] [--latency 0.0] [--accounts 50]
+        [--update | --check [--tolerance 0.25]]
+
+The listing pages and interruption page in `benchmarks/fixtures/` are
+synthetic, hand written to follow the layout of KPLC's website rather than
+captured from it. They are served from a local HTTP server, with links to
+KPLC's website pointed at it and each interruption page linking to its own
+sample bulletins. Indexing goes to the Elasticsearch stand-in in `es_stub`
+and notifications to the SMTP stub. Each stage is timed on its own:
+
+    scrape_titles      `scrape_interruption_titles` over the listing pages
+    scrape_pdf_files   `scrape_interruption_pdf_files` for every interruption
+    download_pdf       `download_pdf` for every PDF link
+    extract            `extract_text_from_pdf` with one worker, uncached
+    index              `index_pending_pdf_texts`
+    notify             `process_notification_queue` without a send rate
+
+Rows are written inside a transaction that is rolled back after each run and
+files go to a temporary media root. The median of `--repeat` runs is
+reported per stage. `--update` stores the medians in
+`benchmarks/baselines.json` and `--check` exits with status 1 if a stage is
+slower than its baseline by more than `--tolerance`, so a regression fails
+the run. Baselines depend on the machine, so they are not committed: run
+`--update` once on the machine that runs `--check`. Needs a Postgres
+database and `pdftotext`.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "kplc_interruptions.config.settings")
+os.environ.setdefault("OUTGOING_EMAIL_SOURCE", "notifications@example.com")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from elasticsearch_dsl import connections  # noqa: E402
+
+from benchmarks.es_stub import ESStub  # noqa: E402
+from benchmarks.sample_pdfs import write_corpus  # noqa: E402
+from benchmarks.smtp_stub import SMTPStub  # noqa: E402
+from kplc_interruptions.interruptions.indexing import index_pending_pdf_texts  # noqa: E402,E501
+from kplc_interruptions.interruptions.models import (  # noqa: E402
+    Interruption, InterruptionArea)
+from kplc_interruptions.notifications.models import NotificationAccount  # noqa: E402,E501
+from kplc_interruptions.notifications.tasks import process_notification_queue  # noqa: E402,E501
+from kplc_interruptions.pdf_extract_text import extract_text_from_pdf  # noqa: E402,E501
+from kplc_interruptions.scrape import (  # noqa: E402
+    crawl_interruption_pdf_files, download_pdf, save_interruption_pdfs,
+    save_interruptions, scrape_interruption_pdf_files,
+    scrape_interruption_pdf_links, scrape_interruption_titles)
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, "fixtures")
+BASELINES_PATH = os.path.join(BENCHMARKS_DIR, "baselines.json")
+
+KPLC_URL = "https://kplc.co.ke"
+LISTING_PATH = "/category/view/50/planned-power-interruptions"
+# listing page fixtures by the page number at the end of their URL
+LISTING_PAGES = {
+    "": "listing_page_1.html",
+    "0": "listing_page_1.html",
+    "1": "listing_page_2.html",
+    "2": "listing_page_last.html",
+}
+STAGES = [
+    "scrape_titles", "scrape_pdf_files", "download_pdf", "extract", "index",
+    "notify",
+]
+# seconds a stage may exceed its baseline by regardless of the tolerance,
+# so that stages taking a few milliseconds don't fail on noise
+NOISE_FLOOR = 0.005
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type):
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.startswith(LISTING_PATH):
+            page = path[len(LISTING_PATH):].strip("/")
+            if page not in LISTING_PAGES:
+                self.send_error(404)
+                return
+            self.send_body(
+                self.server.fixture(LISTING_PAGES[page]),
+                "text/html; charset=utf-8")
+        elif path.startswith("/content/item/"):
+            item = path.split("/")[3]
+            # each interruption links to PDFs of its own
+            body = self.server.fixture("interruption_page.html").replace(
+                b"/img/full/", "/img/full/{}_".format(item).encode("utf-8"))
+            self.send_body(body, "text/html; charset=utf-8")
+        elif path.startswith("/img/full/"):
+            self.send_body(self.server.pdf_body(path), "application/pdf")
+        else:
+            self.send_error(404)
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    Serve the synthetic pages of KPLC's website in `benchmarks/fixtures/`
+    with sample bulletins as their PDFs.
+
+    Every PDF path is served a bulletin of its own, so no PDF is skipped as a
+    duplicate of another. Responses carry no validators so every run fetches
+    and parses the pages again.
+    """
+    daemon_threads = True
+
+    def __init__(self, pdf_paths, latency=0.0):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.latency = latency
+        self.base_url = "http://127.0.0.1:{}".format(self.server_address[1])
+        self.fixtures = {}
+        for name in set(LISTING_PAGES.values()) | {"interruption_page.html"}:
+            with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+                self.fixtures[name] = f.read().replace(
+                    KPLC_URL.encode("utf-8"), self.base_url.encode("utf-8"))
+        self.pdf_bodies = []
+        for path in pdf_paths:
+            with open(path, "rb") as f:
+                self.pdf_bodies.append(f.read())
+        self.pdf_lock = threading.Lock()
+        self.pdfs = {}
+
+    def fixture(self, name):
+        return self.fixtures[name]
+
+    def pdf_body(self, path):
+        with self.pdf_lock:
+            number = self.pdfs.setdefault(path, len(self.pdfs))
+        return self.pdf_bodies[number % len(self.pdf_bodies)]
+
+    def listing_url(self):
+        return self.base_url + LISTING_PATH
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+def timed(timings, stage, function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    timings[stage] = time.perf_counter() - start
+    return result
+
+
+def close_pdf_files(pdf_dicts):
+    for pdf_dict in pdf_dicts:
+        pdf_dict["pdf_file_temp"].close()
+
+
+def run(server, es_stub, smtp_stub, accounts):
+    """
+    Run every stage once, rolling back what was written.
+
+    Returns the seconds taken by each stage and counts to check the run
+    against.
+    """
+    timings = {}
+    es_stub.documents = smtp_stub.messages = 0
+    interruption_dicts = timed(
+        timings, "scrape_titles",
+        lambda: list(scrape_interruption_titles(server.listing_url())))
+    links = [d["link"] for d in interruption_dicts]
+
+    def scrape_pdf_files():
+        pdf_dicts = []
+        for link in links:
+            pdf_dicts.extend(scrape_interruption_pdf_files(link))
+        return pdf_dicts
+
+    close_pdf_files(timed(timings, "scrape_pdf_files", scrape_pdf_files))
+
+    download_links = [
+        link_dict["download_link"]
+        for link in links for link_dict in scrape_interruption_pdf_links(link)]
+
+    def download_pdfs():
+        for download_link in download_links:
+            download_pdf(download_link)[1].close()
+
+    timed(timings, "download_pdf", download_pdfs)
+
+    with tempfile.TemporaryDirectory() as media_root, \
+            override_settings(MEDIA_ROOT=media_root), transaction.atomic():
+        save_interruptions(interruption_dicts)
+        pdfs = save_interruption_pdfs(list(crawl_interruption_pdf_files(
+            Interruption.objects.order_by("id"))))
+
+        timed(timings, "extract", extract_text_from_pdf, workers=1)
+        timed(timings, "index", index_pending_pdf_texts)
+
+        areas = list(InterruptionArea.objects.values_list(
+            "area", flat=True).distinct().order_by("area")[:5])
+        for n in range(accounts):
+            NotificationAccount.objects.create(
+                email="account{}@example.com".format(n),
+                areas=[areas[n % len(areas)]], is_active=True)
+        timed(timings, "notify", process_notification_queue, send_rate=0)
+        transaction.set_rollback(True)
+
+    counts = {
+        "interruptions": len(interruption_dicts),
+        "pdfs": len(pdfs),
+        "documents indexed": es_stub.documents,
+        "emails": smtp_stub.messages,
+    }
+    return timings, counts
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return None
+    with open(BASELINES_PATH) as f:
+        return json.load(f)
+
+
+def save_baselines(options, medians):
+    with open(BASELINES_PATH, "w") as f:
+        json.dump({
+            "options": options,
+            "stages": {
+                stage: round(seconds, 4) for stage, seconds in medians.items()
+            },
+        }, f, indent=4, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--update", action="store_true")
+    mode.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+    # the options that change the work done, baselines only compare with
+    # runs made with the same ones
+    options = {"latency": args.latency, "accounts": args.accounts}
+
+    baselines = load_baselines()
+    if args.check:
+        if baselines is None:
+            print("No baselines, record them with --update")
+            sys.exit(1)
+        if baselines["options"] != options:
+            print("Baselines were recorded with {}".format(
+                baselines["options"]))
+            sys.exit(1)
+
+    # every extraction and download is a fresh one
+    settings.EXTRACT_SETTINGS["CACHE_DIR"] = ""
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        # two PDFs for each of the interruptions on the listing pages
+        pdf_paths = write_corpus(corpus_dir, 60)
+        es_stub = ESStub(args.latency)
+        smtp_stub = SMTPStub(args.latency)
+        with FixtureServer(pdf_paths, args.latency) as server, es_stub, \
+                smtp_stub:
+            connections.create_connection(
+                settings.ES_SETTINGS["ALIAS"], hosts=[{
+                    "host": es_stub.server_address[0],
+                    "port": es_stub.server_address[1]
+                }])
+            settings.EMAIL_HOST, settings.EMAIL_PORT = smtp_stub.server_address
+            settings.EMAIL_USE_TLS = False
+
+            runs = []
+            for _ in range(args.repeat):
+                timings, counts = run(
+                    server, es_stub, smtp_stub, args.accounts)
+                runs.append(timings)
+            print("Each run: {}".format(", ".join(
+                "{} {}".format(value, name)
+                for name, value in counts.items())))
+
+    medians = {
+        stage: statistics.median(timings[stage] for timings in runs)
+        for stage in STAGES
+    }
+    stage_baselines = (baselines or {}).get("stages", {})
+    print("{:>18} {:>10} {:>10} {:>8}".format(
+        "stage", "ms", "base ms", "change"))
+    regressions = []
+    for stage, seconds in medians.items():
+        baseline = stage_baselines.get(stage)
+        if baseline is None:
+            print("{:>18} {:>10.1f} {:>10} {:>8}".format(
+                stage, seconds * 1000, "-", "-"))
+            continue
+        print("{:>18} {:>10.1f} {:>10.1f} {:>+8.0%}".format(
+            stage, seconds * 1000, baseline * 1000,
+            seconds / baseline - 1 if baseline else 0))
+        if seconds > baseline * (1 + args.tolerance) + NOISE_FLOOR:
+            regressions.append(stage)
+
+    if args.update:
+        save_baselines(options, medians)
+        print("Baselines written to {}".format(BASELINES_PATH))
+    elif args.check and regressions:
+        print("Slower than the baselines: {}".format(", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+In-process metrics rendered in the Prometheus text format.
+
+Metrics are declared in `METRICS` and recorded with `inc`, `set_gauge`,
+`observe` and `timer`. They are kept per process, so the web process serves
+its own at `/metrics` while long running commands serve theirs with
+`start_metrics_server` on `METRICS_SETTINGS["PORT"]`. `summary` formats them
+for the end of a run.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+
+LOGGER = logging.getLogger(__name__)
+
+# upper bounds in seconds of the buckets of latency histograms
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# name: (type, help)
+METRICS = {
+    "kplc_http_request_seconds": (
+        "histogram", "Latency of scraper HTTP requests"),
+    "kplc_http_downloaded_bytes_total": (
+        "counter", "Bytes downloaded by the scraper"),
+    "kplc_pages_parsed_total": (
+        "counter", "Listing and interruption pages parsed"),
+    "kplc_pdfs_downloaded_total": ("counter", "PDFs downloaded"),
+    "kplc_pdfs_extracted_total": (
+        "counter", "PDFs whose text was extracted, by result"),
+    "kplc_pdf_extract_seconds": (
+        "histogram", "Time taken to extract the text of a PDF"),
+    "kplc_es_request_seconds": (
+        "histogram", "Latency of Elasticsearch bulk and index requests"),
+    "kplc_es_documents_total": (
+        "counter", "Documents sent to Elasticsearch, by result"),
+    "kplc_pipeline_queue_depth": (
+        "gauge", "Items waiting between two pipeline stages"),
+    "kplc_pipeline_batch_seconds": (
+        "histogram", "Time a pipeline stage takes to handle a batch"),
+    "kplc_notifications_total": (
+        "counter", "Notification emails, by result"),
+    "kplc_smtp_send_seconds": (
+        "histogram", "Time taken to send a notification email"),
+    "kplc_search_seconds": (
+        "histogram", "Time taken to answer a search request"),
+}
+
+_LOCK = threading.Lock()
+# name: {labels: value}, labels are sorted `(name, value)` tuples and the
+# value of a histogram is a list of its bucket counts, sum and count
+_VALUES = {}
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """
+    Add `value` to a counter.
+    """
+    key = label_key(labels)
+    with _LOCK:
+        values = _VALUES.setdefault(name, {})
+        values[key] = values.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """
+    Set the value of a gauge.
+    """
+    with _LOCK:
+        _VALUES.setdefault(name, {})[label_key(labels)] = value
+
+
+def observe(name, value, **labels):
+    """
+    Record a value, usually seconds, in a histogram.
+    """
+    key = label_key(labels)
+    with _LOCK:
+        values = _VALUES.setdefault(name, {})
+        histogram = values.get(key)
+        if histogram is None:
+            histogram = values[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [
+                0, 0]
+        # buckets are stored per bound and made cumulative when rendered,
+        # the last bucket is +Inf
+        histogram[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    """
+    Record the seconds taken by the block in a histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def reset():
+    with _LOCK:
+        _VALUES.clear()
+
+
+def snapshot():
+    with _LOCK:
+        return {
+            name: {
+                key: list(value) if isinstance(value, list) else value
+                for key, value in metric_values.items()}
+            for name, metric_values in _VALUES.items()}
+
+
+def format_labels(key, extra=()):
+    labels = key + tuple(extra)
+    if not labels:
+        return ""
+    return "{" + ",".join(
+        '{}="{}"'.format(
+            name, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels) + "}"
+
+
+def render():
+    """
+    Render the recorded metrics in the Prometheus text format.
+    """
+    values = snapshot()
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append("# HELP {} {}".format(name, help_text))
+        lines.append("# TYPE {} {}".format(name, metric_type))
+        for key, value in sorted(values.get(name, {}).items()):
+            if metric_type != "histogram":
+                lines.append("{}{} {}".format(name, format_labels(key), value))
+                continue
+
+            cumulative = 0
+            bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+            for bound, bucket_count in zip(bounds, value):
+                cumulative += bucket_count
+                lines.append("{}_bucket{} {}".format(
+                    name, format_labels(key, [("le", bound)]), cumulative))
+            lines.append("{}_sum{} {}".format(
+                name, format_labels(key), value[-2]))
+            lines.append("{}_count{} {}".format(
+                name, format_labels(key), value[-1]))
+    return "\n".join(lines) + "\n"
+
+
+def summary(elapsed=None):
+    """
+    Summarize the recorded metrics for the end of a run.
+
+    Counters are given with their rate when `elapsed` seconds are passed and
+    histograms with their count and mean.
+
+    Returns a list of lines.
+    """
+    values = snapshot()
+    lines = []
+    for name, (metric_type, _) in METRICS.items():
+        for key, value in sorted(values.get(name, {}).items()):
+            label = name + format_labels(key)
+            if metric_type == "histogram":
+                lines.append("{}: {} in {:.2f}s, {:.4f}s mean".format(
+                    label, value[-1], value[-2], value[-2] / value[-1]))
+            elif metric_type == "counter" and elapsed:
+                lines.append("{}: {} ({:.1f}/s)".format(
+                    label, value, value / elapsed))
+            else:
+                lines.append("{}: {}".format(label, value))
+    return lines
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port=None):
+    """
+    Serve the metrics of this process over HTTP from a background thread.
+
+    Params:
+        port (int): Port to listen on. Defaults to `METRICS_SETTINGS["PORT"]`,
+            nothing is served if it is 0.
+
+    Returns the server, or `None` if nothing is served.
+    """
+    port = port if port is not None else settings.METRICS_SETTINGS["PORT"]
+    if not port:
+        return None
+
+    server = ThreadingHTTPServer(
+        (settings.METRICS_SETTINGS["HOST"], port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics", daemon=True).start()
+    LOGGER.info("Serving metrics", extra={"port": server.server_port})
+    return server
@@ -1,9 +1,27 @@
+import os
+import time
 import uuid
 
 from django.db import models
 from django.utils import timezone
 
 
+def uuid7():
+    """
+    Generate a time ordered UUID laid out like a version 7 UUID: the Unix
+    time in milliseconds in the first 48 bits followed by random bits.
+
+    Rows keyed by these are appended to the end of the primary key index
+    instead of being scattered over it like `uuid4` keys.
+    """
+    value = (time.time_ns() // 1000000) << 80
+    value |= int.from_bytes(os.urandom(10), "big")
+    # version 7 and the RFC 4122 variant
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return uuid.UUID(int=value)
+
+
 class AbstractBase(models.Model):
     """
     Contains common fields required in each model.
@@ -21,3 +39,27 @@ class AbstractBase(models.Model):
     class Meta:
         abstract = True
         ordering = ("-updated", "-created",)
+
+
+class TimeOrderedBase(AbstractBase):
+    """
+    Common fields for insert heavy models.
+
+    Ids are time ordered and `created` and `updated` are not indexed on
+    their own. Models should add a single index for the default ordering,
+    in ascending order so that new rows are appended to it:
+
+        models.Index(fields=["updated", "created"], name=...)
+    """
+    id = models.UUIDField(
+        default=uuid7, editable=False, unique=True, primary_key=True,
+        help_text="Unique identifier of an object")
+    created = models.DateTimeField(
+        default=timezone.now,
+        help_text="Date and time an object was created")
+    updated = models.DateTimeField(
+        default=timezone.now,
+        help_text="Date and time an object was updated")
+
+    class Meta(AbstractBase.Meta):
+        abstract = True
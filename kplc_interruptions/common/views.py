@@ -0,0 +1,36 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from kplc_interruptions.common import metrics
+
+
+def metrics_allowed(request):
+    """
+    Check whether a request may read the metrics.
+
+    Requests from `METRICS_SETTINGS["ALLOWED_IPS"]` are allowed, and so are
+    requests with `METRICS_SETTINGS["TOKEN"]` as their bearer token if one is
+    set.
+    """
+    metrics_settings = settings.METRICS_SETTINGS
+    if request.META.get("REMOTE_ADDR") in metrics_settings["ALLOWED_IPS"]:
+        return True
+    if not metrics_settings["TOKEN"]:
+        return False
+    return hmac.compare_digest(
+        request.META.get("HTTP_AUTHORIZATION", "").encode("utf-8"),
+        "Bearer {}".format(metrics_settings["TOKEN"]).encode("utf-8"))
+
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Metrics of the web process in the Prometheus text format.
+    """
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4")
@@ -90,6 +90,14 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': env.dj_cache_url("CACHE_URL", "locmem://")
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -128,6 +136,33 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Logging
+# https://docs.djangoproject.com/en/2.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '%(asctime)s %(levelname)s [%(threadName)s] '
+                      '%(name)s: %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        # progress of the pipeline and the commands is logged at INFO
+        'kplc_interruptions': {
+            'handlers': ['console'],
+            'level': env("LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
 # Elastic search settings
 ES_SETTINGS = {
     'ALIAS': env.str("ES_ALIAS", "kplc_interruptions"),
@@ -135,6 +170,95 @@ ES_SETTINGS = {
     'PORT': env.int("ES_PORT", 9200),
 }
 
+# Scraper settings
+SCRAPE_SETTINGS = {
+    # number of threads used to fetch interruption pages and PDFs
+    'WORKERS': env.int("SCRAPE_WORKERS", 1),
+    # maximum number of in-flight requests to any single host
+    'PER_HOST_CONCURRENCY': env.int("SCRAPE_PER_HOST_CONCURRENCY", 4),
+    # incremental runs revisit interruptions changed within this many days
+    'INCREMENTAL_RECENT_DAYS': env.int("SCRAPE_INCREMENTAL_RECENT_DAYS", 7),
+    # seconds to wait for a connection or a read before retrying
+    'TIMEOUT': env.float("SCRAPE_TIMEOUT", 30),
+    # retries for timeouts and 5xx responses, with exponential backoff
+    'RETRIES': env.int("SCRAPE_RETRIES", 3),
+    'BACKOFF_FACTOR': env.float("SCRAPE_BACKOFF_FACTOR", 0.5),
+    # seconds ETag/Last-Modified validators and parsed pages are used for
+    'VALIDATOR_CACHE_TIMEOUT': env.int(
+        "SCRAPE_VALIDATOR_CACHE_TIMEOUT", 30 * 24 * 60 * 60),
+    # backend used to parse listing pages, one of "html.parser", "stream",
+    # "lxml" or "selectolax"
+    'LISTING_PARSER': env.str("SCRAPE_LISTING_PARSER", "html.parser"),
+    # number of scraped interruptions or downloaded PDFs written at once
+    'STAGE_BATCH_SIZE': env.int("SCRAPE_STAGE_BATCH_SIZE", 100),
+}
+
+# Search API settings
+SEARCH_SETTINGS = {
+    # number of results per page
+    'PAGE_SIZE': env.int("SEARCH_PAGE_SIZE", 10),
+    # highest page that can be requested, deep pages are costly to serve
+    'MAX_PAGE': env.int("SEARCH_MAX_PAGE", 100),
+    # seconds a search result is cached, indexing new texts clears the cache
+    'CACHE_TIMEOUT': env.int("SEARCH_CACHE_TIMEOUT", 300),
+}
+
+# Indexing settings
+INDEX_SETTINGS = {
+    # number of pending texts sent to Elasticsearch per bulk request
+    'BATCH_SIZE': env.int("INDEX_BATCH_SIZE", 500),
+    # retries of a failed bulk request, with exponential backoff
+    'MAX_RETRIES': env.int("INDEX_MAX_RETRIES", 3),
+    'INITIAL_BACKOFF': env.float("INDEX_INITIAL_BACKOFF", 2),
+    # number of bulk requests sent at a time when reindexing
+    'THREADS': env.int("INDEX_THREADS", 4),
+}
+
+# PDF text extraction settings
+EXTRACT_SETTINGS = {
+    # number of processes used to extract text from PDFs
+    'WORKERS': env.int("EXTRACT_WORKERS", 1),
+    # seconds allowed for extracting the text of a single PDF
+    'TIMEOUT': env.int("EXTRACT_TIMEOUT", 120),
+    # number of PDFs extracted and written to the database at once
+    'BATCH_SIZE': env.int("EXTRACT_BATCH_SIZE", 100),
+    # extraction of a PDF stops after this many pages or bytes of text
+    'MAX_PAGES': env.int("EXTRACT_MAX_PAGES", 200),
+    'MAX_BYTES': env.int("EXTRACT_MAX_BYTES", 5 * 1024 * 1024),
+    # directory extracted texts are cached in by the content of their PDF,
+    # off by default, set EXTRACT_CACHE_DIR to a writable data directory
+    # outside of the installed package e.g. /var/lib/kplc/extraction_cache
+    'CACHE_DIR': env("EXTRACT_CACHE_DIR", ""),
+    # part of the cache keys, change it to drop cached texts after upgrading
+    # poppler
+    'CACHE_VERSION': env("EXTRACT_CACHE_VERSION", "1"),
+}
+
+# Settings of the pipeline running scraping, extraction and indexing together
+PIPELINE_SETTINGS = {
+    # number of threads sending texts to Elasticsearch
+    'INDEX_WORKERS': env.int("PIPELINE_INDEX_WORKERS", 1),
+    # most items waiting between two stages, a full queue holds back the
+    # stage before it
+    'QUEUE_SIZE': env.int("PIPELINE_QUEUE_SIZE", 100),
+    # most items a stage saves, extracts or indexes at a time
+    'BATCH_SIZE': env.int("PIPELINE_BATCH_SIZE", 10),
+    # seconds a stage waits for a batch to fill up before handling it
+    'BATCH_WAIT': env.float("PIPELINE_BATCH_WAIT", 1),
+}
+
+# Metrics settings
+METRICS_SETTINGS = {
+    # port long running commands serve their metrics on, 0 to not serve them
+    'PORT': env.int("METRICS_PORT", 0),
+    'HOST': env.str("METRICS_HOST", "127.0.0.1"),
+    # clients allowed to read `/metrics` of the web process, others need
+    # the token as a bearer token, no token only allows the listed IPs
+    'ALLOWED_IPS': env.list(
+        "METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"]),
+    'TOKEN': env.str("METRICS_TOKEN", ""),
+}
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
@@ -142,7 +266,33 @@ EMAIL_HOST = env('EMAIL_HOST', "localhost")
 EMAIL_PORT = env.int('EMAIL_PORT', 25)
 EMAIL_HOST_USER = env.str('EMAIL_HOST_USER', "")
 EMAIL_HOST_PASSWORD = env.str('EMAIL_HOST_PASSWORD', "")
-EMAIL_USE_TLS = True
+EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', True)
 
 OUTGOING_EMAIL_SOURCE = "KPLC Interruptions <{}>".format(
     env.str('OUTGOING_EMAIL_SOURCE', ""))
+
+# Notification delivery settings
+NOTIFY_SETTINGS = {
+    # emails sent per second over the SMTP connection, 0 for no limit
+    'SEND_RATE': env.float("NOTIFY_SEND_RATE", 10),
+    # number of notification logs updated at once
+    'BATCH_SIZE': env.int("NOTIFY_BATCH_SIZE", 500),
+    # number of queued PDFs a worker claims and sends out at a time, in
+    # digest mode all the PDFs of a window should fit in a batch
+    'QUEUE_BATCH_SIZE': env.int("NOTIFY_QUEUE_BATCH_SIZE", 50),
+    # seconds PDFs are gathered for before each account gets one email
+    # listing them, 0 sends an email per PDF
+    'DIGEST_WINDOW': env.int("NOTIFY_DIGEST_WINDOW", 0),
+    # a queued PDF is given up on after this many failed attempts, retries
+    # wait RETRY_BACKOFF seconds, doubling after each attempt
+    'MAX_ATTEMPTS': env.int("NOTIFY_MAX_ATTEMPTS", 5),
+    'RETRY_BACKOFF': env.int("NOTIFY_RETRY_BACKOFF", 60),
+    # seconds a worker has to send out the PDFs it claimed before other
+    # workers can claim them again, the claim is renewed every
+    # CLAIM_RENEW_EVERY emails and whenever half of it has passed
+    'CLAIM_LEASE': env.int("NOTIFY_CLAIM_LEASE", 600),
+    'CLAIM_RENEW_EVERY': env.int("NOTIFY_CLAIM_RENEW_EVERY", 100),
+    # spelling mistakes tolerated in long area names when matching PDF
+    # texts, 0 only matches the exact spelling
+    'FUZZY_MAX_EDITS': env.int("NOTIFY_FUZZY_MAX_EDITS", 0),
+}
@@ -14,8 +14,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from kplc_interruptions.common.views import prometheus_metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', prometheus_metrics, name='metrics'),
+    path('api/interruptions/',
+         include('kplc_interruptions.interruptions.urls')),
 ]
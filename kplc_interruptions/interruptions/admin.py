@@ -0,0 +1,23 @@
+from django.contrib import admin
+
+from kplc_interruptions.interruptions.models import (
+    Interruption, InterruptionPdf)
+
+
+class InterruptionPdfInline(admin.TabularInline):
+    model = InterruptionPdf
+    fields = ("pdf_link_name", "pdf_link", "pdf_file", "duplicate_of")
+    readonly_fields = fields
+    fk_name = "interruption"
+    extra = 0
+    can_delete = False
+
+
+@admin.register(Interruption)
+class InterruptionAdmin(admin.ModelAdmin):
+    list_display = (
+        "title", "interruption_date", "interruption_end_date", "created")
+    date_hierarchy = "interruption_date"
+    search_fields = ("title",)
+    readonly_fields = ("interruption_date", "interruption_end_date")
+    inlines = (InterruptionPdfInline,)
@@ -1,5 +1,5 @@
 from django.conf import settings
-from elasticsearch_dsl import Document, Text, analyzer
+from elasticsearch_dsl import Date, Document, Keyword, Text, analyzer
 
 
 pdf_text_analyzer = analyzer(
@@ -10,6 +10,11 @@ pdf_text_analyzer = analyzer(
 
 class InterruptionPdfTextDoc(Document):
     pdf_text = Text(analyzer=pdf_text_analyzer)
+    title = Text()
+    pdf_link = Keyword(index=False)
+    created = Date()
+    interruption_date = Date()
+    interruption_end_date = Date()
 
     class Index:
         name = "kplc_interruptions"
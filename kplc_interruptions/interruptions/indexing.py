@@ -0,0 +1,236 @@
+import logging
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from elasticsearch.exceptions import ConnectionError, TransportError
+from elasticsearch.helpers import parallel_bulk, streaming_bulk
+from elasticsearch_dsl import Index, connections
+
+from kplc_interruptions.common import metrics
+from kplc_interruptions.interruptions.documents import InterruptionPdfTextDoc
+from kplc_interruptions.interruptions.models import InterruptionPdfText
+from kplc_interruptions.interruptions.search import invalidate_search_cache
+
+LOGGER = logging.getLogger(__name__)
+
+# fields read by `InterruptionPdfText.to_document`
+DOCUMENT_FIELDS = (
+    "id", "pdf_text", "pdf__pdf_link", "pdf__created",
+    "pdf__interruption__title", "pdf__interruption__interruption_date",
+    "pdf__interruption__interruption_end_date")
+
+
+class ReindexError(Exception):
+    pass
+
+
+def bulk_index_pdf_texts(client, pdf_texts, max_retries, initial_backoff):
+    """
+    Index a batch of texts, retrying the whole batch on connection errors.
+
+    Returns the ids of the texts that were indexed.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            indexed_ids = []
+            with metrics.timer("kplc_es_request_seconds", operation="bulk"):
+                for ok, item in streaming_bulk(
+                        client, (
+                            pdf_text.to_document().to_dict(include_meta=True)
+                            for pdf_text in pdf_texts),
+                        chunk_size=len(pdf_texts), max_retries=max_retries,
+                        initial_backoff=initial_backoff,
+                        raise_on_error=False):
+                    if ok:
+                        indexed_ids.append(item["index"]["_id"])
+                    else:
+                        LOGGER.error("Error indexing PDF text", extra=item)
+            metrics.inc(
+                "kplc_es_documents_total", len(indexed_ids), result="indexed")
+            metrics.inc(
+                "kplc_es_documents_total",
+                len(pdf_texts) - len(indexed_ids), result="failed")
+            return indexed_ids
+        except (ConnectionError, TransportError):
+            if attempt == max_retries:
+                raise
+            LOGGER.warning(
+                "Error sending bulk request, retrying", exc_info=True)
+            time.sleep(initial_backoff * 2 ** attempt)
+
+
+def pending_pdf_texts():
+    """
+    Texts waiting to be indexed, with the fields of their documents. Texts
+    of duplicate PDFs are searched through their original and not indexed.
+    """
+    pdf_texts = InterruptionPdfText.objects.filter(
+        indexed_on__isnull=True, pdf__duplicate_of__isnull=True)
+    return pdf_texts.select_related("pdf__interruption").only(
+        *DOCUMENT_FIELDS).order_by("id")
+
+
+def index_pdf_texts(client, pdf_texts, started):
+    """
+    Index a batch of texts and mark them as indexed.
+
+    Texts saved again after `started`, while their batch was in flight, stay
+    pending.
+
+    Params:
+        client (Elasticsearch): Client to send the bulk requests with.
+        pdf_texts (list): `InterruptionPdfText` objects loaded with
+            `pending_pdf_texts`.
+        started (datetime): When the texts were read from the database.
+
+    Returns the number of texts marked as indexed.
+    """
+    indexed_ids = bulk_index_pdf_texts(
+        client, pdf_texts, settings.INDEX_SETTINGS["MAX_RETRIES"],
+        settings.INDEX_SETTINGS["INITIAL_BACKOFF"])
+    indexed = InterruptionPdfText.objects.filter(
+        id__in=indexed_ids, indexed_on__isnull=True,
+        updated__lt=started).update(indexed_on=timezone.now())
+    if indexed_ids:
+        invalidate_search_cache()
+    return indexed
+
+
+def index_pending_pdf_texts(batch_size=None):
+    """
+    Index the texts that were saved since they were last indexed.
+
+    Pending texts are walked in id order and sent in bulk requests of
+    `batch_size`, then marked as indexed. A text saved again while its batch
+    is in flight stays pending. Texts that fail to index stay pending and are
+    retried on the next run.
+
+    Params:
+        batch_size (int): Number of texts per bulk request. Defaults to
+            `INDEX_SETTINGS["BATCH_SIZE"]`.
+
+    Returns the number of texts indexed.
+    """
+    batch_size = batch_size or settings.INDEX_SETTINGS["BATCH_SIZE"]
+    client = connections.get_connection(settings.ES_SETTINGS["ALIAS"])
+
+    pending = pending_pdf_texts()
+    indexed = 0
+    last_id = None
+    while True:
+        batch = pending if last_id is None else pending.filter(id__gt=last_id)
+        started = timezone.now()
+        pdf_texts = list(batch[:batch_size])
+        if not pdf_texts:
+            return indexed
+
+        indexed += index_pdf_texts(client, pdf_texts, started)
+        last_id = pdf_texts[-1].id
+        LOGGER.info("Indexed %s PDF texts", indexed)
+
+
+def create_versioned_index(name):
+    """
+    Create a new index for `InterruptionPdfTextDoc` named after `name` and
+    the current time, with refreshes turned off while it is being filled.
+    """
+    versioned_name = "{}-{}".format(
+        name, timezone.now().strftime("%Y%m%d%H%M%S"))
+    index = Index(versioned_name, using=settings.ES_SETTINGS["ALIAS"])
+    index.document(InterruptionPdfTextDoc)
+    index.settings(refresh_interval="-1")
+    index.create()
+    return index
+
+
+def swap_alias(client, name, versioned_name):
+    """
+    Point the `name` alias at `versioned_name` in one atomic request.
+
+    An index created as `name` before aliases were used is removed in the
+    same request. Returns the names of the indices the alias pointed to.
+    """
+    actions = [{"add": {"index": versioned_name, "alias": name}}]
+    old_names = []
+    if client.indices.exists_alias(name=name):
+        old_names = list(client.indices.get_alias(name=name))
+        actions.extend(
+            {"remove": {"index": old_name, "alias": name}}
+            for old_name in old_names)
+    elif client.indices.exists(index=name):
+        actions.append({"remove_index": {"index": name}})
+    client.indices.update_aliases(body={"actions": actions})
+    return old_names
+
+
+def reindex_pdf_texts(chunk_size=None, thread_count=None):
+    """
+    Rebuild the search index without taking search offline.
+
+    The texts are indexed into a new versioned index with `parallel_bulk`
+    while the `kplc_interruptions` alias keeps serving the old one. The alias
+    is swapped once every text is indexed and the old indices are deleted.
+    Texts saved during the reindex are marked pending so that
+    `index_pending_pdf_texts` sends them to the new index.
+
+    Params:
+        chunk_size (int): Number of texts per bulk request. Defaults to
+            `INDEX_SETTINGS["BATCH_SIZE"]`.
+        thread_count (int): Number of bulk requests sent at a time. Defaults
+            to `INDEX_SETTINGS["THREADS"]`.
+
+    Returns the name of the new index. Raises `ReindexError` and deletes the
+    new index when any text fails to index.
+    """
+    chunk_size = chunk_size or settings.INDEX_SETTINGS["BATCH_SIZE"]
+    thread_count = thread_count or settings.INDEX_SETTINGS["THREADS"]
+    client = connections.get_connection(settings.ES_SETTINGS["ALIAS"])
+    name = InterruptionPdfTextDoc._index._name
+
+    started = timezone.now()
+    index = create_versioned_index(name)
+    pdf_texts = InterruptionPdfText.objects.filter(
+        pdf__duplicate_of__isnull=True).select_related(
+        "pdf__interruption").only(*DOCUMENT_FIELDS)
+    total = pdf_texts.count()
+
+    def actions():
+        for pdf_text in pdf_texts.iterator(chunk_size=chunk_size):
+            action = pdf_text.to_document().to_dict(include_meta=True)
+            action["_index"] = index._name
+            yield action
+
+    indexed = failed = 0
+    start_time = time.monotonic()
+    for ok, item in parallel_bulk(
+            client, actions(), thread_count=thread_count,
+            chunk_size=chunk_size, raise_on_error=False):
+        if ok:
+            indexed += 1
+            metrics.inc("kplc_es_documents_total", result="indexed")
+        else:
+            failed += 1
+            metrics.inc("kplc_es_documents_total", result="failed")
+            LOGGER.error("Error indexing PDF text", extra=item)
+        if (indexed + failed) % chunk_size == 0 or indexed + failed == total:
+            elapsed = time.monotonic() - start_time
+            LOGGER.info(
+                "Indexed %s of %s PDF texts (%.0f docs/s)", indexed, total,
+                indexed / elapsed if elapsed else 0)
+
+    if failed:
+        index.delete()
+        raise ReindexError(
+            "Failed to index {} PDF texts, {} was deleted".format(
+                failed, index._name))
+
+    index.put_settings(body={"index": {"refresh_interval": None}})
+    index.refresh()
+    old_names = swap_alias(client, name, index._name)
+    invalidate_search_cache()
+    InterruptionPdfText.objects.filter(
+        updated__gte=started).update(indexed_on=None)
+    for old_name in old_names:
+        client.indices.delete(index=old_name)
+    return index._name
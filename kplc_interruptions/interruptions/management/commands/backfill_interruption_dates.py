@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from kplc_interruptions.interruptions.models import Interruption
+
+
+class Command(BaseCommand):
+    help = "Parse the dates of stored interruptions from their titles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Parse the dates of interruptions that already have them")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of interruptions updated at a time")
+
+    def handle(self, *args, **options):
+        interruptions = Interruption.objects.only("id", "title").order_by()
+        if not options["all"]:
+            interruptions = interruptions.filter(
+                interruption_date__isnull=True)
+
+        batch = []
+        updated = 0
+        for interruption in interruptions.iterator(
+                chunk_size=options["batch_size"]):
+            interruption.set_dates()
+            if interruption.interruption_date is None:
+                continue
+            batch.append(interruption)
+            if len(batch) >= options["batch_size"]:
+                updated += self.save_batch(batch)
+                batch = []
+        updated += self.save_batch(batch)
+        # TODO: Use logger
+        print("Backfilled the dates of {} interruptions.".format(updated))
+
+    def save_batch(self, interruptions):
+        Interruption.objects.bulk_update(
+            interruptions, ["interruption_date", "interruption_end_date"])
+        return len(interruptions)
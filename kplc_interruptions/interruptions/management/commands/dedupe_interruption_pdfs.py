@@ -0,0 +1,93 @@
+import hashlib
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from kplc_interruptions.interruptions.models import (
+    InterruptionPdf, InterruptionPdfText)
+from kplc_interruptions.interruptions.search import invalidate_search_cache
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Hash stored interruption PDFs and link the ones with the same "
+        "content to a single stored file. Text extracted from duplicates is "
+        "removed from the search index, and deleted unless notifications "
+        "were sent for it.")
+
+    def handle(self, *args, **options):
+        skipped = 0
+        for pdf in InterruptionPdf.objects.filter(sha256="").iterator():
+            sha256 = hashlib.sha256()
+            try:
+                with pdf.pdf_file.open("rb") as f:
+                    for chunk in iter(lambda: f.read(65536), b""):
+                        sha256.update(chunk)
+            except (OSError, ValueError):
+                # missing or unreadable files are left unhashed, so they are
+                # tried again on the next run
+                LOGGER.error(
+                    "Error reading interruption PDF", exc_info=True,
+                    extra={"pdf_id": pdf.id, "pdf_file": pdf.pdf_file.name})
+                skipped += 1
+                continue
+            pdf.sha256 = sha256.hexdigest()
+            pdf.save(update_fields=["sha256"])
+        # TODO: Use logger
+        print("Hashed interruption PDFs, skipped {} that could not be "
+              "read.".format(skipped))
+
+        # clear the default ordering so it does not end up in the GROUP BY,
+        # PDFs that could not be hashed are not duplicates of each other
+        duplicated = InterruptionPdf.objects.filter(
+            duplicate_of__isnull=True).exclude(sha256="").order_by().values(
+            "sha256").annotate(
+            total=Count("id")).filter(total__gt=1).values_list(
+            "sha256", flat=True)
+        for sha256 in duplicated:
+            # keep the PDF whose text was extracted first as the original
+            pdfs = list(InterruptionPdf.objects.filter(
+                sha256=sha256, duplicate_of__isnull=True).order_by(
+                "pdf_text__created", "created"))
+            original = pdfs[0]
+            for pdf in pdfs[1:]:
+                pdf_file_name = pdf.pdf_file.name
+                # PDFs linked to `pdf` on an earlier run would otherwise be
+                # left pointing at a duplicate
+                pdf.duplicates.update(
+                    duplicate_of=original, pdf_file=original.pdf_file.name)
+                pdf.duplicate_of = original
+                pdf.pdf_file.name = original.pdf_file.name
+                pdf.save(update_fields=["duplicate_of", "pdf_file"])
+                if not InterruptionPdf.objects.filter(
+                        pdf_file=pdf_file_name).exists():
+                    pdf.pdf_file.storage.delete(pdf_file_name)
+                print("Linked {} to {}".format(pdf, original))
+
+        # searches and notifications use the text of the original, texts
+        # extracted from duplicates before they were linked are removed from
+        # the index and kept only while notifications refer to them
+        pdf_texts = InterruptionPdfText.objects.filter(
+            pdf__duplicate_of__isnull=False)
+        removed = 0
+        for pdf_text in pdf_texts.iterator():
+            is_referenced = (
+                hasattr(pdf_text, "pdf_queue") or
+                pdf_text.deliveries.exists())
+            if is_referenced and pdf_text.indexed_on is None:
+                # removed from the index on an earlier run
+                continue
+            pdf_text.unindex()
+            if is_referenced:
+                InterruptionPdfText.objects.filter(id=pdf_text.id).update(
+                    indexed_on=None)
+            else:
+                pdf_text.delete()
+            removed += 1
+        if removed:
+            invalidate_search_cache()
+        print("Removed {} texts of duplicate PDFs.".format(removed))
+        print("Deduplicated interruption PDFs.")
@@ -1,30 +1,26 @@
-from django.conf import settings
-from django.core.management.base import BaseCommand
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
-from elasticsearch_dsl import Index
+from django.core.management.base import BaseCommand, CommandError
 
-from kplc_interruptions.interruptions.models import InterruptionPdfText
-from kplc_interruptions.interruptions.documents import InterruptionPdfTextDoc
+from kplc_interruptions.interruptions.indexing import (
+    ReindexError, reindex_pdf_texts)
 
 
 class Command(BaseCommand):
+    help = "Rebuild the search index of PDF texts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int,
+            help="Number of texts sent per bulk request")
+        parser.add_argument(
+            "--threads", type=int,
+            help="Number of bulk requests sent at a time")
 
     def handle(self, *args, **options):
-        index = "kplc_interruptions"
-        es = Elasticsearch([{
-            'host': settings.ES_SETTINGS['HOST'],
-            'port': settings.ES_SETTINGS['PORT']
-        }], index=index)
-        kplc_index = Index(index, using=settings.ES_SETTINGS['ALIAS'])
-        kplc_index.document(InterruptionPdfTextDoc)
-        if kplc_index.exists():
-            kplc_index.delete()
-            # TODO: Use logger
-            print('Deleted kplc interruptions index.')
-        InterruptionPdfTextDoc.init()
-        result = bulk(client=es, actions=(
-            pdf.index() for pdf in InterruptionPdfText.objects.all().iterator()))
+        try:
+            index_name = reindex_pdf_texts(
+                chunk_size=options["chunk_size"],
+                thread_count=options["threads"])
+        except ReindexError as error:
+            raise CommandError(error)
         # TODO: Use logger
-        print('Indexed kplc interruptions.')
-        print(result)
+        print('Indexed kplc interruptions into {}.'.format(index_name))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from kplc_interruptions.common import metrics
+from kplc_interruptions.interruptions.indexing import index_pending_pdf_texts
+
+
+class Command(BaseCommand):
+    help = "Index PDF texts that are waiting to be indexed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="Number of texts sent per bulk request")
+        parser.add_argument(
+            "--watch", type=int, metavar="SECONDS",
+            help="Keep running, checking for pending texts every SECONDS")
+
+    def handle(self, *args, **options):
+        metrics.start_metrics_server()
+        while True:
+            index_pending_pdf_texts(batch_size=options["batch_size"])
+            if not options["watch"]:
+                break
+            time.sleep(options["watch"])
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from kplc_interruptions.interruptions.models import (
+    InterruptionArea, InterruptionPdfText)
+from kplc_interruptions.pdf_parse_text import build_interruption_areas
+
+
+class Command(BaseCommand):
+    help = (
+        "Parse the extracted text of interruption PDFs into areas. Areas "
+        "parsed before are replaced.")
+
+    def handle(self, *args, **options):
+        pdf_texts = InterruptionPdfText.objects.values_list(
+            "pdf_id", "pdf_text")
+        for pdf_id, pdf_text in pdf_texts.iterator():
+            interruption_areas = build_interruption_areas(pdf_id, pdf_text)
+            with transaction.atomic():
+                InterruptionArea.objects.filter(pdf_id=pdf_id).delete()
+                InterruptionArea.objects.bulk_create(interruption_areas)
+            # TODO: Use logger
+            print("Parsed {} areas from PDF {}".format(
+                len(interruption_areas), pdf_id))
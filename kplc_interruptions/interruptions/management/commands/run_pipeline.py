@@ -0,0 +1,56 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from kplc_interruptions.common import metrics
+from kplc_interruptions.pipeline import run_pipeline
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Scrape interruptions, extract the text of their PDFs and index it, "
+        "with the stages running concurrently.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental", action="store_true",
+            help="Stop at the first known listing page and only revisit "
+                 "recently changed interruptions")
+        parser.add_argument(
+            "--retry-failed", action="store_true",
+            help="Extract PDFs that failed to extract before again")
+        parser.add_argument(
+            "--scrape-workers", type=int,
+            help="Number of threads fetching pages and PDFs")
+        parser.add_argument(
+            "--extract-workers", type=int,
+            help="Number of processes extracting text from PDFs")
+        parser.add_argument(
+            "--index-workers", type=int,
+            help="Number of threads sending texts to Elasticsearch")
+        parser.add_argument(
+            "--queue-size", type=int,
+            help="Most items waiting between two stages")
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="Most items a stage handles at a time")
+
+    def handle(self, *args, **options):
+        metrics.start_metrics_server()
+        start = time.monotonic()
+        failures = run_pipeline(
+            scrape_workers=options["scrape_workers"],
+            extract_workers=options["extract_workers"],
+            index_workers=options["index_workers"],
+            incremental=options["incremental"],
+            retry_failed=options["retry_failed"],
+            queue_size=options["queue_size"],
+            batch_size=options["batch_size"])
+        LOGGER.info("Run summary:\n\t%s", "\n\t".join(
+            metrics.summary(elapsed=time.monotonic() - start)))
+        if failures:
+            raise CommandError(
+                "Pipeline stages failed: {}".format(", ".join(failures)))
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0003_interruptionpdftext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interruptionpdf',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='PDF with the same content whose file and text are shared', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='duplicates', to='interruptions.InterruptionPdf'),
+        ),
+        migrations.AddField(
+            model_name='interruptionpdf',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, help_text="SHA-256 digest of the PDF's content", max_length=64),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0004_interruptionpdf_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interruptionpdftext',
+            name='is_truncated',
+            field=models.BooleanField(default=False, help_text='Whether extraction stopped at the page or size limit'),
+        ),
+        migrations.CreateModel(
+            name='InterruptionPdfPage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier of an object', primary_key=True, serialize=False, unique=True)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Date and time an object was created')),
+                ('updated', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Date and time an object was updated')),
+                ('page_number', models.PositiveIntegerField(help_text='Number of the page in the PDF, starting from 1')),
+                ('text', models.TextField()),
+                ('pdf_text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='interruptions.InterruptionPdfText')),
+            ],
+            options={
+                'ordering': ('page_number',),
+                'abstract': False,
+                'unique_together': {('pdf_text', 'page_number')},
+            },
+        ),
+    ]
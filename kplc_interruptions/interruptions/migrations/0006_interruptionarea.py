@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:52
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0005_interruptionpdfpage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InterruptionArea',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier of an object', primary_key=True, serialize=False, unique=True)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Date and time an object was created')),
+                ('updated', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Date and time an object was updated')),
+                ('region', models.CharField(blank=True, db_index=True, help_text='Region the area is in e.g. Nairobi', max_length=255)),
+                ('county', models.CharField(blank=True, db_index=True, help_text='County the area is in e.g. Kajiado', max_length=255)),
+                ('area', models.CharField(db_index=True, help_text='Name of the area e.g. Kitengela', max_length=255)),
+                ('date', models.DateField(blank=True, db_index=True, help_text='Date of the interruption', null=True)),
+                ('start_time', models.TimeField(blank=True, help_text='Time the interruption starts', null=True)),
+                ('end_time', models.TimeField(blank=True, help_text='Time the interruption ends', null=True)),
+                ('places', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), blank=True, help_text='Places affected by the interruption', size=None)),
+                ('pdf', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='areas', to='interruptions.InterruptionPdf')),
+            ],
+            options={
+                'ordering': ('date', 'start_time'),
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='interruptionarea',
+            index=models.Index(fields=['region', 'date'], name='interruptio_region_0df32a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interruptionarea',
+            index=models.Index(fields=['county', 'date'], name='interruptio_county_f758d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interruptionarea',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['places'], name='interruptio_places_ed2c5e_gin'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_existing_indexed(apps, schema_editor):
+    # texts saved so far were indexed as they were saved
+    InterruptionPdfText = apps.get_model("interruptions", "InterruptionPdfText")
+    InterruptionPdfText.objects.update(indexed_on=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0006_interruptionarea'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interruptionpdftext',
+            name='indexed_on',
+            field=models.DateTimeField(blank=True, help_text='Date and time the text was last indexed, empty while indexing is pending', null=True),
+        ),
+        migrations.RunPython(
+            mark_existing_indexed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='interruptionpdftext',
+            index=models.Index(condition=models.Q(indexed_on__isnull=True), fields=['id'], name='pdf_text_pending_index_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:05
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_existing_extracted(apps, schema_editor):
+    InterruptionPdf = apps.get_model("interruptions", "InterruptionPdf")
+    InterruptionPdf.objects.filter(pdf_text__isnull=False).update(
+        text_extracted_on=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0007_interruptionpdftext_indexed_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interruptionpdf',
+            name='extraction_error',
+            field=models.TextField(blank=True, help_text='Error of the last failed text extraction'),
+        ),
+        migrations.AddField(
+            model_name='interruptionpdf',
+            name='text_extracted_on',
+            field=models.DateTimeField(blank=True, help_text='Date and time text extraction was attempted, empty while it is pending', null=True),
+        ),
+        migrations.RunPython(
+            mark_existing_extracted, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='interruptionpdf',
+            index=models.Index(condition=models.Q(('duplicate_of__isnull', True), ('text_extracted_on__isnull', True)), fields=['id'], name='pdf_pending_extraction_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0008_interruptionpdf_text_extracted_on'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='interruption',
+            options={'ordering': ('-interruption_date', '-created')},
+        ),
+        migrations.AddField(
+            model_name='interruption',
+            name='interruption_date',
+            field=models.DateField(blank=True, help_text='Date of the interruptions, parsed from the title', null=True),
+        ),
+        migrations.AddField(
+            model_name='interruption',
+            name='interruption_end_date',
+            field=models.DateField(blank=True, db_index=True, help_text='Last date of bulletins covering several days, the same as the interruption date otherwise', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='interruption',
+            index=models.Index(fields=['-interruption_date', '-created'], name='interruption_date_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:04
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0010_time_ordered_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapedPage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier of an object', primary_key=True, serialize=False, unique=True)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Date and time an object was created')),
+                ('updated', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Date and time an object was updated')),
+                ('url', models.URLField(help_text='URL of the page', max_length=255, unique=True)),
+                ('etag', models.TextField(blank=True, help_text='ETag header of the last full response')),
+                ('last_modified', models.TextField(blank=True, help_text='Last-Modified header of the last full response')),
+                ('result', django.contrib.postgres.fields.jsonb.JSONField(help_text='Content of the page as parsed by the scraper')),
+            ],
+            options={
+                'ordering': ('-updated', '-created'),
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:08
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0011_scrapedpage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexVersion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier of an object', primary_key=True, serialize=False, unique=True)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Date and time an object was created')),
+                ('updated', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Date and time an object was updated')),
+                ('name', models.CharField(help_text='Name of the index or alias', max_length=255, unique=True)),
+                ('version', models.BigIntegerField(default=1, help_text='Number of times the index changed')),
+            ],
+            options={
+                'ordering': ('-updated', '-created'),
+                'abstract': False,
+            },
+        ),
+    ]
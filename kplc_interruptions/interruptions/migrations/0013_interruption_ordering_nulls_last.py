@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:14
+
+from django.db import migrations
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0012_searchindexversion'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='interruption',
+            options={'ordering': (django.db.models.expressions.OrderBy(django.db.models.expressions.F('interruption_date'), descending=True, nulls_last=True), '-created')},
+        ),
+        migrations.RemoveIndex(
+            model_name='interruption',
+            name='interruption_date_idx',
+        ),
+        # `models.Index` can't order NULLs last, the index matching the
+        # default ordering is created here
+        migrations.RunSQL(
+            'CREATE INDEX "interruption_date_idx" ON '
+            '"interruptions_interruption" '
+            '("interruption_date" DESC NULLS LAST, "created" DESC);',
+            'DROP INDEX "interruption_date_idx";',
+        ),
+    ]
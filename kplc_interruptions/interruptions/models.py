@@ -1,8 +1,13 @@
 import os
 
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
-from kplc_interruptions.common.models import AbstractBase
+from kplc_interruptions.common import metrics
+from kplc_interruptions.common.models import AbstractBase, TimeOrderedBase
 from kplc_interruptions.interruptions.documents import InterruptionPdfTextDoc
 
 
@@ -16,13 +21,72 @@ class Interruption(AbstractBase):
     link = models.URLField(
         max_length=255,
         help_text="URL to the PDF file(s) containing the interruptions")
+    interruption_date = models.DateField(
+        null=True, blank=True,
+        help_text="Date of the interruptions, parsed from the title")
+    interruption_end_date = models.DateField(
+        null=True, blank=True, db_index=True,
+        help_text="Last date of bulletins covering several days, the same as "
+                  "the interruption date otherwise")
 
     class Meta(AbstractBase.Meta):
         unique_together = ("title", "link")
+        # interruptions without a date in their title come last, the index
+        # matching this ordering is created by migration 0013
+        ordering = (
+            F("interruption_date").desc(nulls_last=True), "-created")
 
     def __str__(self):
         return "{title} ({link})".format(title=self.title, link=self.link)
 
+    def save(self, *args, **kwargs):
+        self.set_dates()
+        super().save(*args, **kwargs)
+
+    def set_dates(self):
+        """
+        Set the interruption dates from the title.
+        """
+        # the text parsers import the models
+        from kplc_interruptions.pdf_parse_text import parse_title_dates
+
+        self.interruption_date, self.interruption_end_date = (
+            parse_title_dates(self.title))
+
+
+class ScrapedPage(AbstractBase):
+    """
+    Store the validators and parsed content of a page fetched by the scraper
+    so that later runs can make conditional requests for it.
+    """
+    url = models.URLField(
+        max_length=255, unique=True, help_text="URL of the page")
+    etag = models.TextField(
+        blank=True, help_text="ETag header of the last full response")
+    last_modified = models.TextField(
+        blank=True, help_text="Last-Modified header of the last full response")
+    result = JSONField(help_text="Content of the page as parsed by the scraper")
+
+    def __str__(self):
+        return self.url
+
+
+class SearchIndexVersion(AbstractBase):
+    """
+    Store the version of a search index, bumped whenever documents are
+    indexed into it.
+
+    Search results are cached per process, so the version is kept in the
+    database where every process sees it.
+    """
+    name = models.CharField(
+        max_length=255, unique=True, help_text="Name of the index or alias")
+    version = models.BigIntegerField(
+        default=1, help_text="Number of times the index changed")
+
+    def __str__(self):
+        return "{name} v{version}".format(name=self.name, version=self.version)
+
 
 def interruption_upload_path(instance, filename):
     """
@@ -46,9 +110,30 @@ class InterruptionPdf(AbstractBase):
         max_length=255, help_text="Name displayed of the PDF")
     pdf_link = models.URLField(
         max_length=255, help_text="URL to download the PDF")
+    sha256 = models.CharField(
+        max_length=64, blank=True, db_index=True,
+        help_text="SHA-256 digest of the PDF's content")
+    duplicate_of = models.ForeignKey(
+        "self", null=True, blank=True, related_name="duplicates",
+        on_delete=models.PROTECT,
+        help_text="PDF with the same content whose file and text are shared")
+    text_extracted_on = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Date and time text extraction was attempted, empty while "
+                  "it is pending")
+    extraction_error = models.TextField(
+        blank=True, help_text="Error of the last failed text extraction")
 
     class Meta(AbstractBase.Meta):
         unique_together = ("interruption", "pdf_link")
+        indexes = [
+            # keeps walking the PDFs waiting for text extraction cheap
+            models.Index(
+                fields=["id"], name="pdf_pending_extraction_idx",
+                condition=models.Q(
+                    text_extracted_on__isnull=True,
+                    duplicate_of__isnull=True)),
+        ]
 
     def __str__(self):
         return "{filename} ({link})".format(
@@ -58,24 +143,126 @@ class InterruptionPdf(AbstractBase):
     def pdf_filename(self):
         return os.path.basename(self.pdf_file.name)
 
+    @property
+    def original(self):
+        """
+        The PDF that owns the stored file and extracted text of this PDF's
+        content.
+        """
+        return self.duplicate_of or self
+
 
-class InterruptionPdfText(AbstractBase):
+class InterruptionPdfText(TimeOrderedBase):
     """
     Store the extracted text from PDF.
     """
     pdf = models.OneToOneField(
         InterruptionPdf, related_name="pdf_text", on_delete=models.PROTECT)
     pdf_text = models.TextField()
+    is_truncated = models.BooleanField(
+        default=False,
+        help_text="Whether extraction stopped at the page or size limit")
+    indexed_on = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Date and time the text was last indexed, empty while "
+                  "indexing is pending")
+
+    class Meta(TimeOrderedBase.Meta):
+        indexes = [
+            models.Index(
+                fields=["updated", "created"], name="pdf_text_ordering_idx"),
+            # keeps looking up the texts waiting to be indexed cheap
+            models.Index(
+                fields=["id"], name="pdf_text_pending_index_idx",
+                condition=models.Q(indexed_on__isnull=True)),
+        ]
 
     def __str__(self):
         return str(self.pdf)
 
+    def to_document(self):
+        interruption = self.pdf.interruption
+        return InterruptionPdfTextDoc(
+            meta={"id": self.id}, pdf_text=self.pdf_text,
+            title=interruption.title, pdf_link=self.pdf.pdf_link,
+            created=self.pdf.created,
+            interruption_date=interruption.interruption_date,
+            interruption_end_date=interruption.interruption_end_date)
+
     def index(self):
-        doc = InterruptionPdfTextDoc(
-            meta={"id": self.id}, pdf_text=self.pdf_text)
-        doc.save()
+        doc = self.to_document()
+        with metrics.timer("kplc_es_request_seconds", operation="index"):
+            doc.save()
+        metrics.inc("kplc_es_documents_total", result="indexed")
         return doc.to_dict(include_meta=True)
 
+    def unindex(self):
+        doc = InterruptionPdfTextDoc(meta={"id": self.id})
+        with metrics.timer("kplc_es_request_seconds", operation="delete"):
+            doc.delete(ignore=404)
+        metrics.inc("kplc_es_documents_total", result="deleted")
+
     def save(self, *args, **kwargs):
+        # indexing is left to `index_pending_pdf_texts` so that saving does
+        # not wait on Elasticsearch
+        self.indexed_on = None
+        self.updated = timezone.now()
         super().save(*args, **kwargs)
-        self.index()
+
+
+class InterruptionPdfPage(AbstractBase):
+    """
+    Store the extracted text of a single PDF page.
+    """
+    pdf_text = models.ForeignKey(
+        InterruptionPdfText, related_name="pages", on_delete=models.CASCADE)
+    page_number = models.PositiveIntegerField(
+        help_text="Number of the page in the PDF, starting from 1")
+    text = models.TextField()
+
+    class Meta(AbstractBase.Meta):
+        unique_together = ("pdf_text", "page_number")
+        ordering = ("page_number",)
+
+    def __str__(self):
+        return "{pdf_text} page {page_number}".format(
+            pdf_text=self.pdf_text, page_number=self.page_number)
+
+
+class InterruptionArea(AbstractBase):
+    """
+    Store an area affected by an interruption, as parsed from the text of the
+    interruption's PDF.
+    """
+    pdf = models.ForeignKey(
+        InterruptionPdf, related_name="areas", on_delete=models.CASCADE)
+    region = models.CharField(
+        max_length=255, blank=True, db_index=True,
+        help_text="Region the area is in e.g. Nairobi")
+    county = models.CharField(
+        max_length=255, blank=True, db_index=True,
+        help_text="County the area is in e.g. Kajiado")
+    area = models.CharField(
+        max_length=255, db_index=True,
+        help_text="Name of the area e.g. Kitengela")
+    date = models.DateField(
+        null=True, blank=True, db_index=True,
+        help_text="Date of the interruption")
+    start_time = models.TimeField(
+        null=True, blank=True, help_text="Time the interruption starts")
+    end_time = models.TimeField(
+        null=True, blank=True, help_text="Time the interruption ends")
+    places = ArrayField(
+        models.CharField(max_length=255), blank=True,
+        help_text="Places affected by the interruption")
+
+    class Meta(AbstractBase.Meta):
+        ordering = ("date", "start_time",)
+        indexes = [
+            models.Index(fields=["region", "date"]),
+            models.Index(fields=["county", "date"]),
+            GinIndex(fields=["places"]),
+        ]
+
+    def __str__(self):
+        return "{area} ({date})".format(area=self.area, date=self.date)
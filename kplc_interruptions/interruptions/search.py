@@ -0,0 +1,107 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from kplc_interruptions.interruptions.documents import InterruptionPdfTextDoc
+from kplc_interruptions.interruptions.models import SearchIndexVersion
+
+RESULT_FIELDS = [
+    "title", "pdf_link", "created", "interruption_date",
+    "interruption_end_date"]
+
+
+def invalidate_search_cache():
+    """
+    Invalidate every cached search result.
+
+    Cache keys include the version of the index, which is kept in the
+    database so that bumping it in the process that indexed new texts
+    reaches the web processes too. Older entries become unreachable and
+    the cache evicts them as they expire.
+    """
+    name = InterruptionPdfTextDoc._index._name
+    bumped = SearchIndexVersion.objects.filter(name=name).update(
+        version=F("version") + 1, updated=timezone.now())
+    if not bumped:
+        SearchIndexVersion.objects.get_or_create(name=name)
+
+
+def search_cache_key(params):
+    version = SearchIndexVersion.objects.filter(
+        name=InterruptionPdfTextDoc._index._name).values_list(
+            "version", flat=True).first() or 0
+    digest = hashlib.sha256(
+        json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+    return "search:{}:{}".format(version, digest)
+
+
+def search_pdf_texts(query, page=1, date_from=None, date_to=None):
+    """
+    Search the text of interruption PDFs.
+
+    Results are cached for `SEARCH_SETTINGS["CACHE_TIMEOUT"]` seconds, or
+    until new texts are indexed.
+
+    Params:
+        query (str): Words to look for in the PDF texts.
+        page (int): Page of results, starting at 1.
+        date_from (datetime.date): Only include interruptions that end on
+            or after this date.
+        date_to (datetime.date): Only include interruptions that start on
+            or before this date.
+
+    Returns a dict with the total number of hits and the page of results,
+    each with the fields of the PDF and highlighted fragments of its text.
+    """
+    page_size = settings.SEARCH_SETTINGS["PAGE_SIZE"]
+    params = {
+        "query": query,
+        "page": page,
+        "page_size": page_size,
+        "date_from": date_from and date_from.isoformat(),
+        "date_to": date_to and date_to.isoformat(),
+    }
+    cache_key = search_cache_key(params)
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    search = InterruptionPdfTextDoc.search().query(
+        "match", pdf_text=query).source(RESULT_FIELDS).highlight(
+            "pdf_text", fragment_size=150, number_of_fragments=3)
+    # interruptions without a date parsed from their title are left out
+    if date_from:
+        search = search.filter(
+            "range", interruption_end_date={"gte": params["date_from"]})
+    if date_to:
+        search = search.filter(
+            "range", interruption_date={"lte": params["date_to"]})
+    start = (page - 1) * page_size
+    response = search[start:start + page_size].execute()
+
+    result = {
+        "count": response.hits.total.value,
+        "page": page,
+        "page_size": page_size,
+        "results": [
+            {
+                "id": hit.meta.id,
+                "title": hit.title,
+                "pdf_link": hit.pdf_link,
+                "created": hit.created,
+                "interruption_date": getattr(hit, "interruption_date", None),
+                "interruption_end_date": getattr(
+                    hit, "interruption_end_date", None),
+                "highlights": list(getattr(
+                    getattr(hit.meta, "highlight", None), "pdf_text", [])),
+            }
+            for hit in response
+        ],
+    }
+    cache.set(
+        cache_key, result, timeout=settings.SEARCH_SETTINGS["CACHE_TIMEOUT"])
+    return result
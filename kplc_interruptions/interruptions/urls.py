@@ -0,0 +1,9 @@
+from django.urls import path
+
+from kplc_interruptions.interruptions import views
+
+app_name = "interruptions"
+
+urlpatterns = [
+    path("search/", views.search, name="search"),
+]
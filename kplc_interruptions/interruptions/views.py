@@ -1,3 +1,52 @@
-from django.shortcuts import render
+import datetime
 
-# Create your views here.
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from elasticsearch.exceptions import ConnectionError
+
+from kplc_interruptions.common import metrics
+from kplc_interruptions.interruptions.search import search_pdf_texts
+
+
+def parse_date_param(value):
+    if not value:
+        return None
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+@require_GET
+def search(request):
+    """
+    Search interruption PDFs.
+
+    Query params:
+        q: Words to look for in the PDF texts.
+        page: Page of results, starting at 1.
+        date_from, date_to: Only include interruptions happening within
+            these dates, formatted as `YYYY-MM-DD`.
+    """
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"error": "q is required"}, status=400)
+    try:
+        page = int(request.GET.get("page", 1))
+        date_from = parse_date_param(request.GET.get("date_from"))
+        date_to = parse_date_param(request.GET.get("date_to"))
+    except ValueError:
+        return JsonResponse(
+            {"error": "page must be a number and dates YYYY-MM-DD"},
+            status=400)
+    if not 1 <= page <= settings.SEARCH_SETTINGS["MAX_PAGE"]:
+        return JsonResponse(
+            {"error": "page must be between 1 and {}".format(
+                settings.SEARCH_SETTINGS["MAX_PAGE"])},
+            status=400)
+
+    try:
+        with metrics.timer("kplc_search_seconds"):
+            result = search_pdf_texts(
+                query, page=page, date_from=date_from, date_to=date_to)
+    except ConnectionError:
+        return JsonResponse({"error": "Search is unavailable"}, status=503)
+    return JsonResponse(result)
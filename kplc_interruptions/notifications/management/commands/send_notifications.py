@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from kplc_interruptions.common import metrics
+from kplc_interruptions.notifications.tasks import process_notification_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Email accounts about interruptions in their areas. Several workers "
+        "can run at once.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="Number of queued PDFs claimed at a time")
+        parser.add_argument(
+            "--send-rate", type=float,
+            help="Emails sent per second, 0 for no limit")
+        parser.add_argument(
+            "--watch", type=int, metavar="SECONDS",
+            help="Keep running, checking the queue every SECONDS")
+
+    def handle(self, *args, **options):
+        metrics.start_metrics_server()
+        while True:
+            stats = process_notification_queue(
+                batch_size=options["batch_size"],
+                send_rate=options["send_rate"])
+            # TODO: Use logger
+            print(
+                "Sent {sent} notifications, {failed} failed. {retried} PDFs "
+                "and {failed_batches} batches will be retried, "
+                "{lost_batches} batches were claimed by other "
+                "workers.".format(**stats))
+            if not options["watch"]:
+                break
+            time.sleep(options["watch"])
@@ -0,0 +1,315 @@
+"""
+Match the areas of every notification account against a PDF's text in one
+pass.
+
+All the areas are compiled into a single Aho-Corasick automaton, so scanning
+a text costs time proportional to its length and the number of matches
+rather than to the number of accounts and areas.
+
+`FuzzyAreaMatcher` also finds areas that are misspelled or split by line
+wraps in the text, by looking the words of the text up in a BK-tree of the
+areas within a bounded edit distance.
+"""
+import re
+from collections import deque
+
+NON_WORD_RE = re.compile(r"[\W_]+")
+# a word hyphenated at the end of a line
+LINE_HYPHEN_RE = re.compile(r"(\w)-[ \t]*\r?\n\s*(\w)")
+
+
+def normalize(text):
+    """
+    Lower case `text` and replace punctuation and runs of whitespace with a
+    single space, so that areas match across line wraps and differences in
+    punctuation.
+    """
+    return " {} ".format(canonical_area(text))
+
+
+def canonical_area(area):
+    """
+    Canonical spelling of an area, used to look up the accounts subscribed
+    to it.
+    """
+    return NON_WORD_RE.sub(" ", area.casefold()).strip()
+
+
+class AreaMatcher:
+    """
+    Aho-Corasick automaton over the areas of a set of accounts.
+
+    Areas are matched on whole words, "Embu" matches "Embu Town" but not
+    "Embulbul".
+    """
+
+    def __init__(self, accounts):
+        """
+        Params:
+            accounts (iterable): `(account_id, areas)` tuples.
+        """
+        # trie nodes as transition dicts, each node's failure link and the
+        # ids of the areas ending at the node or any of its suffixes
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+        # accounts subscribed to each distinct area
+        self.area_accounts = []
+        area_ids = {}
+        for account_id, areas in accounts:
+            for area in areas:
+                # the padding spaces make the automaton match whole words
+                pattern = normalize(area)
+                if not pattern.strip():
+                    continue
+                if pattern not in area_ids:
+                    area_ids[pattern] = len(self.area_accounts)
+                    self.area_accounts.append((area, set()))
+                    self.add_pattern(pattern, area_ids[pattern])
+                self.area_accounts[area_ids[pattern]][1].add(account_id)
+        self.build_failure_links()
+
+    def add_pattern(self, pattern, area_id):
+        node = 0
+        for char in pattern:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            node = next_node
+        self.outputs[node].append(area_id)
+
+    def build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self.goto[node].items():
+                queue.append(next_node)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_node] = self.goto[fail].get(char, 0)
+                self.outputs[next_node] = (
+                    self.outputs[next_node] +
+                    self.outputs[self.fail[next_node]])
+
+    def match(self, text):
+        """
+        Find the accounts with areas mentioned in `text`.
+
+        Returns a dict of account ids to the set of their areas found.
+        """
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        found = set()
+        node = 0
+        for char in normalize(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            found.update(outputs[node])
+
+        matches = {}
+        for area_id in found:
+            area, account_ids = self.area_accounts[area_id]
+            for account_id in account_ids:
+                matches.setdefault(account_id, set()).add(area)
+        return matches
+
+
+def edit_distance(a, b, max_distance=None):
+    """
+    Levenshtein distance between two strings.
+
+    With `max_distance`, computing stops as soon as the distance is known to
+    be larger and `max_distance + 1` is returned.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1, current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree of strings, for finding the strings within an edit
+    distance of a query without comparing it to all of them.
+    """
+
+    def __init__(self, words=()):
+        # nodes are (word, {distance: child node}) tuples
+        self.root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            return
+
+        node = self.root
+        while True:
+            distance = edit_distance(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                return
+            node = child
+
+    def search(self, word, max_distance):
+        """
+        Find the strings within `max_distance` edits of `word`.
+
+        Returns a list of `(string, distance)` tuples.
+        """
+        if self.root is None:
+            return []
+
+        found = []
+        nodes = [self.root]
+        while nodes:
+            node_word, children = nodes.pop()
+            # distances past the farthest child can't lead to a match, so
+            # they don't have to be computed exactly
+            distance = edit_distance(
+                word, node_word, max(children, default=0) + max_distance)
+            if distance <= max_distance:
+                found.append((node_word, distance))
+            # by the triangle inequality matches can only be under children
+            # whose distance is within `max_distance` of this one
+            for child_distance, child in children.items():
+                if abs(child_distance - distance) <= max_distance:
+                    nodes.append(child)
+        return found
+
+
+def allowed_edits(area, max_edits):
+    """
+    Number of spelling mistakes tolerated for an area, short names have to
+    match exactly.
+    """
+    length = len(area.replace(" ", ""))
+    # names as short as "Nyali" and "Nyari" are different places
+    if length <= 5:
+        return 0
+    if length <= 9:
+        return min(1, max_edits)
+    return max_edits
+
+
+def same_initials(area, words):
+    """
+    Whether the words of a candidate start like the words of an area.
+
+    Misspellings rarely touch the first letter of a word, this keeps areas
+    that differ by a letter such as "South B" and "South C" apart.
+    """
+    area_words = area.split()
+    if len(area_words) != len(words.split()):
+        return area[0] == words[0]
+    return all(
+        area_word[0] == word[0]
+        for area_word, word in zip(area_words, words.split()))
+
+
+class FuzzyAreaMatcher:
+    """
+    Gazetteer of the areas of a set of accounts that tolerates the spelling
+    variants found in extracted PDF text.
+
+    Words hyphenated at the end of a line are joined back together and runs
+    of words are matched against the areas within a number of edits that
+    depends on the length of the area, so "Kilelshwa" and "West lands" match
+    "Kileleshwa" and "Westlands". Areas are still matched on whole words.
+    Each run of words is looked up in a BK-tree of the areas starting with
+    the same letter, so its cost grows slower than the number of areas.
+    """
+
+    def __init__(self, accounts, max_edits=2):
+        """
+        Params:
+            accounts (iterable): `(account_id, areas)` tuples.
+            max_edits (int): Most spelling mistakes tolerated in an area.
+        """
+        self.max_edits = max_edits
+        # accounts subscribed to each canonical area and the spelling of the
+        # first account that subscribed to it
+        self.area_accounts = {}
+        for account_id, areas in accounts:
+            for area in areas:
+                canonical = canonical_area(area)
+                if canonical:
+                    self.area_accounts.setdefault(
+                        canonical, (area, set()))[1].add(account_id)
+        # misspellings keep the first letter, so there's a tree for each
+        # first letter and the length range of its areas
+        self.trees = {}
+        self.lengths = {}
+        for area in self.area_accounts:
+            self.trees.setdefault(area[0], BKTree()).add(area)
+            shortest, longest = self.lengths.get(
+                area[0], (len(area), len(area)))
+            self.lengths[area[0]] = (
+                min(shortest, len(area)), max(longest, len(area)))
+        # a variant may split or join words, so runs of one word more than
+        # the longest area are looked up
+        self.max_words = 1 + max(
+            (len(area.split()) for area in self.area_accounts), default=0)
+
+    def find_areas(self, text):
+        """
+        Find the canonical areas mentioned in `text`.
+        """
+        words = canonical_area(LINE_HYPHEN_RE.sub(r"\1\2", text)).split()
+        runs = {
+            " ".join(words[start:start + length])
+            for length in range(1, self.max_words + 1)
+            for start in range(len(words) - length + 1)
+        }
+
+        found = set()
+        for run in runs:
+            if run in self.area_accounts:
+                found.add(run)
+                continue
+            if run[0] not in self.trees:
+                continue
+            shortest, longest = self.lengths[run[0]]
+            if not (shortest - self.max_edits <= len(run) <=
+                    longest + self.max_edits):
+                continue
+            for area, distance in self.trees[run[0]].search(
+                    run, self.max_edits):
+                if (distance <= allowed_edits(area, self.max_edits) and
+                        same_initials(area, run)):
+                    found.add(area)
+        return found
+
+    def match(self, text):
+        """
+        Find the accounts with areas mentioned in `text`.
+
+        Returns a dict of account ids to the set of their areas found.
+        """
+        matches = {}
+        for canonical in self.find_areas(text):
+            area, account_ids = self.area_accounts[canonical]
+            for account_id in account_ids:
+                matches.setdefault(account_id, set()).add(area)
+        return matches
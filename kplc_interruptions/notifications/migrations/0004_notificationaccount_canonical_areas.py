@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:20
+
+import re
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def canonical_area(area):
+    # frozen copy of `notifications.matching.canonical_area`
+    return NON_WORD_RE.sub(" ", area.casefold()).strip()
+
+
+def fill_canonical_areas(apps, schema_editor):
+    NotificationAccount = apps.get_model("notifications", "NotificationAccount")
+    accounts = list(NotificationAccount.objects.only("id", "areas"))
+    for account in accounts:
+        account.canonical_areas = [
+            canonical_area(area) for area in account.areas]
+    NotificationAccount.objects.bulk_update(
+        accounts, ["canonical_areas"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_auto_20190703_1324'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationaccount',
+            name='canonical_areas',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), blank=True, default=list, editable=False, help_text='Canonical spelling of each of the areas, kept in sync when the account is saved', size=None),
+        ),
+        migrations.RunPython(
+            fill_canonical_areas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notificationaccount',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['canonical_areas'], name='notification_account_areas_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notificationaccount_canonical_areas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationpdfqueue',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Number of failed attempts to process the PDF'),
+        ),
+        migrations.AddField(
+            model_name='notificationpdfqueue',
+            name='available_on',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Date and time the PDF can next be claimed by a worker'),
+        ),
+        migrations.AddField(
+            model_name='notificationpdfqueue',
+            name='last_error',
+            field=models.TextField(blank=True, help_text='Error of the last failed attempt'),
+        ),
+        migrations.AlterField(
+            model_name='notificationpdfqueue',
+            name='processed_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notificationpdfqueue',
+            index=models.Index(condition=models.Q(is_processed=False), fields=['available_on'], name='notification_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:50
+
+from django.db import migrations, models
+import kplc_interruptions.notifications.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notificationpdfqueue_claiming'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationpdfqueue',
+            name='available_on',
+            field=models.DateTimeField(default=kplc_interruptions.notifications.models.queue_available_on, help_text='Date and time the PDF can next be claimed by a worker'),
+        ),
+    ]
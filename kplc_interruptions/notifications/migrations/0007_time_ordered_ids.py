@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:35
+
+from django.db import migrations, models
+import django.utils.timezone
+import kplc_interruptions.common.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_notificationpdfqueue_digest_window'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationlog',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Date and time an object was created'),
+        ),
+        migrations.AlterField(
+            model_name='notificationlog',
+            name='id',
+            field=models.UUIDField(default=kplc_interruptions.common.models.uuid7, editable=False, help_text='Unique identifier of an object', primary_key=True, serialize=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='notificationlog',
+            name='updated',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Date and time an object was updated'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['updated', 'created'], name='notification_log_ordering_idx'),
+        ),
+    ]
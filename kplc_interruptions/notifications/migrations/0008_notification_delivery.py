@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import kplc_interruptions.common.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interruptions', '0012_searchindexversion'),
+        ('notifications', '0007_time_ordered_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationpdfqueue',
+            name='claimed_by',
+            field=models.CharField(blank=True, help_text='Worker that last claimed the PDF', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='notificationpdfqueue',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, help_text='Date and time the claim of a worker on the PDF runs out', null=True),
+        ),
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('id', models.UUIDField(default=kplc_interruptions.common.models.uuid7, editable=False, help_text='Unique identifier of an object', primary_key=True, serialize=False, unique=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, help_text='Date and time an object was created')),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now, help_text='Date and time an object was updated')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='deliveries', to='notifications.NotificationAccount')),
+                ('log', models.ForeignKey(help_text='Log of the email the PDF was sent in', on_delete=django.db.models.deletion.PROTECT, related_name='deliveries', to='notifications.NotificationLog')),
+                ('pdf_text', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='deliveries', to='interruptions.InterruptionPdfText')),
+            ],
+            options={
+                'ordering': ('-updated', '-created'),
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificationdelivery',
+            index=models.Index(fields=['updated', 'created'], name='notification_delivery_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationdelivery',
+            constraint=models.UniqueConstraint(fields=('account', 'pdf_text'), name='notification_delivery_unique'),
+        ),
+    ]
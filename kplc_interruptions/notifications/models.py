@@ -1,8 +1,59 @@
+import datetime
+
+from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.utils import timezone
 
-from kplc_interruptions.common.models import AbstractBase
+from kplc_interruptions.common.models import AbstractBase, TimeOrderedBase
 from kplc_interruptions.interruptions.models import InterruptionPdfText
+from kplc_interruptions.notifications.matching import canonical_area
+
+
+class NotificationAccountQuerySet(models.QuerySet):
+    """
+    Keep `NotificationAccount.canonical_areas` in sync with the areas on the
+    bulk writes that don't call `save`.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for account in objs:
+            account.set_canonical_areas()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if "areas" in fields or "canonical_areas" in fields:
+            for account in objs:
+                account.set_canonical_areas()
+            fields = [
+                field for field in fields
+                if field not in ("areas", "canonical_areas")
+            ] + ["areas", "canonical_areas"]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        areas = kwargs.get("areas")
+        if isinstance(areas, (list, tuple)):
+            kwargs["canonical_areas"] = canonical_areas(areas)
+        elif "canonical_areas" not in kwargs and "areas" in kwargs:
+            raise ValueError(
+                "areas can only be updated to a list of areas, save the "
+                "accounts to update them otherwise")
+        elif "canonical_areas" in kwargs and "areas" not in kwargs:
+            raise ValueError(
+                "canonical_areas is set from areas and can't be updated "
+                "on its own")
+        # both as expressions only comes from `bulk_update` above, which has
+        # already computed the canonical areas of each account
+        return super().update(**kwargs)
+
+
+def canonical_areas(areas):
+    return [canonical_area(area) for area in areas]
 
 
 class NotificationAccount(AbstractBase):
@@ -15,13 +66,35 @@ class NotificationAccount(AbstractBase):
     areas = ArrayField(
         models.CharField(max_length=255), blank=True,
         help_text="Areas to be searched for in the extracted PDFs")
+    canonical_areas = ArrayField(
+        models.CharField(max_length=255), blank=True, default=list,
+        editable=False,
+        help_text="Canonical spelling of each of the areas, kept in sync "
+                  "when the account is saved")
     is_active = models.BooleanField()
 
+    objects = NotificationAccountQuerySet.as_manager()
+
+    class Meta(AbstractBase.Meta):
+        indexes = [
+            # looks up the accounts subscribed to any of a list of areas
+            GinIndex(
+                fields=["canonical_areas"],
+                name="notification_account_areas_idx"),
+        ]
+
     def __str__(self):
         return "{email}: {areas}".format(self.email, self.areas)
 
+    def save(self, *args, **kwargs):
+        self.set_canonical_areas()
+        super().save(*args, **kwargs)
 
-class NotificationLog(AbstractBase):
+    def set_canonical_areas(self):
+        self.canonical_areas = canonical_areas(self.areas)
+
+
+class NotificationLog(TimeOrderedBase):
     """
     Logs success/error messages for notifications sent out to accounts.
     """
@@ -36,6 +109,58 @@ class NotificationLog(AbstractBase):
     status = models.CharField(max_length=7, choices=LOG_STATUS_CHOICES)
     message = models.TextField(blank=True)
 
+    class Meta(TimeOrderedBase.Meta):
+        indexes = [
+            models.Index(
+                fields=["updated", "created"],
+                name="notification_log_ordering_idx"),
+        ]
+
+
+class NotificationDelivery(TimeOrderedBase):
+    """
+    PDFs an account has been emailed about, so a queued PDF that is retried
+    isn't sent again to the accounts that already got it.
+    """
+    account = models.ForeignKey(
+        NotificationAccount, related_name="deliveries",
+        on_delete=models.PROTECT)
+    pdf_text = models.ForeignKey(
+        InterruptionPdfText, related_name="deliveries",
+        on_delete=models.PROTECT)
+    log = models.ForeignKey(
+        NotificationLog, related_name="deliveries", on_delete=models.PROTECT,
+        help_text="Log of the email the PDF was sent in")
+
+    class Meta(TimeOrderedBase.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "pdf_text"],
+                name="notification_delivery_unique"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["updated", "created"],
+                name="notification_delivery_idx"),
+        ]
+
+
+def queue_available_on():
+    """
+    Date and time a newly queued PDF can be claimed.
+
+    In digest mode, PDFs queued within the same window of
+    `NOTIFY_SETTINGS["DIGEST_WINDOW"]` seconds all become due at the end of
+    it, so they are claimed together and each account gets one email.
+    """
+    now = timezone.now()
+    window = settings.NOTIFY_SETTINGS["DIGEST_WINDOW"]
+    if not window:
+        return now
+    timestamp = now.timestamp()
+    return datetime.datetime.fromtimestamp(
+        timestamp - timestamp % window + window, tz=datetime.timezone.utc)
+
 
 class NotificationPDFQueue(AbstractBase):
     """
@@ -45,4 +170,25 @@ class NotificationPDFQueue(AbstractBase):
         InterruptionPdfText, related_name="pdf_queue",
         on_delete=models.PROTECT)
     is_processed = models.BooleanField(default=False)
-    processed_on = models.DateTimeField()
+    processed_on = models.DateTimeField(null=True, blank=True)
+    available_on = models.DateTimeField(
+        default=queue_available_on,
+        help_text="Date and time the PDF can next be claimed by a worker")
+    attempts = models.PositiveIntegerField(
+        default=0, help_text="Number of failed attempts to process the PDF")
+    last_error = models.TextField(
+        blank=True, help_text="Error of the last failed attempt")
+    claimed_until = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Date and time the claim of a worker on the PDF runs out")
+    claimed_by = models.CharField(
+        max_length=255, blank=True,
+        help_text="Worker that last claimed the PDF")
+
+    class Meta(AbstractBase.Meta):
+        indexes = [
+            # keeps claiming the next PDFs cheap as processed ones pile up
+            models.Index(
+                fields=["available_on"], name="notification_queue_idx",
+                condition=models.Q(is_processed=False)),
+        ]
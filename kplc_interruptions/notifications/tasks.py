@@ -0,0 +1,467 @@
+import datetime
+import logging
+import os
+import smtplib
+import socket
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from kplc_interruptions.common import metrics
+from kplc_interruptions.notifications.matching import (
+    AreaMatcher, FuzzyAreaMatcher, canonical_area)
+from kplc_interruptions.notifications.models import (
+    NotificationAccount, NotificationDelivery, NotificationLog,
+    NotificationPDFQueue)
+
+LOGGER = logging.getLogger(__name__)
+
+# errors of a message the server refused, other errors mean the connection
+# to the server broke
+REFUSED_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException)
+
+
+class ClaimLost(Exception):
+    pass
+
+
+def build_area_matcher():
+    """
+    Compile the areas of all active accounts into one matcher.
+
+    With `NOTIFY_SETTINGS["FUZZY_MAX_EDITS"]` set, the matcher also finds
+    misspelled areas.
+    """
+    accounts = NotificationAccount.objects.filter(
+        is_active=True).values_list("id", "areas").order_by()
+    max_edits = settings.NOTIFY_SETTINGS["FUZZY_MAX_EDITS"]
+    if max_edits:
+        return FuzzyAreaMatcher(accounts.iterator(), max_edits=max_edits)
+    return AreaMatcher(accounts.iterator())
+
+
+def find_subscribed_accounts(areas):
+    """
+    Look up the active accounts subscribed to any of `areas` through the
+    index on their canonical areas.
+
+    Like `AreaMatcher`, areas match on whole words, so an account subscribed
+    to "Kitengela" is found for "Kitengela Town".
+
+    Params:
+        areas (iterable): Names of areas and places, in any spelling.
+
+    Returns a dict of account ids to the set of their areas found.
+    """
+    canonical_areas = set()
+    for area in areas:
+        words = canonical_area(area).split()
+        canonical_areas.update(
+            " ".join(words[start:end])
+            for start in range(len(words))
+            for end in range(start + 1, len(words) + 1))
+    if not canonical_areas:
+        return {}
+
+    accounts = NotificationAccount.objects.filter(
+        is_active=True, canonical_areas__overlap=list(canonical_areas)
+    ).values_list("id", "areas", "canonical_areas").order_by()
+    return {
+        account_id: {
+            area for area, canonical in zip(areas, account_canonical_areas)
+            if canonical in canonical_areas
+        }
+        for account_id, areas, account_canonical_areas in accounts
+    }
+
+
+def interruption_area_names(pdf_text):
+    """
+    Names of the areas and places parsed from a PDF's text.
+    """
+    names = set()
+    for area, places in pdf_text.pdf.areas.values_list("area", "places"):
+        names.add(area)
+        names.update(places)
+    return names
+
+
+def match_pdf_queue(queue_entries):
+    """
+    Match the queued PDF texts against the areas of every active account.
+
+    When areas were parsed from a text, the accounts subscribed to them are
+    looked up in the index on `NotificationAccount.canonical_areas`.
+    Otherwise the text is scanned with a matcher compiled once from the
+    areas of all active accounts. Either way the cost of a text doesn't grow
+    with the number of accounts. The index only finds exact spellings, so
+    with fuzzy matching on every text is scanned.
+
+    Params:
+        queue_entries (iterable): `NotificationPDFQueue` entries to match.
+
+    Yields `(queue_entry, matches)` tuples where matches is a dict of account
+    ids to the set of their areas found in the text.
+    """
+    matcher = None
+    fuzzy = bool(settings.NOTIFY_SETTINGS["FUZZY_MAX_EDITS"])
+    for queue_entry in queue_entries:
+        area_names = (
+            None if fuzzy else interruption_area_names(queue_entry.pdf_text))
+        if area_names:
+            yield queue_entry, find_subscribed_accounts(area_names)
+            continue
+
+        if matcher is None:
+            matcher = build_area_matcher()
+        yield queue_entry, matcher.match(queue_entry.pdf_text.pdf_text)
+
+
+def build_notification_email(email, pdf_matches):
+    """
+    Build the email telling an account about interruptions in its areas.
+
+    Params:
+        email (str): Email of the account.
+        pdf_matches (list): `(pdf_text, areas)` tuples of the PDFs that
+            mention the account's areas, a digest lists several.
+    """
+    all_areas = ", ".join(sorted(
+        {area for _, areas in pdf_matches for area in areas}))
+    interruptions = "\n\n".join(
+        "{title}\nAffects {areas}\n{link}".format(
+            title=pdf_text.pdf.interruption.title,
+            areas=", ".join(sorted(areas)), link=pdf_text.pdf.pdf_link)
+        for pdf_text, areas in pdf_matches)
+    return EmailMessage(
+        subject="Power interruption in {}".format(all_areas),
+        body=(
+            "KPLC has scheduled power interruptions that affect "
+            "{areas}.\n\n{interruptions}\n").format(
+                areas=all_areas, interruptions=interruptions),
+        from_email=settings.OUTGOING_EMAIL_SOURCE, to=[email])
+
+
+def send_rate_limited(connection, messages, send_rate):
+    """
+    Send `messages` one at a time over `connection`, at most `send_rate` per
+    second.
+
+    A message refused by the server doesn't stop the rest from being sent.
+    The connection is reopened if the server drops it.
+
+    Yields `(message, error)` tuples, error is None if the message was sent.
+    """
+    interval = 1 / send_rate if send_rate else 0
+    next_send = time.monotonic()
+    for message in messages:
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_send = max(next_send, time.monotonic()) + interval
+
+        start = time.perf_counter()
+        try:
+            # does nothing unless the connection was closed after an error
+            connection.open()
+            connection.send_messages([message])
+        except REFUSED_ERRORS as error:
+            metrics.inc("kplc_notifications_total", result="refused")
+            yield message, error
+        except (smtplib.SMTPException, OSError) as error:
+            # the connection is unusable, it's reopened for the next message
+            connection.close()
+            metrics.inc("kplc_notifications_total", result="failed")
+            yield message, error
+        else:
+            metrics.observe(
+                "kplc_smtp_send_seconds", time.perf_counter() - start)
+            metrics.inc("kplc_notifications_total", result="sent")
+            yield message, None
+
+
+def update_notification_logs(sent_logs, failed_logs):
+    """
+    Mark notification logs as sent or failed with one UPDATE each.
+    """
+    now = timezone.now()
+    NotificationLog.objects.filter(
+        id__in=[log.id for log in sent_logs]).update(
+            status="SUCCESS", updated=now)
+    for log in failed_logs:
+        log.updated = now
+    NotificationLog.objects.bulk_update(
+        failed_logs, ["status", "message", "updated"])
+
+
+def send_notifications(queue_entries, send_rate=None, digest=None,
+                       worker=None):
+    """
+    Email the accounts whose areas are mentioned in the queued PDF texts.
+
+    In digest mode each account gets a single email listing all the PDFs
+    that mention its areas, otherwise an email is sent per PDF. The emails
+    of a run go out over a single SMTP connection. A `NotificationLog` is
+    created as PENDING for each email, then the logs are moved to SUCCESS or
+    FAILURE in bulk as the emails are sent. A `NotificationDelivery` is
+    saved for each PDF as soon as its email is sent, and PDFs already
+    delivered to an account are left out, so sending the same queue entries
+    again after a failure doesn't email anyone twice. Once the run is done,
+    the queue entries with emails that failed because the connection to the
+    server broke are retried later by `retry_queue_entries` and the rest are
+    marked as processed.
+
+    With `worker`, its claim on the queue entries is renewed as the emails
+    go out, and sending stops with `ClaimLost` if another worker claimed
+    any of them in the meantime.
+
+    Params:
+        queue_entries (iterable): `NotificationPDFQueue` entries to send out.
+        send_rate (float): Emails sent per second. Defaults to
+            `NOTIFY_SETTINGS["SEND_RATE"]`.
+        digest (bool): Whether to send digests. Defaults to whether
+            `NOTIFY_SETTINGS["DIGEST_WINDOW"]` is set.
+        worker (str): Name of the worker that claimed the queue entries.
+
+    Returns a dict with the number of emails sent and failed and of queue
+    entries retried.
+    """
+    send_rate = (
+        send_rate if send_rate is not None
+        else settings.NOTIFY_SETTINGS["SEND_RATE"])
+    digest = (
+        digest if digest is not None
+        else bool(settings.NOTIFY_SETTINGS["DIGEST_WINDOW"]))
+    batch_size = settings.NOTIFY_SETTINGS["BATCH_SIZE"]
+    renew_every = settings.NOTIFY_SETTINGS["CLAIM_RENEW_EVERY"]
+    renew_after = settings.NOTIFY_SETTINGS["CLAIM_LEASE"] / 2
+
+    matched = list(match_pdf_queue(queue_entries))
+    delivered = set(NotificationDelivery.objects.filter(
+        pdf_text_id__in=[queue_entry.pdf_text_id for queue_entry, _ in matched]
+    ).values_list("account_id", "pdf_text_id").order_by())
+    # (account id, PDF matches) for each email to send
+    notifications = []
+    if digest:
+        account_matches = {}
+        for queue_entry, matches in matched:
+            for account_id, areas in matches.items():
+                if (account_id, queue_entry.pdf_text_id) not in delivered:
+                    account_matches.setdefault(account_id, []).append(
+                        (queue_entry.pdf_text, areas))
+        notifications.extend(account_matches.items())
+    else:
+        notifications.extend(
+            (account_id, [(queue_entry.pdf_text, areas)])
+            for queue_entry, matches in matched
+            for account_id, areas in matches.items()
+            if (account_id, queue_entry.pdf_text_id) not in delivered)
+    emails = dict(NotificationAccount.objects.filter(
+        id__in={account_id for account_id, _ in notifications}).values_list(
+            "id", "email").order_by())
+
+    logs = []
+    messages = []
+    for account_id, pdf_matches in notifications:
+        message = build_notification_email(emails[account_id], pdf_matches)
+        logs.append(NotificationLog(
+            account_id=account_id, status="PENDING", message=message.subject))
+        messages.append(message)
+    NotificationLog.objects.bulk_create(logs, batch_size=batch_size)
+
+    stats = {"sent": 0, "failed": 0, "retried": 0}
+    sent_logs = []
+    failed_logs = []
+    # PDFs of the emails that failed with the connection
+    retry_pdf_text_ids = set()
+    retry_error = None
+    renewed_at = time.monotonic()
+    try:
+        with get_connection() if messages else nullcontext() as connection:
+            results = send_rate_limited(connection, messages, send_rate)
+            for log, (account_id, pdf_matches), (message, error) in zip(
+                    logs, notifications, results):
+                if error is None:
+                    stats["sent"] += 1
+                    sent_logs.append(log)
+                    NotificationDelivery.objects.bulk_create([
+                        NotificationDelivery(
+                            account_id=account_id, pdf_text=pdf_text,
+                            log=log)
+                        for pdf_text, _ in pdf_matches
+                    ], ignore_conflicts=True)
+                else:
+                    LOGGER.warning(
+                        "Error sending notification to %s: %s",
+                        message.to[0], error)
+                    stats["failed"] += 1
+                    log.status = "FAILURE"
+                    log.message = "{}\n{}".format(log.message, error)
+                    failed_logs.append(log)
+                    if not isinstance(error, REFUSED_ERRORS):
+                        retry_pdf_text_ids.update(
+                            pdf_text.id for pdf_text, _ in pdf_matches)
+                        retry_error = error
+                if len(sent_logs) + len(failed_logs) >= batch_size:
+                    update_notification_logs(sent_logs, failed_logs)
+                    sent_logs = []
+                    failed_logs = []
+                # checked before the next email goes out
+                if worker and (
+                        (stats["sent"] + stats["failed"]) % renew_every == 0
+                        or time.monotonic() - renewed_at >= renew_after):
+                    if not renew_claim(queue_entries, worker):
+                        raise ClaimLost(
+                            "Queued PDFs were claimed by another worker")
+                    renewed_at = time.monotonic()
+    finally:
+        update_notification_logs(sent_logs, failed_logs)
+
+    retry_entries = [
+        queue_entry for queue_entry, _ in matched
+        if queue_entry.pdf_text_id in retry_pdf_text_ids]
+    if retry_entries:
+        retry_queue_entries(retry_entries, retry_error)
+        stats["retried"] = len(retry_entries)
+    now = timezone.now()
+    NotificationPDFQueue.objects.filter(
+        id__in=[queue_entry.id for queue_entry, _ in matched]).exclude(
+            pdf_text_id__in=retry_pdf_text_ids).update(
+            is_processed=True, processed_on=now, claimed_until=None,
+            claimed_by="", updated=now)
+    return stats
+
+
+def claim_queue_entries(batch_size, worker):
+    """
+    Claim the next queued PDFs that are due for
+    `NOTIFY_SETTINGS["CLAIM_LEASE"]` seconds.
+
+    The entries are only locked, with `SELECT ... FOR UPDATE SKIP LOCKED`,
+    in the short transaction that claims them. Entries claimed by other
+    workers are skipped until their claim runs out, so several workers can
+    drain the queue at once and the PDFs of a worker that died are picked up
+    again later.
+
+    Params:
+        batch_size (int): Number of queued PDFs to claim.
+        worker (str): Name of the worker claiming the PDFs.
+
+    Returns a list of the claimed `NotificationPDFQueue` entries.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queue_entries = list(NotificationPDFQueue.objects.select_for_update(
+            skip_locked=True, of=("self",)).filter(
+                Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+                is_processed=False, available_on__lte=now
+            ).select_related("pdf_text__pdf__interruption").order_by(
+                "available_on")[:batch_size])
+        for queue_entry in queue_entries:
+            queue_entry.claimed_until = now + datetime.timedelta(
+                seconds=settings.NOTIFY_SETTINGS["CLAIM_LEASE"])
+            queue_entry.claimed_by = worker
+            queue_entry.updated = now
+        NotificationPDFQueue.objects.bulk_update(
+            queue_entries, ["claimed_until", "claimed_by", "updated"])
+    return queue_entries
+
+
+def renew_claim(queue_entries, worker):
+    """
+    Extend the claim of `worker` on queue entries by
+    `NOTIFY_SETTINGS["CLAIM_LEASE"]` seconds.
+
+    Returns whether the worker still held the claim on all of them.
+    """
+    now = timezone.now()
+    renewed = NotificationPDFQueue.objects.filter(
+        id__in=[queue_entry.id for queue_entry in queue_entries],
+        claimed_by=worker, is_processed=False).update(
+            claimed_until=now + datetime.timedelta(
+                seconds=settings.NOTIFY_SETTINGS["CLAIM_LEASE"]),
+            updated=now)
+    return renewed == len(queue_entries)
+
+
+def retry_queue_entries(queue_entries, error):
+    """
+    Schedule failed queue entries to be retried with exponential backoff.
+
+    Entries that reached `NOTIFY_SETTINGS["MAX_ATTEMPTS"]` are given up on
+    and marked as processed with the error kept in `last_error`. Either way
+    the entries are no longer claimed.
+    """
+    now = timezone.now()
+    for queue_entry in queue_entries:
+        queue_entry.claimed_until = None
+        queue_entry.claimed_by = ""
+        queue_entry.attempts += 1
+        queue_entry.last_error = str(error)
+        queue_entry.updated = now
+        if queue_entry.attempts >= settings.NOTIFY_SETTINGS["MAX_ATTEMPTS"]:
+            queue_entry.is_processed = True
+            queue_entry.processed_on = now
+        else:
+            queue_entry.available_on = now + datetime.timedelta(
+                seconds=settings.NOTIFY_SETTINGS["RETRY_BACKOFF"] *
+                2 ** (queue_entry.attempts - 1))
+    NotificationPDFQueue.objects.bulk_update(
+        queue_entries, [
+            "attempts", "last_error", "is_processed", "processed_on",
+            "available_on", "claimed_until", "claimed_by", "updated"])
+
+
+def process_notification_queue(batch_size=None, send_rate=None):
+    """
+    Send out the queued PDFs that are due, a batch at a time.
+
+    Each batch is claimed by `claim_queue_entries` and its emails are sent
+    outside of any transaction, so any number of workers can run this at
+    once without holding locks while they send. A batch that fails is
+    retried later by `retry_queue_entries`, skipping the emails that were
+    already sent. A batch claimed by another worker while it was being sent
+    is left to that worker.
+
+    Params:
+        batch_size (int): Number of queued PDFs claimed at a time. Defaults
+            to `NOTIFY_SETTINGS["QUEUE_BATCH_SIZE"]`.
+        send_rate (float): Emails sent per second. Defaults to
+            `NOTIFY_SETTINGS["SEND_RATE"]`.
+
+    Returns a dict with the number of emails sent and failed, of queue
+    entries retried and of batches that failed or were lost.
+    """
+    batch_size = batch_size or settings.NOTIFY_SETTINGS["QUEUE_BATCH_SIZE"]
+    worker = "{}:{}".format(socket.gethostname(), os.getpid())
+    stats = {
+        "sent": 0, "failed": 0, "retried": 0, "failed_batches": 0,
+        "lost_batches": 0}
+    while True:
+        queue_entries = claim_queue_entries(batch_size, worker)
+        if not queue_entries:
+            return stats
+
+        try:
+            batch_stats = send_notifications(
+                queue_entries, send_rate=send_rate, worker=worker)
+        except ClaimLost:
+            LOGGER.warning(
+                "Claim on %s queued PDFs was lost while sending them out",
+                len(queue_entries))
+            stats["lost_batches"] += 1
+            continue
+        except Exception as error:
+            LOGGER.exception("Error sending out queued PDFs")
+            stats["failed_batches"] += 1
+            retry_queue_entries(queue_entries, error)
+            continue
+
+        for key in ("sent", "failed", "retried"):
+            stats[key] += batch_stats[key]
+        LOGGER.info("Sent out %s queued PDFs", len(queue_entries))
@@ -0,0 +1,195 @@
+"""
+Parser backends for KPLC's power interruption listing pages.
+
+Each backend takes the HTML of a listing page and returns a dict with the
+interruption titles and links found in `h2.generictitle` headings inside
+`<main>` and the URL of the next listing page:
+
+    {
+        "interruptions": [{"title": "...", "link": "..."}],
+        "next_url": "https://kplc.co.ke/category/view/50/planned-power-interruptions/2"
+    }
+
+`html.parser` builds a full BeautifulSoup tree. `stream` uses the standard
+library's event based parser and only keeps the state needed for the
+headings and the pagination, so it avoids building a tree without adding a
+dependency. `lxml` and `selectolax` need their packages to be installed.
+The backend is chosen by `SCRAPE_SETTINGS["LISTING_PARSER"]`.
+"""
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+from django.conf import settings
+
+
+def parse_listing_page_bs4(content):
+    """
+    Parse a listing page with BeautifulSoup and the `html.parser` builder.
+    """
+    soup = BeautifulSoup(content, "html.parser")
+    interruptions = []
+    for h2_tag in soup.find("main").find_all("h2", class_='generictitle'):
+        # plain strings so that the result can be cached
+        title = h2_tag.string
+        interruptions.append({
+            "title": str(title) if title is not None else None,
+            "link": h2_tag.a.get('href')
+        })
+
+    # get next link
+    next_url = None
+    a_tag = soup.find(
+        "ul", class_="pagination").find("a", attrs={"rel": "next"})
+    if isinstance(a_tag, Tag):
+        next_url = a_tag.get("href")
+
+    return {"interruptions": interruptions, "next_url": next_url}
+
+
+class ListingPageParser(HTMLParser):
+    """
+    Event based parser that only tracks the listing headings and the next
+    page link.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.interruptions = []
+        self.next_url = None
+        self.in_main = False
+        self.title = None
+        self.link = None
+        self.pagination_depth = 0
+        self.pagination_done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "main":
+            self.in_main = True
+        elif tag == "h2" and self.in_main and has_token(attrs, "class",
+                                                         "generictitle"):
+            self.title = []
+            self.link = None
+        elif tag == "a" and self.title is not None and self.link is None:
+            self.link = dict(attrs).get("href")
+        elif tag == "ul" and not self.pagination_done:
+            if self.pagination_depth:
+                self.pagination_depth += 1
+            elif has_token(attrs, "class", "pagination"):
+                self.pagination_depth = 1
+        elif (tag == "a" and self.pagination_depth and
+              self.next_url is None and has_token(attrs, "rel", "next")):
+            self.next_url = dict(attrs).get("href")
+
+    def handle_endtag(self, tag):
+        if tag == "main":
+            self.in_main = False
+        elif tag == "h2" and self.title is not None:
+            self.interruptions.append({
+                "title": "".join(self.title),
+                "link": self.link
+            })
+            self.title = None
+        elif tag == "ul" and self.pagination_depth:
+            self.pagination_depth -= 1
+            # like `soup.find`, only the first pagination list is used
+            self.pagination_done = not self.pagination_depth
+
+    def handle_data(self, data):
+        if self.title is not None:
+            self.title.append(data)
+
+
+def has_token(attrs, name, token):
+    """
+    Check whether a space separated attribute such as `class` contains
+    `token`.
+    """
+    for attr_name, value in attrs:
+        if attr_name == name and value and token in value.split():
+            return True
+    return False
+
+
+def parse_listing_page_stream(content):
+    """
+    Parse a listing page with the standard library's event based parser.
+    """
+    parser = ListingPageParser()
+    parser.feed(content)
+    parser.close()
+    return {"interruptions": parser.interruptions, "next_url": parser.next_url}
+
+
+def parse_listing_page_lxml(content):
+    """
+    Parse a listing page with lxml.
+    """
+    import lxml.html
+
+    root = lxml.html.fromstring(content)
+    interruptions = [
+        {
+            "title": h2_tag.text_content(),
+            "link": h2_tag.xpath("string(.//a[1]/@href)") or None
+        }
+        for h2_tag in root.xpath(
+            "//main//h2[contains(concat(' ', normalize-space(@class), ' '),"
+            " ' generictitle ')]")
+    ]
+    next_urls = root.xpath(
+        "(//ul[contains(concat(' ', normalize-space(@class), ' '),"
+        " ' pagination ')])[1]"
+        "//a[contains(concat(' ', normalize-space(@rel), ' '), ' next ')]"
+        "/@href")
+
+    return {
+        "interruptions": interruptions,
+        "next_url": next_urls[0] if next_urls else None
+    }
+
+
+def parse_listing_page_selectolax(content):
+    """
+    Parse a listing page with selectolax.
+    """
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(content)
+    interruptions = []
+    for h2_node in tree.css("main h2.generictitle"):
+        a_node = h2_node.css_first("a")
+        interruptions.append({
+            "title": h2_node.text(deep=True),
+            "link": a_node.attributes.get("href") if a_node else None
+        })
+
+    next_url = None
+    pagination_node = tree.css_first("ul.pagination")
+    if pagination_node is not None:
+        a_node = pagination_node.css_first('a[rel~="next"]')
+        if a_node is not None:
+            next_url = a_node.attributes.get("href")
+
+    return {"interruptions": interruptions, "next_url": next_url}
+
+
+LISTING_PARSERS = {
+    "html.parser": parse_listing_page_bs4,
+    "stream": parse_listing_page_stream,
+    "lxml": parse_listing_page_lxml,
+    "selectolax": parse_listing_page_selectolax,
+}
+
+
+def parse_listing_page(content, backend=None):
+    """
+    Parse a listing page with the configured backend.
+
+    Params:
+        content (str): HTML of the listing page.
+        backend (str): One of `LISTING_PARSERS`. Defaults to
+            `SCRAPE_SETTINGS["LISTING_PARSER"]`.
+    """
+    backend = backend or settings.SCRAPE_SETTINGS["LISTING_PARSER"]
+    return LISTING_PARSERS[backend](content)
@@ -1,15 +1,528 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import signal
+import tempfile
+import time
+from importlib import metadata
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
 from pdftotext import PDF
 
+from kplc_interruptions.common import metrics
 from kplc_interruptions.interruptions.models import (
-    InterruptionPdf, InterruptionPdfText)
+    InterruptionArea, InterruptionPdf, InterruptionPdfPage,
+    InterruptionPdfText)
+from kplc_interruptions.notifications.models import NotificationPDFQueue
+from kplc_interruptions.pdf_parse_text import build_interruption_areas
+
+LOGGER = logging.getLogger(__name__)
+# bump when a change here changes the pages extracted from a PDF, so that
+# texts cached by earlier versions aren't used
+EXTRACTOR_VERSION = 1
+try:
+    PDFTOTEXT_VERSION = metadata.version("pdftotext")
+except metadata.PackageNotFoundError:
+    PDFTOTEXT_VERSION = ""
+
+
+def extract_pdf_pages(pdf, max_pages, max_bytes):
+    """
+    Extract the text of a PDF one page at a time.
+
+    poppler renders a page's text only when the page is accessed, so pages
+    after a limit is reached are never rendered.
+
+    Params:
+        pdf (pdftotext.PDF): PDF to extract the text from.
+        max_pages (int): Maximum number of pages to extract.
+        max_bytes (int): Maximum size of the extracted text in bytes.
+
+    Returns a dict with the list of page texts and whether a limit was hit.
+    """
+    pages = []
+    size = 0
+    for page_number in range(len(pdf)):
+        if page_number >= max_pages:
+            return {"pages": pages, "is_truncated": True}
+
+        page = pdf[page_number]
+        size += len(page.encode("utf-8"))
+        if size > max_bytes:
+            return {"pages": pages, "is_truncated": True}
+
+        pages.append(page)
+
+    return {"pages": pages, "is_truncated": False}
 
 
-def extract_text_from_pdf():
-    interruption_pdfs = InterruptionPdf.objects.filter(pdf_text__isnull=True)
-    for interruption_pdf in interruption_pdfs:
-        with open(interruption_pdf.pdf_file.path, "rb") as f:
+def extract_pdf_text(job):
+    """
+    Extract the text of a single PDF.
+
+    This runs inside the worker processes, so it only deals with file paths
+    and never touches the database. The timeout is enforced by
+    `ExtractionPool`, which kills workers that overrun it.
+
+    Params:
+        job (tuple): `(pdf_id, path, timeout, max_pages, max_bytes)` where
+            `timeout` is in seconds or `None`.
+
+    Returns a `(pdf_id, extracted, error)` tuple where either `extracted`,
+    the dict returned by `extract_pdf_pages` with the `seconds` extraction
+    took, or `error` is `None`.
+    """
+    pdf_id, path, _, max_pages, max_bytes = job
+    try:
+        start = time.perf_counter()
+        with open(path, "rb") as f:
             pdf = PDF(f)
+        extracted = extract_pdf_pages(pdf, max_pages, max_bytes)
+        extracted["seconds"] = time.perf_counter() - start
+        return pdf_id, extracted, None
+    except Exception as e:
+        return pdf_id, None, "{}: {}".format(type(e).__name__, e)
+
+
+def extraction_worker(connection):
+    """
+    Extract the PDFs of the jobs received on `connection` until `None` is
+    received, sending back the result of each.
+    """
+    # Ctrl-C is handled by the parent, which stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        job = connection.recv()
+        if job is None:
+            return
+        connection.send(extract_pdf_text(job))
+
+
+class ExtractionPool:
+    """
+    Worker processes extracting the text of PDFs with a hard timeout.
+
+    A PDF stuck inside poppler can't be interrupted from Python, so a worker
+    that takes longer than the timeout of its job is killed and replaced and
+    its PDF is reported as timed out. A worker that dies, for example when
+    poppler crashes, is replaced the same way.
+    """
+
+    def __init__(self, workers):
+        self.workers = [self.start_worker() for _ in range(max(workers, 1))]
+
+    def start_worker(self):
+        connection, worker_connection = Pipe()
+        process = Process(
+            target=extraction_worker, args=(worker_connection,), daemon=True)
+        process.start()
+        worker_connection.close()
+        return process, connection
+
+    def replace_worker(self, number):
+        process, connection = self.workers[number]
+        process.kill()
+        process.join()
+        connection.close()
+        self.workers[number] = self.start_worker()
+
+    def imap_unordered(self, jobs):
+        """
+        Extract the PDFs of `jobs`, see `iter_extracted_texts`.
+        """
+        jobs = iter(jobs)
+        idle = list(range(len(self.workers)))
+        # connection: (worker number, job, deadline)
+        running = {}
+        try:
+            while True:
+                while idle:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    number = idle.pop()
+                    connection = self.workers[number][1]
+                    connection.send(job)
+                    timeout = job[2]
+                    running[connection] = (
+                        number, job, timeout and time.monotonic() + timeout)
+                if not running:
+                    return
+
+                deadlines = [
+                    deadline for _, _, deadline in running.values()
+                    if deadline]
+                wait_timeout = None
+                if deadlines:
+                    wait_timeout = max(min(deadlines) - time.monotonic(), 0)
+                for connection in wait(list(running), wait_timeout):
+                    number, job, _ = running.pop(connection)
+                    try:
+                        result = connection.recv()
+                    except EOFError:
+                        exitcode = self.workers[number][0].exitcode
+                        self.replace_worker(number)
+                        result = (job[0], None, (
+                            "WorkerDied: Extraction worker exited with code "
+                            "{}").format(exitcode))
+                    idle.append(number)
+                    yield result
+
+                now = time.monotonic()
+                for connection, (number, job, deadline) in list(
+                        running.items()):
+                    if deadline and deadline <= now:
+                        del running[connection]
+                        self.replace_worker(number)
+                        idle.append(number)
+                        yield job[0], None, (
+                            "ExtractionTimeout: Extraction took longer than "
+                            "{} seconds").format(job[2])
+        finally:
+            # workers still busy when the caller stops early are replaced so
+            # that the pool can be used again
+            for number, _, _ in running.values():
+                self.replace_worker(number)
+
+    def close(self):
+        for process, connection in self.workers:
+            process.kill()
+            process.join()
+            connection.close()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def iter_extracted_texts(jobs, workers=1):
+    """
+    Extract the text of many PDFs, fanning them out to worker processes.
+
+    Params:
+        jobs (list): Jobs in the format expected by `extract_pdf_text`.
+        workers (int): Number of worker processes.
+
+    Yields `(pdf_id, extracted, error)` tuples in completion order. PDFs
+    that took longer than the timeout of their job are yielded with an
+    `ExtractionTimeout` error.
+    """
+    with ExtractionPool(workers) as pool:
+        yield from pool.imap_unordered(jobs)
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def extraction_cache_key(sha256, max_pages, max_bytes):
+    """
+    Key of the text extracted from a PDF in the extraction cache.
+
+    The key covers everything the extracted pages depend on: the content of
+    the PDF, the version of this extractor and of `pdftotext`,
+    `EXTRACT_SETTINGS["CACHE_VERSION"]` and the extraction limits. Joining
+    the pages into the text of the PDF happens after the cache, so changing
+    it doesn't need a new key.
+    """
+    key = ":".join(str(part) for part in (
+        sha256, EXTRACTOR_VERSION, PDFTOTEXT_VERSION,
+        settings.EXTRACT_SETTINGS["CACHE_VERSION"], max_pages, max_bytes))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def extraction_cache_path(cache_dir, key):
+    # entries are spread over subdirectories to keep directories small
+    return os.path.join(cache_dir, key[:2], key + ".json")
+
+
+def read_cached_extraction(cache_dir, key):
+    """
+    Read the pages extracted from a PDF from the extraction cache.
+
+    Returns the dict in the format returned by `extract_pdf_text`, or `None`
+    if the PDF isn't cached.
+    """
+    path = extraction_cache_path(cache_dir, key)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        LOGGER.warning(
+            "Error reading cached PDF text",
+            extra={"path": path, "error": str(e)})
+        return None
+
+
+def write_cached_extraction(cache_dir, key, extracted):
+    """
+    Store the pages extracted from a PDF in the extraction cache.
+
+    The entry is written to a temporary file that is then renamed, so
+    concurrent runs never read a partial entry. Failing to write only logs a
+    warning since the cache isn't needed for extraction.
+    """
+    path = extraction_cache_path(cache_dir, key)
+    temp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(extracted, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        LOGGER.warning(
+            "Error caching PDF text", extra={"path": path, "error": str(e)})
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def build_pdf_text(pdf_id, extracted):
+    """
+    Build the unsaved text and page objects of an extracted PDF.
+
+    Returns the `InterruptionPdfText` and the list of its
+    `InterruptionPdfPage` objects.
+    """
+    pages = extracted["pages"]
+    pdf_text = InterruptionPdfText(
+        pdf_id=pdf_id, pdf_text="\n".join(pages),
+        is_truncated=extracted["is_truncated"])
+    pdf_pages = [
+        InterruptionPdfPage(
+            pdf_text=pdf_text, page_number=page_number, text=page)
+        for page_number, page in enumerate(pages, start=1)
+    ]
+    return pdf_text, pdf_pages
+
+
+def iter_pending_pdfs(chunk_size):
+    """
+    Walk the PDFs waiting for text extraction in chunks, by id.
+
+    Only the ids, file names and hashes of a chunk are loaded at a time.
+    Duplicates are skipped since they share the text extracted from their
+    original PDF.
+
+    Yields lists of `(pdf_id, pdf_file, sha256)` tuples.
+    """
+    pending = InterruptionPdf.objects.filter(
+        text_extracted_on__isnull=True, duplicate_of__isnull=True
+    ).values_list("id", "pdf_file", "sha256").order_by("id")
+    last_id = None
+    while True:
+        chunk = pending if last_id is None else pending.filter(id__gt=last_id)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+def save_pdf_texts(pdf_texts, pdf_pages, errors=None):
+    """
+    Store a chunk of extracted texts and their pages.
+
+    The areas parsed from the texts are stored along with them and the
+    texts are queued for notifications. The texts, pages, areas and queue
+    entries are written with one INSERT each. The texts are left pending for
+    `index_pending_pdf_texts` to index.
+
+    The PDFs of the chunk, including those whose extraction failed, are
+    marked as extracted in the same transaction. This is the checkpoint an
+    interrupted extraction resumes from.
+
+    Params:
+        pdf_texts (list): Unsaved `InterruptionPdfText` objects.
+        pdf_pages (list): Unsaved `InterruptionPdfPage` objects of the texts.
+        errors (dict): Errors of the PDFs whose extraction failed, by id.
+    """
+    errors = errors or {}
+    interruption_areas = [
+        interruption_area
+        for pdf_text in pdf_texts
+        for interruption_area in build_interruption_areas(
+            pdf_text.pdf_id, pdf_text.pdf_text)
+    ]
+    now = timezone.now()
+    with transaction.atomic():
+        InterruptionPdfText.objects.bulk_create(pdf_texts)
+        InterruptionPdfPage.objects.bulk_create(pdf_pages)
+        InterruptionArea.objects.bulk_create(interruption_areas)
+        NotificationPDFQueue.objects.bulk_create(
+            NotificationPDFQueue(pdf_text=pdf_text) for pdf_text in pdf_texts)
+        InterruptionPdf.objects.filter(
+            id__in=[pdf_text.pdf_id for pdf_text in pdf_texts]).update(
+                text_extracted_on=now, extraction_error="", updated=now)
+        InterruptionPdf.objects.bulk_update(
+            [
+                InterruptionPdf(
+                    id=pdf_id, text_extracted_on=now, extraction_error=error,
+                    updated=now)
+                for pdf_id, error in errors.items()
+            ],
+            ["text_extracted_on", "extraction_error", "updated"])
+
+
+def retry_failed_extractions():
+    """
+    Mark the PDFs whose extraction failed as waiting for extraction again.
+    """
+    InterruptionPdf.objects.filter(
+        pdf_text__isnull=True, duplicate_of__isnull=True).exclude(
+            extraction_error="").update(text_extracted_on=None)
+
+
+def extract_pdf_chunk(chunk, pool, timeout, cache_dir=None):
+    """
+    Extract the text of a chunk of PDFs and store it.
+
+    PDFs found in the extraction cache are served from it, the others are
+    extracted by the workers of `pool` and added to it. The texts are stored
+    with `save_pdf_texts`, which marks the PDFs of the chunk as extracted.
+
+    Params:
+        chunk (list): `(pdf_id, pdf_file, sha256)` tuples as yielded by
+            `iter_pending_pdfs`.
+        pool (ExtractionPool): Workers of the run, kept from chunk to chunk.
+        timeout (int): Seconds allowed per PDF.
+        cache_dir (str): Directory of the extraction cache, `None` or empty
+            to not use it.
+
+    Returns a dict with the saved `pdf_texts`, the `errors` by PDF id, the
+    number of PDFs served from the cache and the `saved_seconds` of
+    extraction.
+    """
+    max_pages = settings.EXTRACT_SETTINGS["MAX_PAGES"]
+    max_bytes = settings.EXTRACT_SETTINGS["MAX_BYTES"]
+
+    jobs = []
+    cached = []
+    cache_keys = {}
+    saved_seconds = 0
+    for pdf_id, pdf_file, sha256 in chunk:
+        path = default_storage.path(pdf_file)
+        if cache_dir:
+            try:
+                key = extraction_cache_key(
+                    sha256 or file_sha256(path), max_pages, max_bytes)
+            except OSError:
+                # the error is reported by the extraction
+                key = None
+            extracted = key and read_cached_extraction(cache_dir, key)
+            if extracted:
+                cached.append((pdf_id, extracted, None))
+                saved_seconds += extracted.get("seconds", 0)
+                continue
+            cache_keys[pdf_id] = key
+        jobs.append((pdf_id, path, timeout, max_pages, max_bytes))
+
+    pdf_texts = []
+    pdf_pages = []
+    errors = {}
+    for pdf_id, extracted, error in itertools.chain(
+            cached, pool.imap_unordered(jobs)):
+        if error:
+            LOGGER.error(
+                "Error extracting text from PDF",
+                extra={"pdf_id": pdf_id, "error": error})
+            metrics.inc("kplc_pdfs_extracted_total", result="failed")
+            errors[pdf_id] = error
+            continue
+        if pdf_id in cache_keys or not cache_dir:
+            metrics.inc("kplc_pdfs_extracted_total", result="extracted")
+            metrics.observe("kplc_pdf_extract_seconds", extracted["seconds"])
+        else:
+            metrics.inc("kplc_pdfs_extracted_total", result="cached")
+        if extracted["is_truncated"]:
+            LOGGER.warning(
+                "Truncated text extracted from PDF", extra={"pdf_id": pdf_id})
+        if cache_keys.get(pdf_id):
+            write_cached_extraction(cache_dir, cache_keys[pdf_id], extracted)
+
+        pdf_text, pages = build_pdf_text(pdf_id, extracted)
+        pdf_texts.append(pdf_text)
+        pdf_pages.extend(pages)
+
+    save_pdf_texts(pdf_texts, pdf_pages, errors)
+    return {
+        "pdf_texts": pdf_texts,
+        "errors": errors,
+        "cached": len(cached),
+        "saved_seconds": saved_seconds,
+    }
+
+
+def extract_text_from_pdf(workers=None, timeout=None, batch_size=None,
+                          retry_failed=False):
+    """
+    Extract the text of PDFs that have not been extracted yet.
+
+    Text is stored per page as well as for the whole PDF. Extraction of a PDF
+    stops after `EXTRACT_SETTINGS["MAX_PAGES"]` pages or
+    `EXTRACT_SETTINGS["MAX_BYTES"]` bytes of text, and the text is marked as
+    truncated.
+
+    The PDFs are walked in chunks of `batch_size` and each chunk is committed
+    before the next one is read, so memory use stays flat on large backlogs
+    and an interrupted run picks up from the last committed chunk. The worker
+    processes are started once for the run. PDFs that fail to extract are
+    not retried unless `retry_failed` is set.
+
+    Extracted pages are cached on disk in `EXTRACT_SETTINGS["CACHE_DIR"]` by
+    the content of the PDF, so extracting a PDF again, after its text was
+    deleted or for a copy of it, doesn't run poppler.
+
+    Params:
+        workers (int): Number of worker processes. Defaults to
+            `EXTRACT_SETTINGS["WORKERS"]`.
+        timeout (int): Seconds allowed per PDF. Defaults to
+            `EXTRACT_SETTINGS["TIMEOUT"]`.
+        batch_size (int): Number of PDFs extracted and written at a time.
+            Defaults to `EXTRACT_SETTINGS["BATCH_SIZE"]`.
+        retry_failed (bool): Extract PDFs that failed before again.
+    """
+    workers = workers or settings.EXTRACT_SETTINGS["WORKERS"]
+    timeout = timeout or settings.EXTRACT_SETTINGS["TIMEOUT"]
+    batch_size = batch_size or settings.EXTRACT_SETTINGS["BATCH_SIZE"]
+    cache_dir = settings.EXTRACT_SETTINGS["CACHE_DIR"]
+
+    if retry_failed:
+        retry_failed_extractions()
+
+    extracted_count = failed_count = cached_count = 0
+    saved_seconds = 0
+    with ExtractionPool(workers) as pool:
+        for chunk in iter_pending_pdfs(batch_size):
+            result = extract_pdf_chunk(chunk, pool, timeout, cache_dir)
+            extracted_count += len(result["pdf_texts"])
+            failed_count += len(result["errors"])
+            cached_count += result["cached"]
+            saved_seconds += result["saved_seconds"]
+            print("Extracted text from {} PDFs, {} failed".format(
+                extracted_count, failed_count))
 
-        pdf_text, _ = InterruptionPdfText.objects.get_or_create(
-            pdf=interruption_pdf, defaults={"pdf_text": "\n".join(pdf)})
-        print("Extracted text from PDF {}".format(pdf_text))
+    if cache_dir:
+        total = extracted_count + failed_count
+        print(
+            "{} of {} PDFs ({:.0%}) served from the extraction cache, saving "
+            "{:.1f} seconds of extraction".format(
+                cached_count, total, cached_count / (total or 1),
+                saved_seconds))
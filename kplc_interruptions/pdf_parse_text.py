@@ -0,0 +1,237 @@
+import datetime
+import logging
+import re
+
+from kplc_interruptions.interruptions.models import InterruptionArea
+
+LOGGER = logging.getLogger(__name__)
+
+REGION_RE = re.compile(r"^(?P<region>[A-Z][A-Z .&'-]*?)\s+REGION$")
+COUNTY_RE = re.compile(r"^PARTS\s+OF\s+(?P<county>[A-Z .&'-]+?)\s+COUNTY$")
+AREA_RE = re.compile(r"^AREA\s*:\s*(?P<area>.+)$", re.IGNORECASE)
+TIME_RE = (
+    r"(?P<{name}_hour>\d{{1,2}})(?:[.:](?P<{name}_minute>\d{{2}}))?\s*"
+    r"(?P<{name}_period>[AP])\.?\s*M\.?")
+DATE_RE = re.compile(
+    r"^DATE\s*:\s*(?:[A-Z]+\s+)?"
+    r"(?P<day>\d{1,2})[./-](?P<month>\d{1,2})[./-](?P<year>\d{4})"
+    r"(?:\s+TIME\s*:\s*" + TIME_RE.format(name="start") +
+    r"\s*[-–—]+\s*" + TIME_RE.format(name="end") + r")?",
+    re.IGNORECASE)
+ADJACENT_CUSTOMERS_RE = re.compile(
+    r"\s*(?:&|and)?\s*adjacent\s+customers\.?\s*$", re.IGNORECASE)
+PLACE_SEPARATOR_RE = re.compile(r"\s*(?:,|&|\band\b)\s*", re.IGNORECASE)
+# longest region, county, area or place name that fits `InterruptionArea`
+MAX_NAME_LENGTH = 255
+
+
+def clean_name(name):
+    """
+    Normalize a region, county or area name to title case.
+    """
+    return " ".join(name.split()).title()
+
+
+def parse_time(match, name):
+    hour = match.group("{}_hour".format(name))
+    if hour is None:
+        return None
+
+    hour = int(hour) % 12
+    if match.group("{}_period".format(name)).upper() == "P":
+        hour += 12
+    minute = int(match.group("{}_minute".format(name)) or 0)
+    try:
+        return datetime.time(hour, minute)
+    except ValueError:
+        return None
+
+
+def parse_date(match):
+    try:
+        return datetime.date(
+            int(match.group("year")), int(match.group("month")),
+            int(match.group("day")))
+    except ValueError:
+        return None
+
+
+def join_lines(lines):
+    """
+    Join the lines of a wrapped paragraph, undoing end of line hyphenation.
+    """
+    text = ""
+    for line in lines:
+        if text.endswith("-"):
+            text = text[:-1] + line
+        elif text:
+            text += " " + line
+        else:
+            text = line
+    return text
+
+
+def parse_places(lines):
+    """
+    Parse the list of places affected in an area.
+    """
+    text = ADJACENT_CUSTOMERS_RE.sub("", join_lines(lines))
+    return [
+        place for place in PLACE_SEPARATOR_RE.split(text.strip(" .")) if place
+    ]
+
+
+def parse_interruption_text(text):
+    """
+    Parse the text extracted from an interruption PDF into areas.
+
+    KPLC's bulletins list regions, each followed by the counties in it. Each
+    county lists the interrupted areas as an `AREA:` line, a `DATE:` line that
+    also holds the time of the interruption and the places affected, which
+    are usually wrapped over several lines.
+
+    Example:
+        NAIROBI REGION
+        PARTS OF KAJIADO COUNTY
+        AREA: KITENGELA
+        DATE: Sunday 23.06.2019 TIME: 9.00 A.M. - 5.00 P.M.
+        Kitengela Town, Acacia Estate, Milimani & adjacent customers.
+
+    Returns a list of dicts with the fields of `InterruptionArea`.
+    """
+    areas = []
+    region = county = ""
+    area = None
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if not line:
+            continue
+
+        match = REGION_RE.match(line)
+        if match:
+            region, county, area = clean_name(match.group("region")), "", None
+            continue
+        match = COUNTY_RE.match(line)
+        if match:
+            county, area = clean_name(match.group("county")), None
+            continue
+        match = AREA_RE.match(line)
+        if match:
+            area = {
+                "region": region,
+                "county": county,
+                "area": clean_name(match.group("area")),
+                "date": None,
+                "start_time": None,
+                "end_time": None,
+                "places": [],
+            }
+            areas.append(area)
+            continue
+        if area is None:
+            continue
+        match = DATE_RE.match(line)
+        if match and area["date"] is None:
+            area["date"] = parse_date(match)
+            area["start_time"] = parse_time(match, "start")
+            area["end_time"] = parse_time(match, "end")
+            continue
+        area["places"].append(line)
+        # the place list ends with "& adjacent customers.", anything after it
+        # such as footers doesn't belong to the area
+        if ADJACENT_CUSTOMERS_RE.search(line):
+            area = None
+
+    for area in areas:
+        area["places"] = parse_places(area["places"])
+    return areas
+
+
+def fit_name(name, pdf_id):
+    """
+    Truncate a parsed name to `MAX_NAME_LENGTH`.
+
+    Text that isn't laid out like a bulletin can end up as a single long
+    name, which would fail the insert of every text saved with it.
+    """
+    if len(name) <= MAX_NAME_LENGTH:
+        return name
+    LOGGER.warning(
+        "Truncated name parsed from PDF text",
+        extra={"pdf_id": pdf_id, "length": len(name)})
+    return name[:MAX_NAME_LENGTH]
+
+
+def build_interruption_areas(pdf_id, text):
+    """
+    Build the unsaved `InterruptionArea` objects parsed from a PDF's text.
+    """
+    interruption_areas = []
+    for area in parse_interruption_text(text):
+        for field in ("region", "county", "area"):
+            area[field] = fit_name(area[field], pdf_id)
+        area["places"] = [
+            fit_name(place, pdf_id) for place in area["places"]]
+        interruption_areas.append(InterruptionArea(pdf_id=pdf_id, **area))
+    return interruption_areas
+
+
+MONTHS = {
+    month: number
+    for number, months in enumerate((
+        ("jan", "january"), ("feb", "february"), ("mar", "march"),
+        ("apr", "april"), ("may",), ("jun", "june"), ("jul", "july"),
+        ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"),
+        ("nov", "november"), ("dec", "december")), start=1)
+    for month in months
+}
+TITLE_DATE_PATTERN = (
+    r"(?P<day>\d{1,2})(?:st|nd|rd|th)?"
+    r"(?:[./-](?P<month>\d{1,2})[./-]|\s+(?P<month_name>[a-z]+),?\s+)"
+    r"(?P<year>\d{4}|\d{2})\b")
+TITLE_DATE_RE = re.compile(TITLE_DATE_PATTERN, re.IGNORECASE)
+# the first day of ranges such as "20 - 22.06.2019" or "20th & 22nd June
+# 2019", which takes its month and year from the date after it
+TITLE_DAY_RE = re.compile(
+    r"\b(?P<day>\d{1,2})(?:st|nd|rd|th)?\s*(?:-|–|&|and|to)\s*"
+    r"(?=" + TITLE_DATE_PATTERN.replace("?P<", "?P<next_") + ")",
+    re.IGNORECASE)
+
+
+def title_date(match, prefix=""):
+    year = int(match.group(prefix + "year"))
+    if year < 100:
+        year += 2000
+    month = match.group(prefix + "month")
+    if month is None:
+        month = MONTHS.get(match.group(prefix + "month_name").lower())
+    try:
+        return datetime.date(year, int(month), int(match.group(
+            prefix + "day")))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_title_dates(title):
+    """
+    Parse the dates of an interruption from its title.
+
+    Titles such as "Interruptions - 20.06.2019" hold a single date, bulletins
+    covering several days list them as in "Interruptions - 20.06.2019 -
+    22.06.2019" or "Interruptions - 20th & 22nd June 2019".
+
+    Returns a `(start_date, end_date)` tuple, both are `None` if the title
+    has no date.
+    """
+    dates = [title_date(match) for match in TITLE_DATE_RE.finditer(title)]
+    for match in TITLE_DAY_RE.finditer(title):
+        next_date = title_date(match, "next_")
+        if next_date is not None:
+            try:
+                dates.append(next_date.replace(day=int(match.group("day"))))
+            except ValueError:
+                pass
+    dates = [date for date in dates if date is not None]
+    if not dates:
+        return None, None
+    return min(dates), max(dates)
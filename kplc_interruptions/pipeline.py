@@ -0,0 +1,319 @@
+"""
+Pipeline that runs scraping, text extraction and indexing side by side.
+
+Each stage runs in its own threads and hands the ids of the items it
+produced to the next stage through a bounded queue, so a PDF is extracted
+and indexed soon after it is downloaded. A slow stage holds back the stages
+before it instead of letting items pile up in memory.
+
+The database is the checkpoint of every item: a PDF waits for extraction
+until its `text_extracted_on` is set and a text waits to be indexed until its
+`indexed_on` is set. Before taking items from its queue, a stage works
+through the items left waiting by earlier runs, so an interrupted pipeline
+resumes where it stopped.
+"""
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from elasticsearch_dsl import connections
+
+from kplc_interruptions.common import metrics
+from kplc_interruptions.interruptions.indexing import (
+    index_pdf_texts, index_pending_pdf_texts, pending_pdf_texts)
+from kplc_interruptions.interruptions.models import InterruptionPdf
+from kplc_interruptions.pdf_extract_text import (
+    ExtractionPool, extract_pdf_chunk, iter_pending_pdfs,
+    retry_failed_extractions)
+from kplc_interruptions.scrape import (
+    crawl_interruption_pdf_files, http_stats, interruptions_to_crawl,
+    iter_batches, save_interruption_pdfs, save_interruptions,
+    scrape_interruption_titles)
+
+LOGGER = logging.getLogger(__name__)
+
+# put on a queue by a stage that has no more items for the next one
+DONE = object()
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class StageQueue(queue.Queue):
+    """
+    Bounded queue of item ids between two stages.
+
+    The queue is closed when the stage taking items from it fails or the
+    pipeline is interrupted, which stops the stages waiting on it.
+    """
+
+    def __init__(self, name, maxsize):
+        super().__init__(maxsize)
+        self.name = name
+        self.closed = threading.Event()
+
+    def record_depth(self):
+        metrics.set_gauge(
+            "kplc_pipeline_queue_depth", self.qsize(), queue=self.name)
+
+    def close(self):
+        """
+        Close the queue, dropping the items left on it. Their ids are still
+        waiting in the database for the next run.
+        """
+        self.closed.set()
+        while True:
+            try:
+                self.get_nowait()
+            except queue.Empty:
+                break
+        self.record_depth()
+
+    def put_item(self, item):
+        """
+        Put an item on the queue, waiting while it's full.
+
+        Raises `PipelineStopped` if the queue is closed.
+        """
+        while not self.closed.is_set():
+            try:
+                self.put(item, timeout=0.5)
+                self.record_depth()
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped()
+
+    def get_batch(self, batch_size, wait):
+        """
+        Take up to `batch_size` items off the queue.
+
+        Waits for the first item, then at most `wait` seconds for the rest of
+        the batch, so items don't wait long behind a partial batch.
+
+        Returns an `(items, done)` tuple where `done` tells whether the stage
+        before is done. Raises `PipelineStopped` if the queue is closed.
+        """
+        items = []
+        deadline = None
+        while len(items) < batch_size:
+            if self.closed.is_set():
+                raise PipelineStopped()
+            timeout = 0.5
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+            try:
+                item = self.get(timeout=timeout)
+                self.record_depth()
+            except queue.Empty:
+                continue
+            if item is DONE:
+                return items, True
+            items.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + wait
+        return items, False
+
+
+def scrape_stage(pdf_queue, workers, incremental, batch_size):
+    """
+    Scrape interruptions and download their PDFs, queueing the new PDFs for
+    extraction.
+    """
+    for interruption_dicts in iter_batches(
+            scrape_interruption_titles(incremental=incremental), batch_size):
+        saved = save_interruptions(interruption_dicts)
+        LOGGER.info(
+            "Saved %s new of %s interruptions", saved,
+            len(interruption_dicts))
+
+    for interruption_pdf_dicts in iter_batches(
+            crawl_interruption_pdf_files(
+                interruptions_to_crawl(incremental), workers=workers),
+            batch_size):
+        with metrics.timer("kplc_pipeline_batch_seconds", stage="scrape"):
+            pdfs = save_interruption_pdfs(interruption_pdf_dicts)
+        for pdf in pdfs:
+            LOGGER.info("Saved PDF %s", pdf)
+            # duplicates share the text of their original
+            if pdf.duplicate_of is None:
+                pdf_queue.put_item(pdf.id)
+
+    LOGGER.info("HTTP stats: %s", http_stats())
+
+
+def extract_stage(pdf_queue, text_queue, workers, timeout, batch_size, wait):
+    """
+    Extract the text of the PDFs waiting for it and of the queued PDFs,
+    queueing the texts for indexing. The worker processes are started once
+    and extract every chunk of the run.
+    """
+    cache_dir = settings.EXTRACT_SETTINGS["CACHE_DIR"]
+    extracted_count = failed_count = 0
+
+    def extract(chunk, pool):
+        nonlocal extracted_count, failed_count
+        with metrics.timer("kplc_pipeline_batch_seconds", stage="extract"):
+            result = extract_pdf_chunk(chunk, pool, timeout, cache_dir)
+        extracted_count += len(result["pdf_texts"])
+        failed_count += len(result["errors"])
+        LOGGER.info(
+            "Extracted text from %s PDFs, %s failed", extracted_count,
+            failed_count)
+        for pdf_text in result["pdf_texts"]:
+            text_queue.put_item(pdf_text.id)
+
+    with ExtractionPool(workers) as pool:
+        for chunk in iter_pending_pdfs(batch_size):
+            extract(chunk, pool)
+
+        done = False
+        while not done:
+            pdf_ids, done = pdf_queue.get_batch(batch_size, wait)
+            # PDFs extracted while walking the waiting ones are skipped
+            chunk = list(InterruptionPdf.objects.filter(
+                id__in=pdf_ids, text_extracted_on__isnull=True,
+                duplicate_of__isnull=True
+            ).values_list("id", "pdf_file", "sha256").order_by("id"))
+            if chunk:
+                extract(chunk, pool)
+
+
+def index_stage(text_queue, batch_size, wait, index_waiting):
+    """
+    Index the queued texts, and first the texts waiting to be indexed if
+    `index_waiting` is set.
+    """
+    client = connections.get_connection(settings.ES_SETTINGS["ALIAS"])
+    if index_waiting:
+        index_pending_pdf_texts(batch_size)
+
+    indexed = 0
+    done = False
+    while not done:
+        pdf_text_ids, done = text_queue.get_batch(batch_size, wait)
+        started = timezone.now()
+        # texts indexed while walking the waiting ones are skipped
+        pdf_texts = list(pending_pdf_texts().filter(id__in=pdf_text_ids))
+        if pdf_texts:
+            with metrics.timer("kplc_pipeline_batch_seconds", stage="index"):
+                indexed += index_pdf_texts(client, pdf_texts, started)
+            LOGGER.info("Indexed %s PDF texts", indexed)
+
+
+def run_stage(stage, args, input_queue, output_queue, consumers, failures):
+    """
+    Run a stage in the current thread.
+
+    When the stage ends, each of the `consumers` of its output queue is told
+    it's done. If the stage failed or the pipeline was stopped, its input
+    queue is closed too, so that the stage before it stops instead of
+    waiting on a full queue. A stage that finished normally leaves its input
+    queue open, other workers of the same stage may still be taking items
+    off it.
+    """
+    try:
+        stage(*args)
+    except PipelineStopped:
+        if input_queue is not None:
+            input_queue.close()
+    except Exception:
+        LOGGER.error(
+            "Pipeline stage failed", exc_info=True,
+            extra={"stage": stage.__name__})
+        failures.append(stage.__name__)
+        if input_queue is not None:
+            input_queue.close()
+    finally:
+        try:
+            for _ in range(consumers):
+                output_queue.put_item(DONE)
+        except PipelineStopped:
+            pass
+        # threads get their own database connections
+        connection.close()
+
+
+def run_pipeline(scrape_workers=None, extract_workers=None,
+                 index_workers=None, incremental=False, retry_failed=False,
+                 queue_size=None, batch_size=None):
+    """
+    Scrape, extract and index interruptions with the stages running
+    concurrently.
+
+    Params:
+        scrape_workers (int): Number of threads fetching interruption pages
+            and PDFs. Defaults to `SCRAPE_SETTINGS["WORKERS"]`.
+        extract_workers (int): Number of processes extracting text. Defaults
+            to `EXTRACT_SETTINGS["WORKERS"]`.
+        index_workers (int): Number of threads sending texts to
+            Elasticsearch. Defaults to `PIPELINE_SETTINGS["INDEX_WORKERS"]`.
+        incremental (bool): Scrape incrementally, see `stage_interruptions`.
+        retry_failed (bool): Extract PDFs that failed before again.
+        queue_size (int): Most item ids waiting between two stages. Defaults
+            to `PIPELINE_SETTINGS["QUEUE_SIZE"]`.
+        batch_size (int): Most items a stage handles at a time. Defaults to
+            `PIPELINE_SETTINGS["BATCH_SIZE"]`.
+
+    Returns the names of the stages that failed.
+    """
+    scrape_workers = scrape_workers or settings.SCRAPE_SETTINGS["WORKERS"]
+    extract_workers = (
+        extract_workers or settings.EXTRACT_SETTINGS["WORKERS"])
+    index_workers = index_workers or settings.PIPELINE_SETTINGS[
+        "INDEX_WORKERS"]
+    queue_size = queue_size or settings.PIPELINE_SETTINGS["QUEUE_SIZE"]
+    batch_size = batch_size or settings.PIPELINE_SETTINGS["BATCH_SIZE"]
+    wait = settings.PIPELINE_SETTINGS["BATCH_WAIT"]
+    timeout = settings.EXTRACT_SETTINGS["TIMEOUT"]
+
+    if retry_failed:
+        retry_failed_extractions()
+
+    pdf_queue = StageQueue("pdfs", queue_size)
+    text_queue = StageQueue("texts", queue_size)
+    failures = []
+    stages = [
+        (scrape_stage, (pdf_queue, scrape_workers, incremental, batch_size),
+         None, pdf_queue, 1),
+        (extract_stage,
+         (pdf_queue, text_queue, extract_workers, timeout, batch_size, wait),
+         pdf_queue, text_queue, index_workers),
+    ] + [
+        # one worker is enough to walk the waiting texts
+        (index_stage, (text_queue, batch_size, wait, number == 0),
+         text_queue, None, 0)
+        for number in range(index_workers)
+    ]
+    threads = [
+        threading.Thread(
+            target=run_stage,
+            args=(stage, args, input_queue, output_queue, consumers,
+                  failures),
+            name="pipeline-{}".format(stage.__name__))
+        for stage, args, input_queue, output_queue, consumers in stages
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for thread in threads:
+            # a timeout keeps the main thread responsive to Ctrl-C
+            while thread.is_alive():
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        LOGGER.warning("Stopping the pipeline, finished items are kept")
+        pdf_queue.close()
+        text_queue.close()
+        for thread in threads:
+            thread.join()
+        raise
+
+    return failures
@@ -1,24 +1,147 @@
+import hashlib
 import logging
 import os
 import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+from urllib.parse import urlsplit
 
 import requests
 from bs4 import BeautifulSoup
-from bs4.element import Tag
+from django.conf import settings
 from django.core.files import File
-from requests_cache import CachedSession
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from kplc_interruptions import VERSION
+from kplc_interruptions.common import metrics
 from kplc_interruptions.interruptions.models import (
-    Interruption, InterruptionPdf)
+    Interruption, InterruptionPdf, ScrapedPage)
+from kplc_interruptions.parsers import parse_listing_page
 
 LOGGER = logging.getLogger(__name__)
 
 KPLC_INTERRUPTIONS_URL = "https://kplc.co.ke/category/view/50/planned-power-interruptions";
 
+_HOST_SEMAPHORES = {}
+_HOST_SEMAPHORES_LOCK = threading.Lock()
+
+
+@contextmanager
+def host_slot(url):
+    """
+    Limit the number of concurrent requests made to the host of `url`.
+
+    The limit is set by `SCRAPE_SETTINGS["PER_HOST_CONCURRENCY"]` and is
+    shared by all threads in the process.
+    """
+    limit = settings.SCRAPE_SETTINGS["PER_HOST_CONCURRENCY"]
+    key = (urlsplit(url).netloc, limit)
+    with _HOST_SEMAPHORES_LOCK:
+        semaphore = _HOST_SEMAPHORES.get(key)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(limit)
+            _HOST_SEMAPHORES[key] = semaphore
+
+    with semaphore:
+        yield
+
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+HTTP_STATS = Counter()
+_HTTP_STATS_LOCK = threading.Lock()
+
+
+def get_session():
+    """
+    Return the HTTP session shared by all scraper requests.
+
+    The session keeps connections alive in a pool sized to
+    `SCRAPE_SETTINGS["PER_HOST_CONCURRENCY"]` and retries timeouts and 5xx
+    responses with exponential backoff.
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            scrape_settings = settings.SCRAPE_SETTINGS
+            retry = Retry(
+                total=scrape_settings["RETRIES"],
+                backoff_factor=scrape_settings["BACKOFF_FACTOR"],
+                status_forcelist=(500, 502, 503, 504),
+                raise_on_status=False)
+            adapter = HTTPAdapter(
+                pool_maxsize=scrape_settings["PER_HOST_CONCURRENCY"],
+                max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = (
+                "kplc-interruptions/{} "
+                "(+https://github.com/evansmurithi/kplc-interruptions)"
+            ).format(VERSION)
+            _SESSION = session
+
+    return _SESSION
+
+
+def count(stat, value=1):
+    with _HTTP_STATS_LOCK:
+        HTTP_STATS[stat] += value
+
+
+def http_stats():
+    """
+    Return counters for the shared HTTP session.
+
+    Contains the number of requests sent, new connections opened, requests
+    served over a reused connection and conditional request cache hits (304)
+    and misses.
+    """
+    requests_sent = connections = 0
+    pools = get_session().get_adapter("http://").poolmanager.pools
+    for key in pools.keys():
+        pool = pools[key]
+        if pool is None:
+            continue
+        requests_sent += pool.num_requests
+        connections += pool.num_connections
+
+    stats = dict(HTTP_STATS)
+    stats.update(
+        requests=requests_sent, connections=connections,
+        reused_connections=requests_sent - connections)
+    return stats
+
+
+def http_get(url, **kwargs):
+    """
+    Send a GET request through the shared session.
+
+    Waits for a `host_slot` and applies `SCRAPE_SETTINGS["TIMEOUT"]`. Extra
+    keyword arguments are passed on to `requests.Session.get`.
+    """
+    kwargs.setdefault("timeout", settings.SCRAPE_SETTINGS["TIMEOUT"])
+    with host_slot(url):
+        # the wait for a slot isn't part of the latency
+        start = time.perf_counter()
+        response = get_session().get(url, **kwargs)
+    metrics.observe(
+        "kplc_http_request_seconds", time.perf_counter() - start,
+        kind="page", status=response.status_code)
+    return response
+
 
 def make_request(url):
-    # TODO: consider adding project's details in the headers.
-    response = requests.get(url)
+    response = http_get(url)
     if not response.ok:
         # TODO: use custom exception
         raise Exception("Bad request")
@@ -26,42 +149,121 @@ def make_request(url):
     return response.content.decode("utf-8")
 
 
-def download_pdf(url):
+def fetch_parsed(url, parse):
     """
-    Download the PDF file containing the power interruption details.
+    Fetch a page and parse it, using a conditional GET when possible.
+
+    The ETag and Last-Modified validators of a page are stored in
+    `ScrapedPage` together with the result of `parse`, so they outlive the
+    process. If the server answers a later request with `304 Not Modified`,
+    the stored result is returned without transferring or parsing the page
+    again. Stored pages older than `SCRAPE_SETTINGS["VALIDATOR_CACHE_TIMEOUT"]`
+    seconds are fetched in full.
 
     Params:
-        url (str): URL to download the PDF from.
+        url (str): URL of the page to fetch.
+        parse (callable): Function taking the page content and returning a
+            JSON serializable result.
 
-    Returns the PDF filename and a PDF file object.
+    Returns the result of `parse`.
     """
-    # content-disposition header isn't set so we do this instead
-    pdf_filename = url.rsplit('/', 1)[1]
-    response = requests.get(url, stream=True)
+    stored = ScrapedPage.objects.filter(
+        url=url, updated__gte=timezone.now() - timedelta(
+            seconds=settings.SCRAPE_SETTINGS["VALIDATOR_CACHE_TIMEOUT"])
+    ).first()
+    headers = {}
+    if stored:
+        if stored.etag:
+            headers["If-None-Match"] = stored.etag
+        if stored.last_modified:
+            headers["If-Modified-Since"] = stored.last_modified
+
+    response = http_get(url, headers=headers)
+    if response.status_code == 304 and stored:
+        count("conditional_hits")
+        return stored.result
     if not response.ok:
         # TODO: use custom exception
         raise Exception("Bad request")
 
-    # assert content-type of the file to download is PDF
-    if response.headers["Content-Type"] != "application/pdf":
-        # TODO: use custom exception
-        raise Exception("Not a pdf")
+    count("conditional_misses")
+    metrics.inc("kplc_http_downloaded_bytes_total", len(response.content))
+    result = parse(response.content.decode("utf-8"))
+    metrics.inc("kplc_pages_parsed_total", parser=parse.__name__)
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        ScrapedPage.objects.update_or_create(url=url, defaults={
+            "etag": etag or "",
+            "last_modified": last_modified or "",
+            "result": result,
+            "updated": timezone.now(),
+        })
 
-    # delete the temporary file once file is closed
-    pdf_file_temp = tempfile.NamedTemporaryFile(delete=True)
-    for chunk in response.iter_content(chunk_size=4096):
-        pdf_file_temp.write(chunk)
-    pdf_file_temp.seek(0)
+    return result
 
-    return pdf_filename, pdf_file_temp
 
+def download_pdf(url):
+    """
+    Download the PDF file containing the power interruption details.
 
-def scrape_interruption_titles(url=None):
+    Params:
+        url (str): URL to download the PDF from.
+
+    Returns the PDF filename, a PDF file object and the SHA-256 hex digest of
+    the PDF's content.
+    """
+    # content-disposition header isn't set so we do this instead
+    pdf_filename = url.rsplit('/', 1)[1]
+    # hold the host slot for the whole streamed download, not just the
+    # response headers
+    with host_slot(url):
+        start = time.perf_counter()
+        with get_session().get(
+                url, stream=True,
+                timeout=settings.SCRAPE_SETTINGS["TIMEOUT"]) as response:
+            # failed downloads are part of the latency too
+            try:
+                if not response.ok:
+                    # TODO: use custom exception
+                    raise Exception("Bad request")
+
+                # assert content-type of the file to download is PDF
+                if response.headers["Content-Type"] != "application/pdf":
+                    # TODO: use custom exception
+                    raise Exception("Not a pdf")
+
+                # delete the temporary file once file is closed
+                pdf_file_temp = tempfile.NamedTemporaryFile(delete=True)
+                sha256 = hashlib.sha256()
+                for chunk in response.iter_content(chunk_size=4096):
+                    pdf_file_temp.write(chunk)
+                    sha256.update(chunk)
+                    count("bytes_downloaded", len(chunk))
+                    metrics.inc(
+                        "kplc_http_downloaded_bytes_total", len(chunk))
+                pdf_file_temp.seek(0)
+            finally:
+                metrics.observe(
+                    "kplc_http_request_seconds", time.perf_counter() - start,
+                    kind="pdf", status=response.status_code)
+    metrics.inc("kplc_pdfs_downloaded_total")
+
+    return pdf_filename, pdf_file_temp, sha256.hexdigest()
+
+
+def scrape_interruption_titles(url=None, incremental=False):
     """
     Scrape power interruption titles and PDF links from KPLC website.
 
+    Listing pages are followed through their `rel="next"` links one after
+    another until the last page, an error or, in incremental mode, an already
+    known page is reached.
+
     Params:
         url (str): URL to crawl and get titles and links from.
+        incremental (bool): Stop following the pagination once a listing page
+            only contains titles and links that are already in the database.
 
     Returns a dict containing the interruption title and interruption link to
     the page with the PDF to download.
@@ -73,27 +275,101 @@ def scrape_interruption_titles(url=None):
     }
     """
     url = url or KPLC_INTERRUPTIONS_URL
+    while url:
+        try:
+            listing = fetch_parsed(url, parse_listing_page)
+        except Exception:
+            LOGGER.error(
+                "Error making request", exc_info=True, extra={"url": url})
+            return None
+
+        interruption_dicts = listing["interruptions"]
+        # the listing is ordered newest first, so a page we have fully seen
+        # before means every page after it has been seen too. This has to be
+        # checked before yielding since callers store what we yield.
+        is_known_page = (
+            incremental and is_known_listing_page(interruption_dicts))
+        yield from interruption_dicts
+
+        if is_known_page:
+            LOGGER.info(
+                "Reached an already known listing page", extra={"url": url})
+            return None
+
+        url = listing["next_url"]
+
+
+def is_known_listing_page(interruption_dicts):
+    """
+    Check whether every title and link on a listing page is already stored.
+
+    Params:
+        interruption_dicts (list): Dicts yielded by
+            `scrape_interruption_titles` for a single listing page.
+
+    Returns `False` for an empty page.
+    """
+    scraped = {(d["title"], d["link"]) for d in interruption_dicts}
+    if not scraped:
+        return False
+
+    stored = set(Interruption.objects.filter(
+        link__in={link for _, link in scraped}).values_list("title", "link"))
+    return scraped <= stored
+
+
+def scrape_interruption_pdf_links(url):
+    """
+    Scrape the PDF download links found on a power interruption page.
+
+    Params:
+        url (str): URL that contains PDF download link(s)
+
+    Returns a list of dicts containing the interruption parent link, the
+    download link text and the PDF download link. An empty list is returned
+    if the page could not be fetched.
+
+    Example:
+    [{
+        "parent_link":"https://kplc.co.ke/content/item/3071/interruptions---20.06.2019",
+        "download_link_text": "Interruptions - 20.06.2019.pdf",
+        "download_link": "https://kplc.co.ke/img/full/c8JP5YCE4HQ4_Interruptions%20-%2020.06.2019.pdf"
+    }]
+    """
     try:
-        content = make_request(url)
+        link_dicts = fetch_parsed(url, parse_interruption_page)
     except Exception:
         LOGGER.error(
             "Error making request", exc_info=True, extra={"url": url})
-        return None
+        return []
 
-    # parse content
+    return [dict(link_dict, parent_link=url) for link_dict in link_dicts]
+
+
+def parse_interruption_page(content):
+    """
+    Parse the PDF download link texts and links of an interruption page.
+    """
     soup = BeautifulSoup(content, "html.parser")
-    for h2_tag in soup.find("main").find_all("h2", class_='generictitle'):
-        yield {
-            "title": h2_tag.string,
-            "link": h2_tag.a.get('href')
-        }
+    a_tags = []
+    # most of the download links are found inside anchor tags with docicon
+    # class.
+    attachment_div = soup.find("div", class_="attachments")
+    if attachment_div:
+        a_tags.extend(attachment_div.find_all("a", class_="docicon"))
+    # some of the download links especially the one marked as archives is
+    # inside anchor tags with download class.
+    genericintro_div = soup.find("div", class_="genericintro")
+    if genericintro_div:
+        a_tags.extend(genericintro_div.find_all("a", class_="download"))
 
-    # get next link
-    a_tag = soup.find(
-        "ul", class_="pagination").find("a", attrs={"rel": "next"})
-    if isinstance(a_tag, Tag):
-        next_url = a_tag.get("href")
-        yield from scrape_interruption_titles(next_url)
+    return [
+        {
+            "download_link_text": a_tag.get_text(),
+            "download_link": a_tag.get("href")
+        }
+        for a_tag in a_tags
+    ]
 
 
 def scrape_interruption_pdf_files(url):
@@ -116,77 +392,321 @@ def scrape_interruption_pdf_files(url):
         "download_link": "https://kplc.co.ke/img/full/c8JP5YCE4HQ4_Interruptions%20-%2020.06.2019.pdf"
     }
     """
+    for link_dict in scrape_interruption_pdf_links(url):
+        pdf_dict = fetch_interruption_pdf(link_dict)
+        if pdf_dict is None:
+            return None
+
+        yield pdf_dict
+
+
+def fetch_interruption_pdf(link_dict):
+    """
+    Download the PDF described by a dict from `scrape_interruption_pdf_links`.
+
+    Returns the dict updated with the PDF filename, temporary file and
+    SHA-256 digest, or `None` if the download failed.
+    """
+    download_link = link_dict["download_link"]
     try:
-        content = make_request(url)
+        pdf_filename, pdf_file_temp, sha256 = download_pdf(download_link)
     except Exception:
         LOGGER.error(
-            "Error making request", exc_info=True, extra={"url": url})
+            "Error making request", exc_info=True,
+            extra={"download_link": download_link})
         return None
 
-    # parse content
-    soup = BeautifulSoup(content, "html.parser")
-    a_tags = []
-    # most of the download links are found inside anchor tags with docicon
-    # class.
-    attachment_div = soup.find("div", class_="attachments")
-    if attachment_div:
-        a_tags.extend(attachment_div.find_all("a", class_="docicon"))
-    # some of the download links especially the one marked as archives is
-    # inside anchor tags with download class.
-    genericintro_div = soup.find("div", class_="genericintro")
-    if genericintro_div:
-        a_tags.extend(genericintro_div.find_all("a", class_="download"))
+    return dict(
+        link_dict, pdf_filename=pdf_filename, pdf_file_temp=pdf_file_temp,
+        sha256=sha256)
 
-    for a_tag in a_tags:
-        download_link_text = a_tag.get_text()
-        download_link = a_tag.get("href")
 
-        try:
-            pdf_filename, pdf_file_temp = download_pdf(download_link)
-        except Exception:
-            LOGGER.error(
-                "Error making request", exc_info=True,
-                extra={"download_link": download_link})
-            return None
+def crawl_interruption_pdf_files(interruptions, workers=None):
+    """
+    Concurrently scrape interruption pages and download their PDFs.
 
-        yield {
-            "parent_link": url,
-            "pdf_filename": pdf_filename,
-            "pdf_file_temp": pdf_file_temp,
-            "download_link_text": download_link_text,
-            "download_link": download_link
-        }
+    Page fetches and PDF downloads share one bounded thread pool so that they
+    overlap, while `host_slot` caps the number of requests made to any single
+    host. At most `workers` pages are scheduled ahead of the downloads so
+    memory use stays bounded on large archives. PDF links already stored for
+    an interruption are not downloaded again.
+
+    Params:
+        interruptions (iterable): `Interruption` objects whose links should be
+            crawled.
+        workers (int): Number of threads to use. Defaults to
+            `SCRAPE_SETTINGS["WORKERS"]`.
+
+    Yields `(interruption, pdf_dict)` tuples in completion order, where
+    `pdf_dict` has the same format as the dicts yielded by
+    `scrape_interruption_pdf_files`.
+    """
+    workers = workers or settings.SCRAPE_SETTINGS["WORKERS"]
+    interruptions = iter(interruptions)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        page_futures = {}
+        pdf_futures = {}
+
+        def schedule_pages():
+            while len(page_futures) < workers:
+                interruption = next(interruptions, None)
+                if interruption is None:
+                    return
+                future = executor.submit(
+                    scrape_interruption_pdf_links, interruption.link)
+                page_futures[future] = interruption
+
+        schedule_pages()
+        while page_futures or pdf_futures:
+            done, _ = wait(
+                list(page_futures) + list(pdf_futures),
+                return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in page_futures:
+                    interruption = page_futures.pop(future)
+                    stored_links = set(InterruptionPdf.objects.filter(
+                        interruption=interruption).values_list(
+                            "pdf_link", flat=True).order_by())
+                    for link_dict in future.result():
+                        if link_dict["download_link"] in stored_links:
+                            continue
+                        pdf_future = executor.submit(
+                            fetch_interruption_pdf, link_dict)
+                        pdf_futures[pdf_future] = interruption
+                else:
+                    interruption = pdf_futures.pop(future)
+                    pdf_dict = future.result()
+                    if pdf_dict is not None:
+                        yield interruption, pdf_dict
+            schedule_pages()
+
+
+def iter_batches(iterable, batch_size):
+    """
+    Split `iterable` into lists of at most `batch_size` items.
+    """
+    iterator = iter(iterable)
+    batch = list(islice(iterator, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, batch_size))
 
 
-def stage_interruptions():
+def save_interruptions(interruption_dicts):
     """
-    Stage the scraped details in the database.
+    Save a batch of scraped interruptions that are not stored yet.
+
+    Stored interruptions are looked up with one query and the new ones are
+    written with one INSERT. Conflicts with rows inserted concurrently are
+    ignored through the unique constraint on the title and link.
+
+    An interruption whose link is stored under another title was renamed on
+    KPLC's website, if none of the stored titles of the link is in the batch
+    and only one new title is. Its title and dates are updated instead,
+    which also bumps its `updated` so that incremental runs revisit its page.
+    Links listed with several titles get a row for each of them.
+
+    Returns the number of new interruptions.
     """
-    for interruption_dict in scrape_interruption_titles():
-        title = interruption_dict["title"]
-        link = interruption_dict["link"]
-        interruption, _ = Interruption.objects.get_or_create(
-            title=title, link=link)
-        print("Saved interruption {}".format(interruption))
+    title_links = {
+        (interruption_dict["title"], interruption_dict["link"])
+        for interruption_dict in interruption_dicts
+    }
+    existing = set(Interruption.objects.filter(
+        title__in={title for title, _ in title_links},
+        link__in={link for _, link in title_links}
+    ).values_list("title", "link").order_by())
+    new_titles = {}
+    for title, link in sorted(title_links - existing):
+        new_titles.setdefault(link, []).append(title)
+    listed_links = {link for _, link in existing & title_links}
+    # the newest interruption of a link is the one renamed
+    renamed = {
+        interruption.link: interruption
+        for interruption in Interruption.objects.filter(link__in={
+            link for link, titles in new_titles.items()
+            if len(titles) == 1 and link not in listed_links
+        }).order_by("created")
+    }
 
-    print("\n\nFinished saving interruptions\n\n")
+    now = timezone.now()
+    interruptions = []
+    changed = []
+    for link, titles in new_titles.items():
+        interruption = renamed.get(link)
+        if interruption is None:
+            interruptions.extend(
+                Interruption(title=title, link=link) for title in titles)
+            continue
+        interruption.title = titles[0]
+        interruption.updated = now
+        changed.append(interruption)
+    # `bulk_create` and `bulk_update` don't call `save`
+    for interruption in interruptions + changed:
+        interruption.set_dates()
+    Interruption.objects.bulk_create(interruptions, ignore_conflicts=True)
+    Interruption.objects.bulk_update(
+        changed,
+        ["title", "interruption_date", "interruption_end_date", "updated"])
+    return len(interruptions)
+
+
+def insert_interruption_pdfs(pdfs):
+    """
+    Insert `pdfs` with one INSERT, skipping the links stored by another run
+    in the meantime.
 
-    for interruption in Interruption.objects.all():
-        for pdf_dict in scrape_interruption_pdf_files(interruption.link):
-            pdf_file_temp = pdf_dict["pdf_file_temp"]
-            pdf_filename = pdf_dict["pdf_filename"]
-            pdf_link_name = pdf_dict["download_link_text"]
-            pdf_link = pdf_dict["download_link"]
+    The files the skipped PDFs saved for themselves are deleted.
 
-            try:
-                pdf = InterruptionPdf.objects.get(
-                    interruption=interruption, pdf_link=pdf_link)
-            except InterruptionPdf.DoesNotExist:
-                pdf = InterruptionPdf(
-                    interruption=interruption, pdf_link=pdf_link,
-                    pdf_link_name=pdf_link_name)
-                pdf.pdf_file.save(
-                    pdf_filename, File(pdf_file_temp), save=False)
-                pdf.save()
+    Returns the list of the PDFs that were inserted.
+    """
+    InterruptionPdf.objects.bulk_create(pdfs, ignore_conflicts=True)
+    inserted_ids = set(InterruptionPdf.objects.filter(
+        id__in=[pdf.id for pdf in pdfs]).values_list("id", flat=True))
+
+    inserted = []
+    for pdf in pdfs:
+        if pdf.id in inserted_ids:
+            inserted.append(pdf)
+        elif pdf.duplicate_of_id is None:
+            pdf.pdf_file.delete(save=False)
+    return inserted
+
+
+def save_interruption_pdfs(interruption_pdf_dicts):
+    """
+    Save a batch of downloaded PDFs that are not stored yet.
+
+    Stored links are looked up with one query and left out before any file
+    is saved. A PDF whose content was already downloaded for another
+    interruption or link is saved as a duplicate of it: it shares the stored
+    file and the extracted text instead of storing its own copy.
+
+    The PDFs are inserted in rounds by `insert_interruption_pdfs`. Each round
+    looks up the stored PDFs with the same content and inserts one original
+    for each new content. PDFs with the same content as an original of the
+    round wait for the next one, so they only point at originals that were
+    actually inserted.
+
+    Params:
+        interruption_pdf_dicts (list): `(interruption, pdf_dict)` tuples as
+            yielded by `crawl_interruption_pdf_files`.
+
+    The `updated` of the interruptions that got new PDFs is bumped, so that
+    incremental runs keep revisiting their pages for a while.
 
+    Returns the list of new `InterruptionPdf` objects.
+    """
+    try:
+        existing = set(InterruptionPdf.objects.filter(
+            interruption__in={
+                interruption for interruption, _ in interruption_pdf_dicts},
+            pdf_link__in={
+                pdf_dict["download_link"]
+                for _, pdf_dict in interruption_pdf_dicts}
+        ).values_list("interruption_id", "pdf_link").order_by())
+
+        pending = []
+        for interruption, pdf_dict in interruption_pdf_dicts:
+            key = (interruption.id, pdf_dict["download_link"])
+            if key in existing:
+                continue
+            existing.add(key)
+            pending.append((InterruptionPdf(
+                interruption=interruption,
+                pdf_link=pdf_dict["download_link"],
+                pdf_link_name=pdf_dict["download_link_text"],
+                sha256=pdf_dict["sha256"]), pdf_dict))
+
+        pdfs = []
+        while pending:
+            # the oldest PDF with the content is the original
+            originals = {
+                pdf.sha256: pdf
+                for pdf in InterruptionPdf.objects.filter(
+                    sha256__in={pdf.sha256 for pdf, _ in pending},
+                    duplicate_of__isnull=True).order_by("-created")
+            }
+            batch = []
+            waiting = []
+            new_contents = set()
+            for pdf, pdf_dict in pending:
+                if pdf.sha256 in originals:
+                    pdf.duplicate_of = originals[pdf.sha256]
+                    pdf.pdf_file.name = pdf.duplicate_of.pdf_file.name
+                elif pdf.sha256 in new_contents:
+                    waiting.append((pdf, pdf_dict))
+                    continue
+                else:
+                    new_contents.add(pdf.sha256)
+                    pdf.pdf_file.save(
+                        pdf_dict["pdf_filename"],
+                        File(pdf_dict["pdf_file_temp"]), save=False)
+                batch.append(pdf)
+            pdfs.extend(insert_interruption_pdfs(batch))
+            pending = waiting
+
+        # new PDFs on a stored page mark its interruption as changed
+        Interruption.objects.filter(
+            id__in={pdf.interruption_id for pdf in pdfs}).update(
+                updated=timezone.now())
+    finally:
+        for _, pdf_dict in interruption_pdf_dicts:
+            pdf_dict["pdf_file_temp"].close()
+
+    return pdfs
+
+
+def interruptions_to_crawl(incremental=False):
+    """
+    Interruptions whose pages should be checked for PDFs.
+
+    Params:
+        incremental (bool): Only return interruptions that have no PDFs yet
+            or that changed within the last
+            `SCRAPE_SETTINGS["INCREMENTAL_RECENT_DAYS"]` days.
+    """
+    interruptions = Interruption.objects.all()
+    if incremental:
+        recent = timezone.now() - timedelta(
+            days=settings.SCRAPE_SETTINGS["INCREMENTAL_RECENT_DAYS"])
+        interruptions = interruptions.filter(
+            Q(interruption_pdfs__isnull=True) | Q(updated__gte=recent)
+        ).distinct()
+
+    return interruptions
+
+
+def stage_interruptions(workers=None, incremental=False, batch_size=None):
+    """
+    Stage the scraped details in the database.
+
+    Scraped interruptions and downloaded PDFs are written in batches.
+
+    Params:
+        workers (int): Number of threads used to fetch interruption pages and
+            PDFs. Defaults to `SCRAPE_SETTINGS["WORKERS"]`.
+        incremental (bool): Stop at the first already known listing page and
+            only visit interruption pages that have no PDFs or changed
+            recently.
+        batch_size (int): Number of interruptions or PDFs written at a time.
+            Defaults to `SCRAPE_SETTINGS["STAGE_BATCH_SIZE"]`.
+    """
+    batch_size = batch_size or settings.SCRAPE_SETTINGS["STAGE_BATCH_SIZE"]
+    for interruption_dicts in iter_batches(
+            scrape_interruption_titles(incremental=incremental), batch_size):
+        saved = save_interruptions(interruption_dicts)
+        print("Saved {} new of {} interruptions".format(
+            saved, len(interruption_dicts)))
+
+    print("\n\nFinished saving interruptions\n\n")
+
+    for interruption_pdf_dicts in iter_batches(
+            crawl_interruption_pdf_files(
+                interruptions_to_crawl(incremental), workers=workers),
+            batch_size):
+        for pdf in save_interruption_pdfs(interruption_pdf_dicts):
             print("\tSaved PDF {}".format(pdf))
+
+    print("\n\nHTTP stats: {}".format(http_stats()))
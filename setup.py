@@ -18,6 +18,7 @@ setup(
     author_email="murithievans80@gmail.com",
     url="https://github.com/evansmurithi/kplc-interruptions",
     packages=find_packages(exclude=['tests', 'tests.*']),
+    python_requires=">=3.8",
     classifiers=[
         "Development Status :: 2 - Pre-Alpha",
         "Environment :: Web Environment",
@@ -30,12 +31,15 @@ setup(
         "environs[django]==4.2.0",
         "psycopg2-binary==2.8.3",
         "requests==2.22.0",
-        "requests-cache==0.5.0",
         "beautifulsoup4==4.7.1",
         "pdftotext==2.1.1",
         "django>=2.2.2,<3.0",
         "elasticsearch-dsl==7.0.0",
     ],
+    extras_require={
+        "lxml": ["lxml"],
+        "selectolax": ["selectolax"],
+    },
     scripts=[],
     include_package_data=True,
 )
@@ -0,0 +1,102 @@
+import io
+from contextlib import redirect_stdout
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from kplc_interruptions.interruptions.documents import InterruptionPdfTextDoc
+from kplc_interruptions.interruptions.models import (
+    Interruption, InterruptionPdf, InterruptionPdfText)
+from kplc_interruptions.notifications.models import NotificationPDFQueue
+from tests.test_scrape import MediaRootMixin
+
+
+class DedupeInterruptionPdfsTest(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.interruption = Interruption.objects.create(
+            title="Interruptions - 20.06.2019",
+            link="https://kplc.co.ke/content/item/1")
+
+    def create_pdf(self, name, content=None):
+        pdf = InterruptionPdf(
+            interruption=self.interruption, pdf_link_name=name,
+            pdf_link="https://kplc.co.ke/img/full/{}".format(name))
+        if content is None:
+            pdf.pdf_file.name = "interruptions/missing/{}".format(name)
+        else:
+            pdf.pdf_file.save(name, ContentFile(content), save=False)
+        pdf.save()
+        return pdf
+
+    def dedupe(self):
+        with mock.patch.object(InterruptionPdfTextDoc, "delete") as delete, \
+                mock.patch(
+                    "kplc_interruptions.interruptions.management.commands."
+                    "dedupe_interruption_pdfs.invalidate_search_cache"), \
+                redirect_stdout(io.StringIO()):
+            call_command("dedupe_interruption_pdfs")
+        return delete
+
+    def test_links_duplicates_and_skips_unreadable_files(self):
+        first = self.create_pdf("a.pdf", b"%PDF-1.4 same")
+        second = self.create_pdf("b.pdf", b"%PDF-1.4 same")
+        other = self.create_pdf("c.pdf", b"%PDF-1.4 other")
+        missing = self.create_pdf("d.pdf")
+        also_missing = self.create_pdf("e.pdf")
+
+        with self.assertLogs(
+                "kplc_interruptions.interruptions.management.commands."
+                "dedupe_interruption_pdfs", "ERROR"), \
+                redirect_stdout(io.StringIO()):
+            call_command("dedupe_interruption_pdfs")
+
+        duplicates = {
+            pdf.id: pdf.duplicate_of_id
+            for pdf in InterruptionPdf.objects.all()}
+        self.assertIsNone(duplicates[first.id])
+        self.assertEqual(duplicates[second.id], first.id)
+        self.assertIsNone(duplicates[other.id])
+        self.assertIsNone(duplicates[missing.id])
+        self.assertIsNone(duplicates[also_missing.id])
+        missing.refresh_from_db()
+        self.assertEqual(missing.sha256, "")
+
+    def test_duplicates_of_a_relinked_pdf_point_at_the_original(self):
+        first = self.create_pdf("a.pdf", b"%PDF-1.4 same")
+        second = self.create_pdf("b.pdf", b"%PDF-1.4 same")
+        third = self.create_pdf("c.pdf", b"%PDF-1.4 same")
+        # `third` was linked to `second` on an earlier run, before `first`
+        # was downloaded
+        InterruptionPdf.objects.filter(id=third.id).update(
+            duplicate_of=second, pdf_file=second.pdf_file.name)
+
+        self.dedupe()
+
+        third.refresh_from_db()
+        self.assertEqual(third.duplicate_of_id, first.id)
+        self.assertEqual(third.pdf_file.name, first.pdf_file.name)
+
+    def test_texts_of_duplicates_are_removed(self):
+        first = self.create_pdf("a.pdf", b"%PDF-1.4 same")
+        second = self.create_pdf("b.pdf", b"%PDF-1.4 same")
+        third = self.create_pdf("c.pdf", b"%PDF-1.4 same")
+        now = timezone.now()
+        first_text, second_text, third_text = [
+            InterruptionPdfText.objects.create(pdf=pdf, pdf_text="Embu")
+            for pdf in (first, second, third)]
+        InterruptionPdfText.objects.update(indexed_on=now)
+        # notifications were already queued for the text of `third`
+        NotificationPDFQueue.objects.create(pdf_text=third_text)
+
+        delete = self.dedupe()
+
+        self.assertEqual(delete.call_count, 2)
+        self.assertEqual(
+            dict(InterruptionPdfText.objects.values_list("id", "indexed_on")),
+            {first_text.id: now, third_text.id: None})
+        self.assertFalse(self.dedupe().called)
@@ -0,0 +1,120 @@
+from django.test import SimpleTestCase
+
+from kplc_interruptions.notifications.matching import (
+    AreaMatcher, BKTree, FuzzyAreaMatcher, allowed_edits, edit_distance)
+
+
+class AreaMatcherTest(SimpleTestCase):
+
+    def test_areas_match_whole_words(self):
+        matcher = AreaMatcher([(1, ["Embu"])])
+
+        self.assertEqual(matcher.match("Parts of Embu Town"), {1: {"Embu"}})
+        self.assertEqual(matcher.match("Embulbul Primary"), {})
+        self.assertEqual(matcher.match("Kiembu Road"), {})
+
+    def test_overlapping_areas_are_all_found(self):
+        matcher = AreaMatcher([
+            (1, ["South C"]), (2, ["South C Estate"]), (3, ["C Estate"]),
+            (4, ["South B"])])
+
+        self.assertEqual(
+            matcher.match("Whole of South C Estate and environs"),
+            {1: {"South C"}, 2: {"South C Estate"}, 3: {"C Estate"}})
+
+    def test_areas_match_across_punctuation_and_line_wraps(self):
+        matcher = AreaMatcher([(1, ["Kilimani Estate"]), (2, ["Ngong Rd."])])
+
+        self.assertEqual(
+            matcher.match("AREA: KILIMANI\nESTATE, Ngong-Rd, Adams"),
+            {1: {"Kilimani Estate"}, 2: {"Ngong Rd."}})
+
+    def test_matches_fan_out_to_every_subscribed_account(self):
+        matcher = AreaMatcher([
+            (1, ["Kitengela", "Karen"]), (2, ["kitengela"]), (3, ["Karen"]),
+            (4, ["Lavington"]), (5, ["  ", "Karen"])])
+
+        self.assertEqual(
+            matcher.match("Kitengela Town, Karen Plains"),
+            {1: {"Kitengela", "Karen"}, 2: {"Kitengela"}, 3: {"Karen"},
+             5: {"Karen"}})
+
+
+class EditDistanceTest(SimpleTestCase):
+
+    def test_distance(self):
+        self.assertEqual(edit_distance("kilelshwa", "kileleshwa"), 1)
+        self.assertEqual(edit_distance("westlands", "west lands"), 1)
+        self.assertEqual(edit_distance("kitten", "sitting"), 3)
+        self.assertEqual(edit_distance("", "karen"), 5)
+        self.assertEqual(edit_distance("karen", "karen"), 0)
+
+    def test_max_distance_stops_early(self):
+        self.assertEqual(edit_distance("kitten", "sitting", 3), 3)
+        self.assertEqual(edit_distance("kitten", "sitting", 2), 3)
+        self.assertEqual(edit_distance("kitten", "sitting", 1), 2)
+        # the lengths alone differ by more than `max_distance`
+        self.assertEqual(edit_distance("embu", "embakasi", 2), 3)
+
+
+class BKTreeTest(SimpleTestCase):
+
+    def test_search_finds_what_comparing_every_word_finds(self):
+        words = [
+            "karen", "kareni", "karan", "kiserian", "kitengela", "kitisuru",
+            "kilimani", "kileleshwa", "kibera", "kabete", "kasarani",
+            "kahawa", "kahawa west", "kangemi", "kawangware", "kayole",
+            "kariobangi", "karura", "kiambu", "kikuyu", "karen plains"]
+        tree = BKTree(words + ["karen"])
+
+        for query in ("karen", "kilelshwa", "kahawa wst", "kiamb", "kyole",
+                      "nairobi", ""):
+            for max_distance in range(4):
+                expected = sorted(
+                    (word, edit_distance(query, word)) for word in words
+                    if edit_distance(query, word) <= max_distance)
+                self.assertEqual(
+                    sorted(tree.search(query, max_distance)), expected,
+                    (query, max_distance))
+
+    def test_empty_tree(self):
+        self.assertEqual(BKTree().search("karen", 2), [])
+
+
+class FuzzyAreaMatcherTest(SimpleTestCase):
+
+    def test_misspelled_areas_match(self):
+        matcher = FuzzyAreaMatcher(
+            [(1, ["Kileleshwa"]), (2, ["Westlands"])], max_edits=2)
+
+        self.assertEqual(
+            matcher.match("AREA: KILELSHWA, West lands"),
+            {1: {"Kileleshwa"}, 2: {"Westlands"}})
+
+    def test_short_areas_need_the_exact_spelling(self):
+        self.assertEqual(allowed_edits("nyali", 2), 0)
+        self.assertEqual(allowed_edits("kilimani", 2), 1)
+        self.assertEqual(allowed_edits("kileleshwa", 2), 2)
+        matcher = FuzzyAreaMatcher([(1, ["Nyali"]), (2, ["Nyari"])])
+
+        self.assertEqual(matcher.match("Nyari Estate"), {2: {"Nyari"}})
+        self.assertEqual(matcher.match("Nyali Bridge"), {1: {"Nyali"}})
+
+    def test_areas_differing_by_their_initials_stay_apart(self):
+        matcher = FuzzyAreaMatcher([(1, ["South B"]), (2, ["South C"])])
+
+        self.assertEqual(matcher.match("Whole of South C"), {2: {"South C"}})
+        self.assertEqual(matcher.match("Whole of South B"), {1: {"South B"}})
+
+    def test_hyphenated_line_wraps_are_joined(self):
+        matcher = FuzzyAreaMatcher([(1, ["Kileleshwa"]), (2, ["Kasarani"])])
+
+        self.assertEqual(
+            matcher.match("Parts of Kilel-\n  eshwa and Kasa- \r\nrani"),
+            {1: {"Kileleshwa"}, 2: {"Kasarani"}})
+
+    def test_areas_match_whole_words(self):
+        matcher = FuzzyAreaMatcher([(1, ["Kiambu"])])
+
+        self.assertEqual(matcher.match("Kiambuthia Road"), {})
+        self.assertEqual(matcher.match("Kiambu Town"), {1: {"Kiambu"}})
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from kplc_interruptions.common import metrics
+from kplc_interruptions.scrape import download_pdf
+from tests.test_scrape import response
+
+
+def metrics_settings(**overrides):
+    return dict(settings.METRICS_SETTINGS, **overrides)
+
+
+class MetricsViewTest(SimpleTestCase):
+
+    def setUp(self):
+        metrics.reset()
+        metrics.inc("kplc_pdfs_downloaded_total")
+
+    def test_allowed_ips_read_the_metrics(self):
+        response = self.client.get("/metrics", REMOTE_ADDR="127.0.0.1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"kplc_pdfs_downloaded_total 1\n", response.content)
+
+    def test_other_clients_need_the_token(self):
+        with override_settings(METRICS_SETTINGS=metrics_settings(
+                TOKEN="secret")):
+            self.assertEqual(self.client.get(
+                "/metrics", REMOTE_ADDR="203.0.113.5").status_code, 403)
+            self.assertEqual(self.client.get(
+                "/metrics", REMOTE_ADDR="203.0.113.5",
+                HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+            self.assertEqual(self.client.get(
+                "/metrics", REMOTE_ADDR="203.0.113.5",
+                HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+
+    def test_no_token_only_allows_the_listed_ips(self):
+        self.assertEqual(self.client.get(
+            "/metrics", REMOTE_ADDR="203.0.113.5",
+            HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+
+class DownloadPdfMetricsTest(SimpleTestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def download(self, pdf_response):
+        pdf_response.__enter__ = mock.Mock(return_value=pdf_response)
+        pdf_response.__exit__ = mock.Mock(return_value=False)
+        pdf_response.iter_content.return_value = [b"%PDF-1.4"]
+        with mock.patch("kplc_interruptions.scrape.get_session") as session:
+            session.return_value.get.return_value = pdf_response
+            return download_pdf("https://kplc.co.ke/img/full/a.pdf")
+
+    def observed(self):
+        return {
+            dict(key)["status"]: value[-1]
+            for key, value in metrics.snapshot()[
+                "kplc_http_request_seconds"].items()}
+
+    def test_failed_downloads_are_observed(self):
+        with self.assertRaises(Exception):
+            self.download(response(404))
+        with self.assertRaises(Exception):
+            self.download(response(200, headers={
+                "Content-Type": "text/html"}))
+
+        self.assertEqual(self.observed(), {"404": 1, "200": 1})
+        self.assertNotIn("kplc_pdfs_downloaded_total", metrics.snapshot())
+
+    def test_downloads_are_observed(self):
+        _, pdf_file_temp, _ = self.download(response(200, headers={
+            "Content-Type": "application/pdf"}))
+        pdf_file_temp.close()
+
+        self.assertEqual(self.observed(), {"200": 1})
+        self.assertEqual(
+            metrics.snapshot()["kplc_pdfs_downloaded_total"], {(): 1})
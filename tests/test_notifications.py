@@ -0,0 +1,205 @@
+import datetime
+import smtplib
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from kplc_interruptions.interruptions.models import (
+    Interruption, InterruptionArea, InterruptionPdf, InterruptionPdfText)
+from kplc_interruptions.notifications.models import (
+    NotificationAccount, NotificationDelivery, NotificationPDFQueue)
+from kplc_interruptions.notifications.tasks import (
+    build_area_matcher, claim_queue_entries, match_pdf_queue,
+    process_notification_queue)
+
+
+class CanonicalAreasTest(TestCase):
+
+    def create(self, email, areas):
+        return NotificationAccount.objects.create(
+            email=email, areas=areas, is_active=True)
+
+    def test_save_sets_canonical_areas(self):
+        account = self.create("a@example.com", ["Kilimani  Estate", "CBD_"])
+
+        account.refresh_from_db()
+        self.assertEqual(account.canonical_areas, ["kilimani estate", "cbd"])
+
+    def test_bulk_create_sets_canonical_areas(self):
+        NotificationAccount.objects.bulk_create([
+            NotificationAccount(
+                email="a@example.com", areas=["Kilimani-Estate"],
+                is_active=True),
+        ])
+
+        account = NotificationAccount.objects.get()
+        self.assertEqual(account.canonical_areas, ["kilimani estate"])
+
+    def test_bulk_update_syncs_canonical_areas(self):
+        account = self.create("a@example.com", ["Kilimani"])
+        account.areas = ["Lavington", "Karen."]
+
+        NotificationAccount.objects.bulk_update([account], ["areas"])
+
+        account.refresh_from_db()
+        self.assertEqual(account.canonical_areas, ["lavington", "karen"])
+
+    def test_update_syncs_canonical_areas(self):
+        self.create("a@example.com", ["Kilimani"])
+        self.create("b@example.com", ["Karen"])
+
+        NotificationAccount.objects.filter(email="a@example.com").update(
+            areas=["South C"])
+
+        self.assertEqual(
+            dict(NotificationAccount.objects.values_list(
+                "email", "canonical_areas")),
+            {"a@example.com": ["south c"], "b@example.com": ["karen"]})
+
+    def test_update_rejects_writes_that_would_drift(self):
+        self.create("a@example.com", ["Kilimani"])
+        accounts = NotificationAccount.objects.all()
+
+        with self.assertRaises(ValueError):
+            accounts.update(canonical_areas=["karen"])
+        with self.assertRaises(ValueError):
+            accounts.update(areas=accounts.values("areas")[:1])
+
+
+class NotificationQueueTest(TestCase):
+
+    def setUp(self):
+        interruption = Interruption.objects.create(
+            title="Interruptions - 23.06.2019",
+            link="https://kplc.co.ke/content/item/1")
+        pdf = InterruptionPdf.objects.create(
+            interruption=interruption,
+            pdf_link="https://kplc.co.ke/img/full/1.pdf")
+        InterruptionArea.objects.create(
+            pdf=pdf, region="Nairobi", county="Kajiado", area="Kitengela",
+            places=["Kitengela Town"])
+        pdf_text = InterruptionPdfText.objects.create(
+            pdf=pdf, pdf_text="AREA: KITENGELA\nKitengela Town")
+        self.queue_entry = NotificationPDFQueue.objects.create(
+            pdf_text=pdf_text, available_on=timezone.now())
+        for email in ("a@example.com", "b@example.com"):
+            NotificationAccount.objects.create(
+                email=email, areas=["Kitengela"], is_active=True)
+
+    @override_settings(NOTIFY_SETTINGS=dict(
+        settings.NOTIFY_SETTINGS, FUZZY_MAX_EDITS=0))
+    def test_texts_without_parsed_areas_are_scanned(self):
+        NotificationAccount.objects.create(
+            email="c@example.com", areas=["Isinya"], is_active=True)
+        with mock.patch(
+                "kplc_interruptions.notifications.tasks.build_area_matcher",
+                wraps=build_area_matcher) as build:
+            # the index on the parsed areas is used when there are any
+            [(_, matches)] = match_pdf_queue([self.queue_entry])
+            self.assertFalse(build.called)
+            self.assertEqual(set(matches), {
+                account.id for account in NotificationAccount.objects.filter(
+                    areas=["Kitengela"])})
+
+            InterruptionArea.objects.all().delete()
+            self.queue_entry.pdf_text.pdf_text = "AREA: ISINYA\nKitengela"
+            [(_, matches)] = match_pdf_queue([self.queue_entry])
+
+        build.assert_called_once_with()
+        self.assertEqual(
+            {NotificationAccount.objects.get(id=account_id).email: areas
+             for account_id, areas in matches.items()},
+            {"a@example.com": {"Kitengela"}, "b@example.com": {"Kitengela"},
+             "c@example.com": {"Isinya"}})
+
+    def test_claimed_entries_are_skipped_until_the_claim_runs_out(self):
+        claimed = claim_queue_entries(10, "worker-1")
+
+        self.assertEqual(claimed, [self.queue_entry])
+        self.queue_entry.refresh_from_db()
+        self.assertEqual(self.queue_entry.claimed_by, "worker-1")
+        self.assertGreater(self.queue_entry.claimed_until, timezone.now())
+        self.assertEqual(claim_queue_entries(10, "worker-2"), [])
+
+        NotificationPDFQueue.objects.update(
+            claimed_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(
+            claim_queue_entries(10, "worker-2"), [self.queue_entry])
+
+    def test_retried_batch_skips_emails_already_sent(self):
+        send_messages = locmem.EmailBackend.send_messages
+        failures = []
+
+        def fail_once_for_b(backend, messages):
+            if messages[0].to == ["b@example.com"] and not failures:
+                failures.append(messages)
+                raise smtplib.SMTPServerDisconnected("Connection reset")
+            return send_messages(backend, messages)
+
+        with mock.patch.object(
+                locmem.EmailBackend, "send_messages", fail_once_for_b), \
+                self.assertLogs("kplc_interruptions.notifications.tasks"):
+            stats = process_notification_queue(send_rate=0)
+            self.assertEqual(
+                (stats["sent"], stats["failed"], stats["retried"]), (1, 1, 1))
+            self.queue_entry.refresh_from_db()
+            self.assertFalse(self.queue_entry.is_processed)
+            self.assertIsNone(self.queue_entry.claimed_until)
+            self.assertEqual(self.queue_entry.attempts, 1)
+
+            NotificationPDFQueue.objects.update(available_on=timezone.now())
+            process_notification_queue(send_rate=0)
+
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ["a@example.com", "b@example.com"])
+        self.queue_entry.refresh_from_db()
+        self.assertTrue(self.queue_entry.is_processed)
+        self.assertEqual(NotificationDelivery.objects.count(), 2)
+
+    @override_settings(NOTIFY_SETTINGS=dict(
+        settings.NOTIFY_SETTINGS, CLAIM_RENEW_EVERY=1))
+    def test_sending_stops_when_the_claim_is_lost(self):
+        send_messages = locmem.EmailBackend.send_messages
+
+        def send_and_lose_claim(backend, messages):
+            # the claim ran out and another worker claimed the entry
+            NotificationPDFQueue.objects.update(claimed_by="worker-2")
+            return send_messages(backend, messages)
+
+        with mock.patch.object(
+                locmem.EmailBackend, "send_messages", send_and_lose_claim), \
+                self.assertLogs(
+                    "kplc_interruptions.notifications.tasks", "WARNING"):
+            stats = process_notification_queue(send_rate=0)
+
+        self.assertEqual(stats["lost_batches"], 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.queue_entry.refresh_from_db()
+        self.assertFalse(self.queue_entry.is_processed)
+        self.assertEqual(self.queue_entry.claimed_by, "worker-2")
+        self.assertEqual(self.queue_entry.attempts, 0)
+
+    def test_claim_is_renewed_while_sending(self):
+        claimed_until = []
+
+        def send_messages(backend, messages):
+            claimed_until.append(NotificationPDFQueue.objects.values_list(
+                "claimed_until", flat=True).get())
+            return len(messages)
+
+        with override_settings(NOTIFY_SETTINGS=dict(
+                settings.NOTIFY_SETTINGS, CLAIM_RENEW_EVERY=1)), \
+                mock.patch.object(
+                    locmem.EmailBackend, "send_messages", send_messages), \
+                self.assertLogs("kplc_interruptions.notifications.tasks"):
+            process_notification_queue(send_rate=0)
+
+        self.assertEqual(len(claimed_until), 2)
+        self.assertLess(claimed_until[0], claimed_until[1])
+        self.queue_entry.refresh_from_db()
+        self.assertTrue(self.queue_entry.is_processed)
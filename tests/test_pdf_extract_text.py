@@ -0,0 +1,127 @@
+import io
+import os
+import time
+from contextlib import redirect_stdout
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from kplc_interruptions.interruptions.models import (
+    Interruption, InterruptionPdf)
+from kplc_interruptions.pdf_extract_text import (
+    ExtractionPool, extract_text_from_pdf, iter_extracted_texts)
+
+
+def open_name(path, mode):
+    return mock.MagicMock(**{"__enter__.return_value.name": path})
+
+
+def read_pages(f):
+    return ["Page of {}".format(os.path.basename(f.name))]
+
+
+def read_pages_or_hang(f):
+    if f.name.endswith("stuck.pdf"):
+        time.sleep(60)
+    return read_pages(f)
+
+
+def read_pages_or_crash(f):
+    if f.name.endswith("crash.pdf"):
+        os._exit(1)
+    return read_pages(f)
+
+
+class ExtractionPoolTest(SimpleTestCase):
+
+    def jobs(self, names, timeout=5):
+        # files are not opened, their paths only name the PDFs
+        return [
+            (name, "/dev/null/{}".format(name), timeout, 10, 1024)
+            for name in names]
+
+    def run_jobs(self, read, jobs, workers=2):
+        # workers are forked, so they see the patched `PDF`
+        with mock.patch(
+                "kplc_interruptions.pdf_extract_text.PDF", side_effect=read), \
+                mock.patch("kplc_interruptions.pdf_extract_text.open",
+                           create=True, side_effect=open_name):
+            return {
+                pdf_id: (extracted, error)
+                for pdf_id, extracted, error in iter_extracted_texts(
+                    jobs, workers)}
+
+    def test_extracts_every_pdf(self):
+        results = self.run_jobs(read_pages, self.jobs(["a.pdf", "b.pdf"]))
+
+        self.assertEqual(results["a.pdf"][0]["pages"], ["Page of a.pdf"])
+        self.assertIsNone(results["b.pdf"][1])
+
+    def test_stuck_pdf_times_out_without_holding_up_the_others(self):
+        start = time.monotonic()
+        results = self.run_jobs(
+            read_pages_or_hang,
+            self.jobs(["stuck.pdf", "a.pdf", "b.pdf", "c.pdf"], timeout=1))
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertIsNone(results["stuck.pdf"][0])
+        self.assertTrue(results["stuck.pdf"][1].startswith(
+            "ExtractionTimeout"))
+        for name in ("a.pdf", "b.pdf", "c.pdf"):
+            self.assertIsNone(results[name][1])
+
+    def test_crashed_worker_is_replaced(self):
+        results = self.run_jobs(
+            read_pages_or_crash, self.jobs(["crash.pdf", "a.pdf", "b.pdf"]),
+            workers=1)
+
+        self.assertTrue(results["crash.pdf"][1].startswith("WorkerDied"))
+        self.assertEqual(results["b.pdf"][0]["pages"], ["Page of b.pdf"])
+
+    def test_pool_can_be_used_again_after_stopping_early(self):
+        with mock.patch(
+                "kplc_interruptions.pdf_extract_text.PDF",
+                side_effect=read_pages_or_hang), \
+                mock.patch("kplc_interruptions.pdf_extract_text.open",
+                           create=True, side_effect=open_name), \
+                ExtractionPool(2) as pool:
+            results = pool.imap_unordered(
+                self.jobs(["a.pdf", "stuck.pdf"], timeout=30))
+            next(results)
+            results.close()
+
+            results = list(pool.imap_unordered(self.jobs(["b.pdf"])))
+
+        self.assertEqual(results[0][0], "b.pdf")
+
+
+class ExtractTextFromPdfTest(TestCase):
+
+    def test_workers_are_started_once_per_run(self):
+        interruption = Interruption.objects.create(
+            title="Interruptions - 20.06.2019",
+            link="https://kplc.co.ke/content/item/1")
+        for name in ("a.pdf", "b.pdf", "c.pdf"):
+            pdf = InterruptionPdf(
+                interruption=interruption,
+                pdf_link="https://kplc.co.ke/img/full/{}".format(name))
+            pdf.pdf_file.name = "interruptions/{}".format(name)
+            pdf.save()
+
+        extract_settings = dict(settings.EXTRACT_SETTINGS, CACHE_DIR="")
+        with override_settings(EXTRACT_SETTINGS=extract_settings), \
+                mock.patch(
+                    "kplc_interruptions.pdf_extract_text.PDF",
+                    side_effect=read_pages), \
+                mock.patch("kplc_interruptions.pdf_extract_text.open",
+                           create=True, side_effect=open_name), \
+                mock.patch.object(
+                    ExtractionPool, "start_worker", autospec=True,
+                    side_effect=ExtractionPool.start_worker) as start_worker, \
+                redirect_stdout(io.StringIO()):
+            extract_text_from_pdf(workers=2, batch_size=1)
+
+        self.assertEqual(start_worker.call_count, 2)
+        self.assertFalse(InterruptionPdf.objects.filter(
+            text_extracted_on__isnull=True).exists())
@@ -0,0 +1,124 @@
+import datetime
+
+from django.test import SimpleTestCase, TestCase
+
+from kplc_interruptions.interruptions.models import (
+    Interruption, InterruptionArea, InterruptionPdf, InterruptionPdfText)
+from kplc_interruptions.pdf_extract_text import save_pdf_texts
+from kplc_interruptions.pdf_parse_text import (
+    MAX_NAME_LENGTH, build_interruption_areas, parse_interruption_text,
+    parse_title_dates)
+
+BULLETIN = """
+NAIROBI REGION
+PARTS OF KAJIADO COUNTY
+AREA: KITENGELA
+DATE: Sunday 23.06.2019 TIME: 9.00 A.M. - 5.00 P.M.
+Kitengela Town, Acacia Estate, Milimani & adjacent
+customers.
+AREA: ISINYA
+DATE: Sunday 23.06.2019 TIME: 8.30 A.M. - 2.00 P.M.
+Isinya Town, Kipe-
+to & adjacent customers.
+"""
+
+
+class ParseInterruptionTextTest(SimpleTestCase):
+
+    def test_parses_areas(self):
+        areas = parse_interruption_text(BULLETIN)
+
+        self.assertEqual(areas[0], {
+            "region": "Nairobi",
+            "county": "Kajiado",
+            "area": "Kitengela",
+            "date": datetime.date(2019, 6, 23),
+            "start_time": datetime.time(9, 0),
+            "end_time": datetime.time(17, 0),
+            "places": ["Kitengela Town", "Acacia Estate", "Milimani"],
+        })
+        self.assertEqual(areas[1]["area"], "Isinya")
+        self.assertEqual(areas[1]["start_time"], datetime.time(8, 30))
+        self.assertEqual(areas[1]["places"], ["Isinya Town", "Kipeto"])
+
+    def test_text_without_areas(self):
+        self.assertEqual(parse_interruption_text("Nothing to see here"), [])
+
+    def test_long_names_are_truncated(self):
+        text = "AREA: {}\n{} & adjacent customers.".format(
+            "Kitengela " * 40, "Town " * 100)
+
+        with self.assertLogs("kplc_interruptions.pdf_parse_text", "WARNING"):
+            interruption_area, = build_interruption_areas(None, text)
+
+        self.assertEqual(len(interruption_area.area), MAX_NAME_LENGTH)
+        self.assertEqual(
+            [len(place) for place in interruption_area.places],
+            [MAX_NAME_LENGTH])
+
+
+class ParseTitleDatesTest(SimpleTestCase):
+
+    def test_single_date(self):
+        self.assertEqual(
+            parse_title_dates("Interruptions - 20.06.2019"),
+            (datetime.date(2019, 6, 20), datetime.date(2019, 6, 20)))
+
+    def test_date_ranges(self):
+        june_20_to_22 = (
+            datetime.date(2019, 6, 20), datetime.date(2019, 6, 22))
+        for title in (
+                "Interruptions - 20.06.2019 - 22.06.2019",
+                "Interruptions - 20 - 22.06.2019",
+                "Interruptions - 20th & 22nd June 2019",
+                "Interruptions - 20th to 22nd June, 19"):
+            with self.subTest(title=title):
+                self.assertEqual(parse_title_dates(title), june_20_to_22)
+
+    def test_title_without_a_valid_date(self):
+        self.assertEqual(
+            parse_title_dates("Interruptions - Notice"), (None, None))
+        self.assertEqual(
+            parse_title_dates("Interruptions - 31.02.2019"), (None, None))
+
+
+class InterruptionDatesTest(TestCase):
+
+    def test_interruptions_without_dates_are_listed_last(self):
+        for n, title in enumerate((
+                "Interruptions - Notice",
+                "Interruptions - 20.06.2019",
+                "Interruptions - 22nd June 2019")):
+            Interruption.objects.create(
+                title=title, link="https://kplc.co.ke/content/item/{}".format(
+                    n))
+
+        self.assertEqual(
+            list(Interruption.objects.values_list(
+                "interruption_date", flat=True)),
+            [datetime.date(2019, 6, 22), datetime.date(2019, 6, 20), None])
+
+
+class SavePdfTextsTest(TestCase):
+
+    def test_long_place_does_not_fail_the_chunk(self):
+        interruption = Interruption.objects.create(
+            title="Interruptions - 23.06.2019",
+            link="https://kplc.co.ke/content/item/1")
+        pdfs = [
+            InterruptionPdf.objects.create(
+                interruption=interruption, pdf_link_name=str(n),
+                pdf_link="https://kplc.co.ke/img/full/{}.pdf".format(n))
+            for n in range(2)]
+        pdf_texts = [
+            InterruptionPdfText(pdf=pdfs[0], pdf_text=BULLETIN),
+            InterruptionPdfText(
+                pdf=pdfs[1],
+                pdf_text="AREA: KIPETO\n" + "Kipeto Town " * 100),
+        ]
+
+        with self.assertLogs("kplc_interruptions.pdf_parse_text", "WARNING"):
+            save_pdf_texts(pdf_texts, [])
+
+        self.assertEqual(InterruptionPdfText.objects.count(), 2)
+        self.assertEqual(InterruptionArea.objects.count(), 3)
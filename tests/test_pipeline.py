@@ -0,0 +1,160 @@
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from kplc_interruptions.interruptions.models import (
+    Interruption, InterruptionPdf, InterruptionPdfText)
+from kplc_interruptions.pipeline import (
+    DONE, PipelineStopped, StageQueue, run_pipeline, run_stage)
+from tests.test_pdf_extract_text import open_name, read_pages
+from tests.test_scrape import MediaRootMixin, pdf_dict
+
+
+class StageQueueTest(SimpleTestCase):
+
+    def test_get_batch_stops_at_done(self):
+        stage_queue = StageQueue("pdfs", 10)
+        for item in (1, 2, DONE):
+            stage_queue.put_item(item)
+
+        self.assertEqual(stage_queue.get_batch(5, wait=0.1), ([1, 2], True))
+
+    def test_close_stops_a_stage_waiting_on_a_full_queue(self):
+        stage_queue = StageQueue("pdfs", 1)
+        stage_queue.put_item(1)
+        stopped = []
+
+        def put():
+            try:
+                for item in range(2, 10):
+                    stage_queue.put_item(item)
+            except PipelineStopped:
+                stopped.append(True)
+
+        thread = threading.Thread(target=put)
+        thread.start()
+        stage_queue.close()
+        thread.join(timeout=5)
+
+        self.assertEqual(stopped, [True])
+        with self.assertRaises(PipelineStopped):
+            stage_queue.get_batch(5, wait=0.1)
+
+
+class RunStageTest(SimpleTestCase):
+
+    def test_finished_stage_leaves_its_input_open(self):
+        input_queue = StageQueue("pdfs", 10)
+        output_queue = StageQueue("texts", 10)
+        failures = []
+
+        with mock.patch("kplc_interruptions.pipeline.connection"):
+            run_stage(
+                lambda: None, (), input_queue, output_queue, 2, failures)
+
+        # other workers of the stage keep taking items off the input queue
+        self.assertFalse(input_queue.closed.is_set())
+        self.assertEqual(output_queue.get_batch(5, wait=0.1), ([], True))
+        self.assertEqual(output_queue.get_batch(5, wait=0.1), ([], True))
+        self.assertEqual(failures, [])
+
+    def test_failed_stage_closes_its_input(self):
+        input_queue = StageQueue("pdfs", 10)
+        output_queue = StageQueue("texts", 10)
+        failures = []
+
+        def failing_stage():
+            raise RuntimeError("Elasticsearch is down")
+
+        with mock.patch("kplc_interruptions.pipeline.connection"), \
+                self.assertLogs("kplc_interruptions.pipeline", "ERROR"):
+            run_stage(
+                failing_stage, (), input_queue, output_queue, 1, failures)
+
+        self.assertTrue(input_queue.closed.is_set())
+        self.assertEqual(output_queue.get_batch(5, wait=0.1), ([], True))
+        self.assertEqual(failures, ["failing_stage"])
+
+
+class RunPipelineTest(MediaRootMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(
+            EXTRACT_SETTINGS=dict(settings.EXTRACT_SETTINGS, CACHE_DIR=""))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patches = [
+            mock.patch(
+                "kplc_interruptions.pipeline.scrape_interruption_titles",
+                self.scrape_interruption_titles),
+            mock.patch(
+                "kplc_interruptions.pipeline.crawl_interruption_pdf_files",
+                self.crawl_interruption_pdf_files),
+            mock.patch("kplc_interruptions.pipeline.http_stats", dict),
+            mock.patch("kplc_interruptions.pipeline.connections"),
+            mock.patch(
+                "kplc_interruptions.interruptions.indexing.connections"),
+            mock.patch(
+                "kplc_interruptions.interruptions.indexing."
+                "invalidate_search_cache"),
+            # extraction workers are forked, so they see the patched `PDF`
+            mock.patch(
+                "kplc_interruptions.pdf_extract_text.PDF",
+                side_effect=read_pages),
+            mock.patch(
+                "kplc_interruptions.pdf_extract_text.open", create=True,
+                side_effect=open_name),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def scrape_interruption_titles(self, incremental=False):
+        yield {
+            "title": "Interruptions - 20.06.2019",
+            "link": "https://kplc.co.ke/content/item/1"}
+
+    def crawl_interruption_pdf_files(self, interruptions, workers=None):
+        for interruption in interruptions:
+            for n in range(12):
+                yield interruption, pdf_dict(
+                    "https://kplc.co.ke/img/full/{}.pdf".format(n),
+                    "%PDF-1.4 {}".format(n).encode())
+
+    def test_every_text_is_indexed_with_several_index_workers(self):
+        def bulk_index_pdf_texts(client, pdf_texts, *args):
+            return [str(pdf_text.id) for pdf_text in pdf_texts]
+
+        with mock.patch(
+                "kplc_interruptions.interruptions.indexing."
+                "bulk_index_pdf_texts", bulk_index_pdf_texts), \
+                self.assertLogs("kplc_interruptions", "INFO"):
+            failures = run_pipeline(
+                index_workers=3, queue_size=2, batch_size=2)
+
+        self.assertEqual(failures, [])
+        self.assertEqual(Interruption.objects.count(), 1)
+        self.assertEqual(InterruptionPdf.objects.filter(
+            text_extracted_on__isnull=False).count(), 12)
+        self.assertEqual(InterruptionPdfText.objects.filter(
+            indexed_on__isnull=False).count(), 12)
+
+    def test_failed_stage_stops_the_stages_before_it(self):
+        def bulk_index_pdf_texts(client, pdf_texts, *args):
+            raise RuntimeError("Elasticsearch is down")
+
+        with mock.patch(
+                "kplc_interruptions.interruptions.indexing."
+                "bulk_index_pdf_texts", bulk_index_pdf_texts), \
+                self.assertLogs("kplc_interruptions", "INFO"):
+            failures = run_pipeline(
+                index_workers=1, queue_size=2, batch_size=2)
+
+        self.assertEqual(failures, ["index_stage"])
+        self.assertFalse(InterruptionPdfText.objects.filter(
+            indexed_on__isnull=False).exists())
+        # the texts wait in the database for the next run
+        self.assertLess(InterruptionPdf.objects.count(), 12)
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from kplc_interruptions.interruptions.models import (
+    Interruption, InterruptionPdf, ScrapedPage)
+from kplc_interruptions.scrape import (
+    crawl_interruption_pdf_files, fetch_parsed, interruptions_to_crawl,
+    save_interruption_pdfs, save_interruptions)
+
+
+def pdf_dict(link, content=b"%PDF-1.4 interruptions"):
+    pdf_file_temp = tempfile.NamedTemporaryFile()
+    pdf_file_temp.write(content)
+    pdf_file_temp.seek(0)
+    return {
+        "download_link": link,
+        "download_link_text": link.rsplit("/", 1)[1],
+        "pdf_filename": link.rsplit("/", 1)[1],
+        "pdf_file_temp": pdf_file_temp,
+        "sha256": hashlib.sha256(content).hexdigest(),
+    }
+
+
+def response(status_code, content=b"", headers=None):
+    return mock.Mock(
+        status_code=status_code, ok=status_code < 400, content=content,
+        headers=headers or {})
+
+
+def parser(result):
+    parse = mock.Mock(return_value=result)
+    parse.__name__ = "parse"
+    return parse
+
+
+class MediaRootMixin:
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+
+class SaveInterruptionsTest(TestCase):
+
+    def test_saves_new_interruptions_once(self):
+        interruption_dicts = [
+            {"title": "Interruptions - 20.06.2019",
+             "link": "https://kplc.co.ke/content/item/1"},
+            {"title": "Interruptions - 21.06.2019",
+             "link": "https://kplc.co.ke/content/item/2"},
+        ]
+
+        self.assertEqual(save_interruptions(interruption_dicts), 2)
+        self.assertEqual(save_interruptions(interruption_dicts), 0)
+        self.assertEqual(Interruption.objects.count(), 2)
+
+    def test_renamed_interruption_is_updated(self):
+        interruption = Interruption.objects.create(
+            title="Interruptions - 20.06.2019",
+            link="https://kplc.co.ke/content/item/1",
+            updated=timezone.now() - timedelta(days=30))
+
+        saved = save_interruptions([
+            {"title": "Interruptions - 22.06.2019",
+             "link": "https://kplc.co.ke/content/item/1"}])
+
+        self.assertEqual(saved, 0)
+        interruption.refresh_from_db()
+        self.assertEqual(interruption.title, "Interruptions - 22.06.2019")
+        self.assertEqual(interruption.interruption_date.day, 22)
+        self.assertGreater(
+            interruption.updated, timezone.now() - timedelta(minutes=1))
+
+
+    def test_link_listed_with_several_titles_is_not_renamed(self):
+        long_ago = timezone.now() - timedelta(days=30)
+        Interruption.objects.create(
+            title="Interruptions - 20.06.2019",
+            link="https://kplc.co.ke/content/item/1", updated=long_ago)
+        interruption_dicts = [
+            {"title": "Interruptions - 20.06.2019",
+             "link": "https://kplc.co.ke/content/item/1"},
+            {"title": "Interruptions - 22.06.2019",
+             "link": "https://kplc.co.ke/content/item/1"},
+        ]
+
+        self.assertEqual(save_interruptions(interruption_dicts), 1)
+        self.assertEqual(save_interruptions(interruption_dicts), 0)
+        self.assertEqual(
+            sorted(Interruption.objects.values_list("title", flat=True)),
+            ["Interruptions - 20.06.2019", "Interruptions - 22.06.2019"])
+        self.assertTrue(Interruption.objects.filter(
+            title="Interruptions - 20.06.2019", updated=long_ago).exists())
+
+    def test_new_titles_sharing_a_stored_link_are_all_saved(self):
+        Interruption.objects.create(
+            title="Interruptions - 20.06.2019",
+            link="https://kplc.co.ke/content/item/1")
+
+        saved = save_interruptions([
+            {"title": "Interruptions - 21.06.2019",
+             "link": "https://kplc.co.ke/content/item/1"},
+            {"title": "Interruptions - 22.06.2019",
+             "link": "https://kplc.co.ke/content/item/1"},
+        ])
+
+        self.assertEqual(saved, 2)
+        self.assertEqual(Interruption.objects.count(), 3)
+
+
+class CrawlInterruptionPdfFilesTest(TestCase):
+
+    def test_stored_links_are_not_downloaded_again(self):
+        interruption = Interruption.objects.create(
+            title="Interruptions - 20.06.2019",
+            link="https://kplc.co.ke/content/item/1")
+        InterruptionPdf.objects.create(
+            interruption=interruption,
+            pdf_link="https://kplc.co.ke/img/full/a.pdf")
+        link_dicts = [
+            {"download_link": "https://kplc.co.ke/img/full/{}".format(name),
+             "download_link_text": name}
+            for name in ("a.pdf", "b.pdf")]
+
+        with mock.patch(
+                "kplc_interruptions.scrape.scrape_interruption_pdf_links",
+                return_value=link_dicts), \
+                mock.patch(
+                    "kplc_interruptions.scrape.fetch_interruption_pdf",
+                    side_effect=lambda link_dict: link_dict) as fetch:
+            crawled = list(crawl_interruption_pdf_files([interruption]))
+
+        fetch.assert_called_once_with(link_dicts[1])
+        self.assertEqual(crawled, [(interruption, link_dicts[1])])
+
+
+class IncrementalCrawlTest(MediaRootMixin, TestCase):
+
+    def test_new_pdfs_keep_interruption_in_the_recent_window(self):
+        long_ago = timezone.now() - timedelta(days=30)
+        interruption = Interruption.objects.create(
+            title="Interruptions - 20.06.2019",
+            link="https://kplc.co.ke/content/item/1", updated=long_ago)
+        save_interruption_pdfs([
+            (interruption, pdf_dict("https://kplc.co.ke/img/full/a.pdf"))])
+        self.assertIn(interruption, interruptions_to_crawl(incremental=True))
+
+        Interruption.objects.update(updated=long_ago)
+        self.assertNotIn(
+            interruption, interruptions_to_crawl(incremental=True))
+
+        save_interruption_pdfs([
+            (interruption, pdf_dict(
+                "https://kplc.co.ke/img/full/b.pdf", b"%PDF-1.4 other"))])
+        self.assertIn(interruption, interruptions_to_crawl(incremental=True))
+        self.assertEqual(InterruptionPdf.objects.count(), 2)
+
+
+class SaveInterruptionPdfsTest(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.interruption = Interruption.objects.create(
+            title="Interruptions - 20.06.2019",
+            link="https://kplc.co.ke/content/item/1")
+
+    def stored_files(self):
+        media_root = settings.MEDIA_ROOT
+        return sorted(
+            os.path.relpath(os.path.join(root, name), media_root)
+            for root, _, names in os.walk(media_root) for name in names)
+
+    def test_duplicates_in_a_batch_share_the_original(self):
+        pdfs = save_interruption_pdfs([
+            (self.interruption, pdf_dict("https://kplc.co.ke/img/full/a.pdf")),
+            (self.interruption, pdf_dict("https://kplc.co.ke/img/full/b.pdf")),
+        ])
+
+        original, duplicate = sorted(pdfs, key=lambda pdf: pdf.pdf_link)
+        self.assertIsNone(original.duplicate_of)
+        self.assertEqual(duplicate.duplicate_of, original)
+        self.assertEqual(duplicate.pdf_file.name, original.pdf_file.name)
+        self.assertEqual(self.stored_files(), [original.pdf_file.name])
+
+    def test_links_stored_in_the_meantime_are_skipped(self):
+        bulk_create = InterruptionPdf.objects.bulk_create
+
+        def store_link_first(pdfs, **kwargs):
+            # another run stores the first link with other content
+            if not InterruptionPdf.objects.exists():
+                InterruptionPdf.objects.create(
+                    interruption=self.interruption,
+                    pdf_link="https://kplc.co.ke/img/full/a.pdf",
+                    sha256="other")
+            return bulk_create(pdfs, **kwargs)
+
+        with mock.patch.object(
+                InterruptionPdf.objects, "bulk_create", store_link_first):
+            pdfs = save_interruption_pdfs([
+                (self.interruption, pdf_dict(
+                    "https://kplc.co.ke/img/full/a.pdf")),
+                (self.interruption, pdf_dict(
+                    "https://kplc.co.ke/img/full/b.pdf")),
+            ])
+
+        # the PDF with the same content as the skipped one is the original
+        pdf, = pdfs
+        self.assertEqual(pdf.pdf_link, "https://kplc.co.ke/img/full/b.pdf")
+        self.assertIsNone(pdf.duplicate_of)
+        self.assertEqual(self.stored_files(), [pdf.pdf_file.name])
+        self.assertEqual(InterruptionPdf.objects.count(), 2)
+
+
+class FetchParsedTest(TestCase):
+    url = "https://kplc.co.ke/content/item/1"
+
+    def test_validators_are_stored_and_sent_on_the_next_run(self):
+        parse = parser([{"download_link": "a.pdf"}])
+        with mock.patch("kplc_interruptions.scrape.http_get", return_value=(
+                response(200, b"<html></html>", {"ETag": '"v1"'}))):
+            self.assertEqual(
+                fetch_parsed(self.url, parse), [{"download_link": "a.pdf"}])
+        self.assertEqual(ScrapedPage.objects.get(url=self.url).etag, '"v1"')
+
+        with mock.patch("kplc_interruptions.scrape.http_get", return_value=(
+                response(304))) as http_get:
+            result = fetch_parsed(self.url, parse)
+
+        http_get.assert_called_once_with(
+            self.url, headers={"If-None-Match": '"v1"'})
+        self.assertEqual(result, [{"download_link": "a.pdf"}])
+        self.assertEqual(parse.call_count, 1)
+
+    def test_expired_validators_are_not_sent(self):
+        ScrapedPage.objects.create(
+            url=self.url, etag='"v1"', result=[],
+            updated=timezone.now() - timedelta(days=365))
+        with mock.patch("kplc_interruptions.scrape.http_get", return_value=(
+                response(200, b"<html></html>"))) as http_get:
+            fetch_parsed(self.url, parser([]))
+
+        http_get.assert_called_once_with(self.url, headers={})
@@ -0,0 +1,98 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from kplc_interruptions.interruptions.indexing import ReindexError
+from kplc_interruptions.interruptions.models import SearchIndexVersion
+from kplc_interruptions.interruptions.search import (
+    invalidate_search_cache, search_cache_key, search_pdf_texts)
+
+
+class SearchResponse(list):
+
+    def __init__(self):
+        super().__init__()
+        self.hits = mock.Mock(**{"total.value": 0})
+
+
+class SearchCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidating_bumps_the_version_in_the_database(self):
+        key = search_cache_key({"query": "Kitengela"})
+
+        invalidate_search_cache()
+        first_key = search_cache_key({"query": "Kitengela"})
+        invalidate_search_cache()
+
+        self.assertEqual(SearchIndexVersion.objects.get().version, 2)
+        self.assertNotEqual(key, first_key)
+        self.assertNotEqual(
+            first_key, search_cache_key({"query": "Kitengela"}))
+
+    def test_results_are_cached_until_invalidated(self):
+        with mock.patch(
+                "kplc_interruptions.interruptions.search."
+                "InterruptionPdfTextDoc.search") as search:
+            search.return_value.query.return_value.source.return_value \
+                .highlight.return_value.__getitem__.return_value \
+                .execute.return_value = SearchResponse()
+            search_pdf_texts("Kitengela")
+            search_pdf_texts("Kitengela")
+            # another process indexing texts bumps the version
+            SearchIndexVersion.objects.update_or_create(
+                name="kplc_interruptions", defaults={"version": 5})
+            search_pdf_texts("Kitengela")
+
+        self.assertEqual(search.call_count, 2)
+
+
+class SearchDateFilterTest(TestCase):
+
+    def test_filters_on_the_interruption_dates(self):
+        with mock.patch(
+                "kplc_interruptions.interruptions.search."
+                "InterruptionPdfTextDoc.search") as search:
+            highlighted = search.return_value.query.return_value \
+                .source.return_value.highlight.return_value
+            highlighted.filter.return_value.filter.return_value \
+                .__getitem__.return_value.execute.return_value = (
+                    SearchResponse())
+            search_pdf_texts(
+                "Kitengela", date_from=datetime.date(2019, 6, 20),
+                date_to=datetime.date(2019, 6, 23))
+
+        highlighted.filter.assert_called_once_with(
+            "range", interruption_end_date={"gte": "2019-06-20"})
+        highlighted.filter.return_value.filter.assert_called_once_with(
+            "range", interruption_date={"lte": "2019-06-23"})
+
+
+class ReindexTest(TestCase):
+
+    def test_failed_texts_delete_the_new_index(self):
+        failure = {"index": {"_id": "1", "status": 400}}
+        with mock.patch(
+                "kplc_interruptions.interruptions.indexing.connections"), \
+                mock.patch(
+                    "kplc_interruptions.interruptions.indexing."
+                    "create_versioned_index") as create_versioned_index, \
+                mock.patch(
+                    "kplc_interruptions.interruptions.indexing."
+                    "parallel_bulk", return_value=[(False, failure)]), \
+                mock.patch(
+                    "kplc_interruptions.interruptions.indexing."
+                    "swap_alias") as swap_alias, \
+                self.assertLogs(
+                    "kplc_interruptions.interruptions.indexing", "ERROR"):
+            with self.assertRaises(CommandError) as raised:
+                call_command("index_interruptions")
+
+        self.assertIsInstance(raised.exception.__context__, ReindexError)
+        create_versioned_index.return_value.delete.assert_called_once_with()
+        self.assertFalse(swap_alias.called)